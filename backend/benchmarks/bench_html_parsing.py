@@ -0,0 +1,64 @@
+"""
+Benchmark competitor page parsing backends over the saved blog HTML corpus.
+Run from the backend folder: python -m benchmarks.bench_html_parsing [--repeat 5]
+"""
+import argparse
+import statistics
+import time
+from functools import partial
+from pathlib import Path
+
+from services.competitor_scraper import extract_posts_bs4, extract_posts_lxml, summarize_posts
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+URL = "https://example.com/blog"
+
+# label, requires lxml, extractor
+BACKENDS = [
+    ("bs4 html.parser (before)", False, partial(extract_posts_bs4, parser="html.parser", strainer_tags=None)),
+    ("bs4 html.parser+strainer", False, partial(extract_posts_bs4, parser="html.parser")),
+    ("bs4 lxml+strainer", True, partial(extract_posts_bs4, parser="lxml")),
+    ("lxml native", True, extract_posts_lxml),
+]
+
+
+def lxml_available() -> bool:
+    try:
+        import lxml  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def time_backend(html: str, extract, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        summarize_posts(extract(html, URL))
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    has_lxml = lxml_available()
+    corpus = sorted(FIXTURES.glob("*.html"), key=lambda p: p.stat().st_size)
+    print(f"{'fixture':<24}{'size':>9}  {'backend':<26}{'median ms':>10}{'min ms':>9}")
+    for path in corpus:
+        html = path.read_text(encoding="utf-8")
+        reference = summarize_posts(BACKENDS[0][2](html, URL))
+        for label, needs_lxml, extract in BACKENDS:
+            if needs_lxml and not has_lxml:
+                print(f"{path.stem:<24}{len(html):>9}  {label:<26}{'skipped (lxml not installed)':>19}")
+                continue
+            # Every backend must produce the same result as the original full html.parser parse
+            assert summarize_posts(extract(html, URL)) == reference, f"{label} disagrees with html.parser on {path.name}"
+            samples = time_backend(html, extract, args.repeat)
+            print(f"{path.stem:<24}{len(html):>9}  {label:<26}{statistics.median(samples):>10.2f}{min(samples):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
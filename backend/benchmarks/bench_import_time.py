@@ -0,0 +1,66 @@
+"""
+Profile how long `import main` takes in a fresh interpreter (what a cold start pays before /ping can answer)
+and check that the heavy, lazily imported dependencies stay out of it.
+Run from the backend folder: python -m benchmarks.bench_import_time [--repeat 5] [--top 15] [--budget-ms 1500]
+Exits non-zero if a deferred module was imported at startup or the median exceeds --budget-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+# Only loaded by the endpoints that need them; importing any of these from main is a regression
+DEFERRED_MODULES = ["pytrends", "pandas", "numpy", "praw", "requests", "httpx", "bs4", "lxml", "pyarrow"]
+
+
+def profile_once() -> dict:
+    """{module: cumulative microseconds} from python -X importtime."""
+    env = dict(os.environ, PYTHONPATH=str(BACKEND))
+    env.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=BACKEND, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"import main failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit():
+            modules[name] = int(cumulative)
+    return modules
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, default=None)
+    args = ap.parse_args()
+
+    runs = [profile_once() for _ in range(args.repeat)]
+    totals = [run.get("main", 0) / 1000 for run in runs]
+    last = runs[-1]
+    print(f"import main: median {statistics.median(totals):.0f} ms, min {min(totals):.0f} ms over {args.repeat} runs")
+    print(f"\n{'top-level package':<40}{'cumulative ms':>14}")
+    packages = {name: us for name, us in last.items() if "." not in name and name != "main"}
+    for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40}{us / 1000:>14.1f}")
+
+    failed = False
+    eager = [name for name in DEFERRED_MODULES if name in last]
+    if eager:
+        print(f"\nFAIL: imported at startup but should load lazily: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and statistics.median(totals) > args.budget_ms:
+        print(f"\nFAIL: median import time exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare JSON encoders and response compression on the largest payloads the API returns:
+a 52-week calendar and a multi-year daily interest series.
+Run from the backend folder: python -m benchmarks.bench_json_compression [--repeat 20] [--posts 7] [--years 5]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from utils import compression, fastjson
+
+
+def calendar_payload(weeks: int = 52, posts_per_week: int = 7) -> list:
+    return [
+        {"week": w, "posts": [
+            {
+                "day": f"Day {p + 1}",
+                "post_type": ("Post", "Reel", "Story", "Carousel")[p % 4],
+                "theme": f"Week {w} theme {p + 1}: practical tips for growing an audience",
+                "caption": f"💡 Idea #{w * posts_per_week + p}: share one lesson your audience can use today, "
+                           "then ask them which part they'll try first. Keep it short, concrete and friendly!",
+                "hashtags": ["#ContentStrategy", "#SocialMediaTips", f"#Week{w}", "#CreatorEconomy"],
+            }
+            for p in range(posts_per_week)
+        ]}
+        for w in range(1, weeks + 1)
+    ]
+
+
+def trends_payload(years: int = 5) -> dict:
+    start = date(2020, 1, 1)
+    return {
+        "keyword": "content marketing",
+        "related_topics": [f"related topic {i}" for i in range(5)],
+        "rising_trends": [f"rising trend {i}" for i in range(5)],
+        "interest_over_time": [
+            {"date": (start + timedelta(days=d)).isoformat(), "score": (d * 37) % 101}
+            for d in range(365 * years)
+        ],
+        "reddit_topics": [], "reddit_trends": [], "summary": "- Interest is steady.",
+    }
+
+
+def fastapi_default(payload) -> bytes:
+    # What a plain `return payload` costs: jsonable_encoder, then JSONResponse.render
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def brotli_compress(body: bytes) -> bytes:
+    compressor = compression._Compressor("br")
+    return compressor.finish(body)
+
+
+def gzip_compress(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=compression.COMPRESS_GZIP_LEVEL)
+
+
+def median_ms(fn, arg, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--posts", type=int, default=7, help="posts per week in the calendar payload")
+    ap.add_argument("--years", type=int, default=5, help="years of daily points in the interest series")
+    args = ap.parse_args()
+
+    encoders = [("fastapi default", fastapi_default), ("FastJSONResponse", fastjson.dumps)]
+    compressors = [("gzip", gzip_compress)]
+    if compression.brotli is not None:
+        compressors.append(("br", brotli_compress))
+    print(f"orjson: {'yes' if fastjson.orjson is not None else 'no (stdlib json)'}, "
+          f"brotli: {'yes' if compression.brotli is not None else 'no'}\n")
+
+    payloads = [
+        (f"calendar 52w x {args.posts}", calendar_payload(52, args.posts)),
+        (f"interest {args.years}y daily", trends_payload(args.years)),
+    ]
+    for name, payload in payloads:
+        reference = json.loads(fastapi_default(payload))
+        print(f"{name}")
+        print(f"  {'encoder':<20}{'median ms':>10}{'bytes':>10}")
+        for label, encode in encoders:
+            body = encode(payload)
+            assert json.loads(body) == reference, f"{label} output differs"
+            print(f"  {label:<20}{median_ms(encode, payload, args.repeat):>10.2f}{len(body):>10}")
+        body = fastjson.dumps(payload)
+        print(f"  {'encoding':<20}{'median ms':>10}{'bytes':>10}{'ratio':>8}")
+        for label, compress in compressors:
+            compressed = compress(body)
+            print(f"  {label:<20}{median_ms(compress, body, args.repeat):>10.2f}{len(compressed):>10}"
+                  f"{len(body) / len(compressed):>8.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
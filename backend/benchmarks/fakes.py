@@ -0,0 +1,348 @@
+"""
+Local stand-ins for every external service the backend calls, for load tests that run fully offline:
+an OpenRouter-compatible chat completions API, the Reddit API (as praw uses it), Google Trends (as
+pytrends uses it), static competitor blogs and an SMTP sink. Each has a configurable latency and
+error rate so upstream behaviour can be varied independently of the app.
+
+Used by benchmarks.load_test, or on its own against a dev server:
+Run from the backend folder: python -m benchmarks.fakes [--llm-first-token-ms 300] [--error-rate 0.02]
+It prints the environment to start the app with (one JSON line), serves until interrupted, then
+prints request counts (another JSON line).
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import random
+import signal
+import socket
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+FIXTURES = Path(__file__).parent / "fixtures"
+CALENDAR_OUTPUT = (FIXTURES / "model_outputs" / "realistic_4w_7pw.txt").read_text(encoding="utf-8")
+# An incomplete calendar, so some generations go through the app's continuation requests
+TRUNCATED_OUTPUT = (FIXTURES / "model_outputs" / "missing_and_truncated.txt").read_text(encoding="utf-8")
+SUMMARY_OUTPUT = (
+    "- Searches are climbing steadily, peaking in January.\n"
+    "- Beginner routines and equipment-free formats dominate related queries.\n"
+    "- Reddit discussion centres on consistency and time-saving plans.\n"
+    "- Post short how-to reels early in the week when interest is highest."
+)
+TONE_OUTPUT = (
+    "The voice is upbeat, direct and encouraging, mixing short imperative sentences with playful emoji. "
+    "It reads as a friendly coach (the Caregiver archetype with a dash of the Hero): confident without "
+    "being preachy, and it invites replies with questions and polls."
+)
+SITE_PAGES = sorted((FIXTURES / "html").glob("*.html"))
+
+COUNTS = {}
+
+
+def _count(name: str):
+    COUNTS[name] = COUNTS.get(name, 0) + 1
+
+
+async def _upstream(settings, name: str, latency_ms: float):
+    """Shared behaviour of every fake endpoint: count it, wait, maybe fail. Returns an error response or None."""
+    _count(name)
+    await asyncio.sleep(random.expovariate(1 / latency_ms) / 1000 if latency_ms > 0 else 0)
+    if random.random() < settings.error_rate:
+        _count(f"{name}_errors")
+        return JSONResponse({"error": {"message": "stand-in rate limit", "code": 429}}, status_code=429)
+    return None
+
+
+def llm_app(settings) -> Starlette:
+    def completion_text(prompt: str) -> str:
+        lowered = prompt.lower()
+        if "content calendar" in lowered or "4-week calendar" in lowered:
+            return TRUNCATED_OUTPUT if random.random() < settings.llm_truncated_rate else CALENDAR_OUTPUT
+        if "summary" in lowered or "bullet" in lowered:
+            return SUMMARY_OUTPUT
+        return TONE_OUTPUT
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = await _upstream(settings, "llm", settings.llm_first_token_ms)
+        if error is not None:
+            return error
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        text = completion_text(prompt)
+        # Roughly four characters per token
+        seconds_per_char = 1 / (settings.llm_tokens_per_second * 4)
+        if not body.get("stream"):
+            await asyncio.sleep(len(text) * seconds_per_char)
+            return JSONResponse({
+                "id": "gen-fake", "object": "chat.completion", "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+
+        async def events():
+            yield b": OPENROUTER PROCESSING\n\n"
+            for start in range(0, len(text), 16):
+                piece = text[start:start + 16]
+                await asyncio.sleep(len(piece) * seconds_per_char)
+                chunk = {"id": "gen-fake", "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": piece}}]}
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/api/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+def reddit_app(settings) -> Starlette:
+    async def access_token(request: Request):
+        _count("reddit_token")
+        return JSONResponse({"access_token": "stand-in", "token_type": "bearer", "expires_in": 86400, "scope": "*"})
+
+    async def search(request: Request):
+        error = await _upstream(settings, "reddit", settings.reddit_latency_ms)
+        if error is not None:
+            return error
+        subreddit = request.path_params["subreddit"]
+        query = request.query_params.get("q", "")
+        limit = int(request.query_params.get("limit", 25))
+        now = time.time()
+        children = [{"kind": "t3", "data": {
+            "id": f"fk{subreddit[:3]}{i}", "name": f"t3_fk{subreddit[:3]}{i}",
+            "title": f"How we grew our {query} audience {i + 2}x in a month (r/{subreddit})",
+            "subreddit": subreddit, "subreddit_name_prefixed": f"r/{subreddit}",
+            "author": f"poster{i}", "score": 500 - i * 37, "num_comments": 40 + i,
+            "created_utc": now - i * 3600, "permalink": f"/r/{subreddit}/comments/fk{i}/", "url": f"https://example.com/{i}",
+        }} for i in range(min(limit, 3))]
+        return JSONResponse({"kind": "Listing", "data": {"children": children, "after": None, "before": None}})
+
+    return Starlette(routes=[
+        Route("/api/v1/access_token", access_token, methods=["POST"]),
+        Route("/r/{subreddit}/search/", search),  # praw asks for the trailing-slash form
+    ])
+
+
+def trends_app(settings) -> Starlette:
+    # pytrends strips the anti-JSON-hijacking prefix Google puts before every body
+    def google_json(prefix: str, data) -> Response:
+        return Response(prefix + json.dumps(data), media_type="application/json")
+
+    async def explore_page(request: Request):
+        _count("trends_cookie")
+        response = PlainTextResponse("ok")
+        response.set_cookie("NID", "stand-in")
+        return response
+
+    async def explore(request: Request):
+        error = await _upstream(settings, "trends", settings.trends_latency_ms)
+        if error is not None:
+            return error
+        req = json.loads(request.query_params.get("req", "{}"))
+        keyword = (req.get("comparisonItem") or [{}])[0].get("keyword", "")
+        restriction = {"complexKeywordsRestriction": {"keyword": [{"type": "BROAD", "value": keyword}]}}
+        return google_json(")]}'", {"widgets": [
+            {"id": "TIMESERIES", "token": "t1", "request": {"keyword": keyword}},
+            {"id": "RELATED_QUERIES", "token": "t2", "request": {"restriction": restriction}},
+        ]})
+
+    async def multiline(request: Request):
+        error = await _upstream(settings, "trends", settings.trends_latency_ms)
+        if error is not None:
+            return error
+        start = datetime.now(timezone.utc) - timedelta(weeks=52)
+        timeline = [{"time": str(int((start + timedelta(weeks=w)).timestamp())),
+                     "value": [40 + (w * 7) % 60], "isPartial": w == 51} for w in range(52)]
+        return google_json(")]}',", {"default": {"timelineData": timeline}})
+
+    async def related(request: Request):
+        error = await _upstream(settings, "trends", settings.trends_latency_ms)
+        if error is not None:
+            return error
+        req = json.loads(request.query_params.get("req", "{}"))
+        keyword = req.get("restriction", {}).get("complexKeywordsRestriction", {}).get("keyword", [{}])[0].get("value", "")
+        top = [{"query": f"{keyword} {suffix}", "value": 100 - i * 9}
+               for i, suffix in enumerate(("for beginners", "at home", "plan", "app", "tips", "ideas"))]
+        rising = [{"query": f"{keyword} {suffix}", "value": 250 - i * 30}
+                  for i, suffix in enumerate(("2025", "challenge", "ai", "trend", "near me"))]
+        return google_json(")]}',", {"default": {"rankedList": [{"rankedKeyword": top}, {"rankedKeyword": rising}]}})
+
+    return Starlette(routes=[
+        Route("/trends/explore/", explore_page),
+        Route("/trends/api/explore", explore, methods=["GET", "POST"]),
+        Route("/trends/api/widgetdata/multiline", multiline),
+        Route("/trends/api/widgetdata/relatedsearches", related),
+    ])
+
+
+def site_app(settings, page: Path) -> Starlette:
+    body = page.read_bytes()
+    etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+    async def blog(request: Request):
+        error = await _upstream(settings, "site", settings.site_latency_ms)
+        if error is not None:
+            return error
+        if request.headers.get("if-none-match") == etag:
+            _count("site_not_modified")
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="text/html; charset=utf-8", headers={"ETag": etag})
+
+    async def missing(request: Request):
+        _count("site_404")
+        return PlainTextResponse("not found", status_code=404)
+
+    return Starlette(routes=[Route("/blog", blog)] + [Route(path, missing) for path in (
+        "/feed", "/rss", "/rss.xml", "/feed.xml", "/atom.xml", "/index.xml", "/robots.txt", "/sitemap.xml")])
+
+
+class SMTPSink(asyncio.Protocol):
+    """Accepts any message: enough SMTP (no TLS) for smtplib's send_message, login and noop."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.buffer = b""
+        self.in_data = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        _count("smtp_connections")
+        transport.write(b"220 stand-in ESMTP\r\n")
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            if self.in_data:
+                end = self.buffer.find(b"\r\n.\r\n")
+                if end < 0:
+                    return
+                self.buffer = self.buffer[end + 5:]
+                self.in_data = False
+                _count("smtp_messages")
+                delay = self.settings.smtp_latency_ms / 1000
+                asyncio.get_running_loop().call_later(delay, self.transport.write, b"250 OK queued\r\n")
+                continue
+            line, sep, rest = self.buffer.partition(b"\r\n")
+            if not sep:
+                return
+            self.buffer = rest
+            self.command(line.decode("utf-8", errors="replace"))
+
+    def command(self, line: str):
+        verb = line.split(" ", 1)[0].upper()
+        if verb == "EHLO":
+            self.transport.write(b"250-stand-in\r\n250-8BITMIME\r\n250-SMTPUTF8\r\n250 AUTH PLAIN LOGIN\r\n")
+        elif verb == "AUTH":
+            self.transport.write(b"235 OK\r\n")
+        elif verb == "DATA":
+            self.in_data = True
+            self.transport.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+        elif verb == "QUIT":
+            self.transport.write(b"221 Bye\r\n")
+            self.transport.close()
+        elif verb == "STARTTLS":
+            self.transport.write(b"454 TLS not available\r\n")
+        else:  # HELO, MAIL, RCPT, RSET, NOOP
+            self.transport.write(b"250 OK\r\n")
+
+
+class _Server(uvicorn.Server):
+    # Several servers share one loop; shutdown is handled once in serve_fakes
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+def _listen(host: str) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, 0))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+async def serve_fakes(settings, ready=None):
+    """Serve every stand-in until SIGINT/SIGTERM; `ready(env, sites)` is called once they are listening."""
+    host = "127.0.0.1"
+    apps = [("llm", llm_app(settings)), ("reddit", reddit_app(settings)), ("trends", trends_app(settings))]
+    # One server (so one host:port) per site, so the app's per-host scrape limit applies as it would in production
+    apps += [(f"site{i}", site_app(settings, SITE_PAGES[i % len(SITE_PAGES)])) for i in range(settings.sites)]
+    servers, tasks, urls = [], [], {}
+    for name, app in apps:
+        sock = _listen(host)
+        urls[name] = f"http://{host}:{sock.getsockname()[1]}"
+        server = _Server(uvicorn.Config(app, log_level="warning", lifespan="off", access_log=False))
+        servers.append(server)
+        tasks.append(asyncio.create_task(server.serve(sockets=[sock])))
+    loop = asyncio.get_running_loop()
+    smtp = await loop.create_server(lambda: SMTPSink(settings), host, 0)
+    smtp_port = smtp.sockets[0].getsockname()[1]
+
+    env = {
+        "OPENROUTER_API_KEY": "stand-in",
+        "OPENROUTER_BASE_URL": f"{urls['llm']}/api/v1",
+        "REDDIT_CLIENT_ID": "stand-in",
+        "REDDIT_CLIENT_SECRET": "stand-in",
+        "REDDIT_URL": urls["reddit"],
+        "REDDIT_OAUTH_URL": urls["reddit"],
+        "GOOGLE_TRENDS_URL": f"{urls['trends']}/trends",
+        "EMAIL_HOST": host,
+        "EMAIL_PORT": str(smtp_port),
+        "EMAIL_STARTTLS": "false",
+        "EMAIL_USER": "",
+        "EMAIL_PASS": "",
+    }
+    sites = [f"{urls[f'site{i}']}/blog" for i in range(settings.sites)]
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):  # Windows: Ctrl+C still raises KeyboardInterrupt
+            loop.add_signal_handler(sig, stop.set)
+    while not all(server.started for server in servers):
+        await asyncio.sleep(0.01)
+    if ready is not None:
+        ready(env, sites)
+    try:
+        await stop.wait()
+    finally:
+        for server in servers:
+            server.should_exit = True
+        smtp.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def add_arguments(ap: argparse.ArgumentParser):
+    ap.add_argument("--llm-first-token-ms", type=float, default=400, help="mean time before the model starts answering")
+    ap.add_argument("--llm-tokens-per-second", type=float, default=150, help="generation speed of the stand-in model")
+    ap.add_argument("--llm-truncated-rate", type=float, default=0.1,
+                    help="share of calendars returned incomplete (triggers continuation calls)")
+    ap.add_argument("--reddit-latency-ms", type=float, default=250)
+    ap.add_argument("--trends-latency-ms", type=float, default=300)
+    ap.add_argument("--site-latency-ms", type=float, default=150)
+    ap.add_argument("--smtp-latency-ms", type=float, default=50)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of upstream calls answered with 429")
+    ap.add_argument("--sites", type=int, default=8, help="number of competitor blogs (each on its own port)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(ap)
+    settings = ap.parse_args()
+
+    def ready(env, sites):
+        print(json.dumps({"env": env, "sites": sites}), flush=True)
+
+    asyncio.run(serve_fakes(settings, ready))
+    print(json.dumps({"counts": COUNTS}), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,487 @@
+"""
+Full-stack load test: starts the stand-in external services (benchmarks.fakes), a database and the
+app under uvicorn, drives a traffic profile with concurrent simulated users, and reports latency
+percentiles, error rates and resource usage per endpoint.
+Run from the backend folder: python -m benchmarks.load_test [--profile mixed] [--users 20] [--duration 60]
+    [--database-url postgresql+asyncpg://...] [--isolate-seconds 5] [--save results.json]
+
+Without --database-url a fresh SQLite file is used. Every app setting (GOVERNOR_*, LOG_LEVEL,
+SCRAPE_*, ...) is read from this command's environment, and the stand-ins' latency and error rate
+are set with the same options as benchmarks.fakes (e.g. --llm-tokens-per-second 60 --error-rate 0.05).
+The governor's provider rate limits still apply to the stand-ins, so with the defaults the trend
+endpoints are paced by Google Trends' and Reddit's limits; set GOVERNOR_GOOGLE_TRENDS_RATE=0 and
+GOVERNOR_REDDIT_RATE=0 to load the app itself instead.
+
+Errors are counted per endpoint as HTTP >= 400, transport failures (timeouts, resets) and 200
+responses whose body reports an error. Resource usage comes from /proc (Linux): the mixed run
+reports the app process' CPU and memory over time, and with --isolate-seconds each endpoint is then
+run on its own to measure CPU time per request.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks import fakes
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+NICHES = ["fitness", "personal finance", "vegan cooking", "indie games", "skincare", "travel photography"]
+KEYWORDS = ["home workout", "budgeting app", "meal prep", "pixel art", "retinol", "drone photography"]
+CAPTIONS = [
+    f"{opener} {topic} {closer}"
+    for opener in ("Big news!", "Quick tip:", "Real talk:", "Monday motivation:", "Behind the scenes:")
+    for topic in ("our new plan drops Friday", "consistency beats intensity", "we tested 10 tools so you don't have to",
+                  "here's what nobody tells beginners", "the one habit that changed everything")
+    for closer in ("👇 Tell us below!", "Save this for later 📌", "Would you try it?")
+]
+
+# endpoint -> relative weight; one is picked per request
+PROFILES = {
+    "mixed": {
+        "ping": 3, "list_brands": 8, "create_brand": 2, "analyze_tone": 8, "tone_features": 8,
+        "generate_calendar": 6, "generate_calendar_stream": 6, "analyze_trends": 2, "analyze_trends_stream": 3,
+        "scrape_competitor": 12, "crawl_competitor": 4, "scrape_competitors": 2,
+        "export_calendar": 10, "export_brand_calendars": 3, "email_calendar": 5,
+    },
+    "read_heavy": {
+        "ping": 5, "list_brands": 30, "tone_features": 20, "export_calendar": 30, "export_brand_calendars": 15,
+    },
+    "generation": {"generate_calendar": 40, "generate_calendar_stream": 40, "analyze_tone": 20},
+    "trends": {"analyze_trends": 50, "analyze_trends_stream": 50},
+    "scraping": {"scrape_competitor": 50, "crawl_competitor": 30, "scrape_competitors": 20},
+    "email": {"email_calendar": 80, "list_brands": 20},
+}
+
+
+class LoadState:
+    """Data the request builders draw on, filled in while seeding and as calendars are generated."""
+
+    def __init__(self, sites, seed: int):
+        self.sites = sites
+        self.rng = random.Random(seed)
+        self.brand_ids = []
+        self.calendar_ids = []
+        self.calendars = []
+
+    def calendar_request(self) -> dict:
+        niche = self.rng.choice(NICHES)
+        return {"brand_name": f"{niche.title()} Co {self.rng.randrange(20)}", "niche": niche,
+                "platform": self.rng.choice(["Instagram", "TikTok", "LinkedIn"]), "posting_frequency": 7,
+                "tone": self.rng.choice(["playful", "expert", "warm"])}
+
+
+# Request builders: state -> (method, path, httpx request kwargs); streamed responses are read to the end
+def _ping(s):
+    return "GET", "/ping", {}
+
+
+def _list_brands(s):
+    return "GET", "/brands", {}
+
+
+def _create_brand(s):
+    return "POST", "/brands", {"json": {"name": f"Load Brand {s.rng.randrange(10 ** 6)}",
+                                        "niche": s.rng.choice(NICHES), "posting_frequency": 5}}
+
+
+def _analyze_tone(s):
+    # A fixed pool of captions, so the tone cache sees a realistic mix of hits and misses
+    return "POST", "/analyze-tone", {"json": {"text": s.rng.choice(CAPTIONS), "describe": True}}
+
+
+def _tone_features(s):
+    return "POST", "/analyze-tone/features", {"json": {"captions": s.rng.sample(CAPTIONS, 20)}}
+
+
+def _generate_calendar(s):
+    return "POST", "/generate-calendar", {"json": s.calendar_request()}
+
+
+def _generate_calendar_stream(s):
+    return "POST", "/generate-calendar/stream", {"json": s.calendar_request()}
+
+
+def _analyze_trends(s):
+    return "POST", "/analyze-trends", {"json": {"keyword": s.rng.choice(KEYWORDS)}}
+
+
+def _analyze_trends_stream(s):
+    return "POST", "/analyze-trends/stream", {"json": {"keyword": s.rng.choice(KEYWORDS)}}
+
+
+def _scrape_competitor(s):
+    return "POST", "/scrape-competitor", {"json": {"url": s.rng.choice(s.sites)}}
+
+
+def _crawl_competitor(s):
+    return "POST", "/crawl-competitor", {"json": {"url": s.rng.choice(s.sites), "max_pages": 5}}
+
+
+def _scrape_competitors(s):
+    return "POST", "/scrape-competitors", {"json": {"urls": s.sites}}
+
+
+def _export_calendar(s):
+    return "GET", f"/calendars/{s.rng.choice(s.calendar_ids)}/export", {"params": {"format": s.rng.choice(["csv", "ics"])}}
+
+
+def _export_brand_calendars(s):
+    return "GET", f"/brands/{s.rng.choice(s.brand_ids)}/calendars/export", {"params": {"format": "csv"}}
+
+
+def _email_calendar(s):
+    return "POST", "/email-calendar", {"json": {"email": f"load{s.rng.randrange(1000)}@example.com",
+                                                "calendar": s.rng.choice(s.calendars)}}
+
+
+ENDPOINTS = {
+    "ping": _ping,
+    "list_brands": _list_brands,
+    "create_brand": _create_brand,
+    "analyze_tone": _analyze_tone,
+    "tone_features": _tone_features,
+    "generate_calendar": _generate_calendar,
+    "generate_calendar_stream": _generate_calendar_stream,
+    "analyze_trends": _analyze_trends,
+    "analyze_trends_stream": _analyze_trends_stream,
+    "scrape_competitor": _scrape_competitor,
+    "crawl_competitor": _crawl_competitor,
+    "scrape_competitors": _scrape_competitors,
+    "export_calendar": _export_calendar,
+    "export_brand_calendars": _export_brand_calendars,
+    "email_calendar": _email_calendar,
+}
+
+
+def body_error(content_type: str, body: bytes) -> bool:
+    """A 200 whose JSON (or last NDJSON event) reports a failure, as the scrape/email/stream endpoints do."""
+    try:
+        if "ndjson" in content_type:
+            lines = body.strip().splitlines()
+            return bool(lines) and json.loads(lines[-1]).get("event") == "error"
+        if "json" in content_type:
+            data = json.loads(body)
+            return isinstance(data, dict) and "error" in data
+    except (ValueError, AttributeError):
+        return True
+    return False
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, endpoint: str, seconds: float, ttfb: float, outcome: str):
+        self.samples.setdefault(endpoint, []).append((seconds, ttfb, outcome))
+
+
+async def one_request(client: httpx.AsyncClient, state: LoadState, endpoint: str, recorder: Recorder):
+    method, path, kwargs = ENDPOINTS[endpoint](state)
+    start = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(method, path, **kwargs) as response:
+            chunks = []
+            async for chunk in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                chunks.append(chunk)
+        elapsed = time.perf_counter() - start
+        body = b"".join(chunks)
+        content_type = response.headers.get("content-type", "")
+        if response.status_code >= 400:
+            outcome = f"http_{response.status_code}"
+        elif body_error(content_type, body):
+            outcome = "error_body"
+        else:
+            outcome = "ok"
+            remember(state, endpoint, response, body)
+    except httpx.HTTPError as e:
+        elapsed = time.perf_counter() - start
+        outcome = type(e).__name__
+    recorder.add(endpoint, elapsed, ttfb if ttfb is not None else elapsed, outcome)
+
+
+def remember(state: LoadState, endpoint: str, response: httpx.Response, body: bytes):
+    calendar_id = response.headers.get("x-calendar-id")
+    if calendar_id and endpoint == "generate_calendar":
+        state.calendar_ids.append(calendar_id)
+        state.calendars.append(json.loads(body))
+    elif endpoint == "create_brand":
+        state.brand_ids.append(json.loads(body)["id"])
+
+
+async def user(client, state, weights, deadline: float, think_ms: float, recorder: Recorder, start_delay: float):
+    await asyncio.sleep(start_delay)
+    names, cum = list(weights), list(weights.values())
+    while time.monotonic() < deadline:
+        await one_request(client, state, state.rng.choices(names, cum)[0], recorder)
+        if think_ms > 0:
+            await asyncio.sleep(state.rng.expovariate(1000 / think_ms))
+
+
+async def run_load(client, state, weights, users: int, duration: float, think_ms: float, ramp: float) -> Recorder:
+    """Closed loop: `users` clients each send a request, wait for it, think, and repeat until the deadline.
+    Requests already in flight at the deadline are finished and counted."""
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(user(client, state, weights, deadline, think_ms, recorder, ramp * i / users)
+                           for i in range(users)))
+    return recorder
+
+
+class ProcessSampler:
+    """CPU and memory of one process from /proc, sampled in the background."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.available = Path(f"/proc/{pid}/stat").exists()
+        self.samples = []
+        self._task = None
+
+    def read(self):
+        """(cpu seconds, rss bytes, threads, open fds) right now."""
+        fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu = (int(fields[11]) + int(fields[12])) / ticks
+        rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        return cpu, rss, int(fields[17]), len(os.listdir(f"/proc/{self.pid}/fd"))
+
+    async def _loop(self):
+        while True:
+            self.samples.append((time.monotonic(),) + self.read())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.samples = []
+        if self.available:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> dict:
+        if self._task is None:
+            return {}
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self.samples.append((time.monotonic(),) + self.read())
+        if len(self.samples) < 2:
+            return {}
+        cpu_pct = [100 * (b[1] - a[1]) / (b[0] - a[0]) for a, b in zip(self.samples, self.samples[1:]) if b[0] > a[0]]
+        first, last = self.samples[0], self.samples[-1]
+        return {
+            "cpu_seconds": last[1] - first[1],
+            "cpu_pct_avg": 100 * (last[1] - first[1]) / (last[0] - first[0]),
+            "cpu_pct_peak": max(cpu_pct),
+            "rss_mb_start": first[2] / 2 ** 20,
+            "rss_mb_peak": max(s[2] for s in self.samples) / 2 ** 20,
+            "threads_peak": max(s[3] for s in self.samples),
+            "fds_peak": max(s[4] for s in self.samples),
+        }
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, duration: float) -> dict:
+    summary = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        latencies = sorted(s[0] * 1000 for s in samples)
+        ttfbs = sorted(s[1] * 1000 for s in samples)
+        outcomes = {}
+        for _, _, outcome in samples:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        errors = len(samples) - outcomes.get("ok", 0)
+        summary[endpoint] = {
+            "requests": len(samples),
+            "rps": len(samples) / duration,
+            "error_rate": errors / len(samples),
+            "outcomes": outcomes,
+            "p50_ms": percentile(latencies, 50), "p90_ms": percentile(latencies, 90),
+            "p95_ms": percentile(latencies, 95), "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1], "mean_ms": statistics.fmean(latencies),
+            "ttfb_p50_ms": percentile(ttfbs, 50),
+        }
+    return summary
+
+
+def print_table(summary: dict, isolated: dict):
+    print(f"{'endpoint':<26}{'reqs':>6}{'rps':>7}{'err%':>7}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}"
+          f"{'max':>9}{'ttfb50':>9}{'cpu ms/req':>12}{'rss MB':>8}")
+    for endpoint, row in summary.items():
+        own = isolated.get(endpoint, {})
+        cpu = f"{own['cpu_ms_per_request']:.1f}" if own.get("cpu_ms_per_request") is not None else "-"
+        rss = f"{own['rss_mb_peak']:.0f}" if own.get("rss_mb_peak") is not None else "-"
+        print(f"{endpoint:<26}{row['requests']:>6}{row['rps']:>7.1f}{100 * row['error_rate']:>7.1f}"
+              f"{row['p50_ms']:>9.0f}{row['p90_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}"
+              f"{row['max_ms']:>9.0f}{row['ttfb_p50_ms']:>9.0f}{cpu:>12}{rss:>8}")
+    failing = {e: r["outcomes"] for e, r in summary.items() if r["error_rate"]}
+    for endpoint, outcomes in failing.items():
+        print(f"  {endpoint}: " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items()) if k != "ok"))
+
+
+def start_fakes(args):
+    cmd = [sys.executable, "-m", "benchmarks.fakes"]
+    for option in ("llm_first_token_ms", "llm_tokens_per_second", "llm_truncated_rate", "reddit_latency_ms",
+                   "trends_latency_ms", "site_latency_ms", "smtp_latency_ms", "error_rate", "sites"):
+        cmd += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    process = subprocess.Popen(cmd, cwd=BACKEND, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError("The stand-in services failed to start")
+    return process, json.loads(line)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(env: dict, port: int, log_path: Path):
+    subprocess.run([sys.executable, "-c", "import asyncio, init_db; asyncio.run(init_db.init_models())"],
+                   cwd=BACKEND, env=env, check=True, stdout=subprocess.DEVNULL)
+    log = open(log_path, "wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--no-access-log", "--timeout-graceful-shutdown", "10"],
+        cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+
+async def wait_ready(client: httpx.AsyncClient, process, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The app exited during startup; see its log")
+        try:
+            if (await client.get("/ping")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("The app did not answer /ping in time")
+
+
+async def seed(client: httpx.AsyncClient, state: LoadState):
+    """Brands and a generated calendar for the export and email endpoints to use."""
+    for _ in range(3):
+        method, path, kwargs = _create_brand(state)
+        response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+        state.brand_ids.append(response.json()["id"])
+    for _ in range(2):
+        response = await client.post("/generate-calendar", json=state.calendar_request())
+        response.raise_for_status()
+        remember(state, "generate_calendar", response, response.content)
+
+
+async def drive(args, base_url: str, sites, app_pid: int) -> dict:
+    state = LoadState(sites, args.seed)
+    limits = httpx.Limits(max_connections=args.users + 10, max_keepalive_connections=args.users + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        await wait_ready(client, args.app_process)
+        await seed(client, state)
+        sampler = ProcessSampler(app_pid)
+        results = {}
+        for profile in args.profile:
+            weights = PROFILES[profile]
+            print(f"\nprofile {profile}: {args.users} users, {args.duration:.0f}s, think {args.think_ms:.0f} ms")
+            driver_cpu = resource.getrusage(resource.RUSAGE_SELF)
+            started = time.monotonic()
+            sampler.start()
+            recorder = await run_load(client, state, weights, args.users, args.duration, args.think_ms, args.ramp)
+            process = await sampler.stop()
+            wall = time.monotonic() - started
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            driver_pct = 100 * (usage.ru_utime + usage.ru_stime - driver_cpu.ru_utime - driver_cpu.ru_stime) / wall
+            summary = summarize(recorder, wall)
+
+            isolated = {}
+            if args.isolate_seconds > 0 and sampler.available:
+                for endpoint in weights:
+                    sampler.start()
+                    solo = await run_load(client, state, {endpoint: 1}, args.users, args.isolate_seconds,
+                                          args.think_ms, 0)
+                    usage_solo = await sampler.stop()
+                    count = sum(len(s) for s in solo.samples.values())
+                    isolated[endpoint] = {
+                        "requests": count,
+                        "cpu_ms_per_request": 1000 * usage_solo["cpu_seconds"] / count if count else None,
+                        "rss_mb_peak": usage_solo.get("rss_mb_peak"),
+                    }
+
+            print_table(summary, isolated)
+            if process:
+                print(f"app process: cpu avg {process['cpu_pct_avg']:.0f}% (peak {process['cpu_pct_peak']:.0f}%), "
+                      f"rss {process['rss_mb_start']:.0f} -> {process['rss_mb_peak']:.0f} MB peak, "
+                      f"threads {process['threads_peak']}, fds {process['fds_peak']}")
+            print(f"load generator cpu: {driver_pct:.0f}%"
+                  + ("  (near a full core; add think time or fewer users for trustworthy latencies)" if driver_pct > 80 else ""))
+            results[profile] = {"endpoints": summary, "isolated": isolated, "app_process": process,
+                                "driver_cpu_pct": driver_pct, "wall_seconds": wall}
+        return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--profile", nargs="+", default=["mixed"], choices=sorted(PROFILES))
+    ap.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    ap.add_argument("--duration", type=float, default=60, help="seconds of load per profile")
+    ap.add_argument("--think-ms", type=float, default=500, help="mean pause between a user's requests")
+    ap.add_argument("--ramp", type=float, default=5, help="seconds over which users start")
+    ap.add_argument("--isolate-seconds", type=float, default=5,
+                    help="run each endpoint alone for this long to measure CPU per request (0 to skip)")
+    ap.add_argument("--request-timeout", type=float, default=120)
+    ap.add_argument("--database-url", help="e.g. a local Postgres; a temporary SQLite file by default")
+    ap.add_argument("--port", type=int, default=0, help="port for the app (a free one by default)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", help="write all results (and the stand-ins' request counts) to this JSON file")
+    fakes.add_arguments(ap)
+    args = ap.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    fakes_process, stand_ins = start_fakes(args)
+    env = dict(os.environ, **stand_ins["env"])
+    env["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{workdir / 'load.db'}"
+    env["CACHE_SQLITE_PATH"] = str(workdir / "cache.sqlite3")
+    log_path = workdir / "app.log"
+    args.port = args.port or free_port()
+    app_process, app_log = start_app(env, args.port, log_path)
+    args.app_process = app_process
+    print(f"database: {env['DATABASE_URL']}\napp log: {log_path}")
+    try:
+        results = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}", stand_ins["sites"], app_process.pid))
+    finally:
+        app_process.terminate()
+        app_process.wait(30)
+        app_log.close()
+        fakes_process.terminate()
+        out, _ = fakes_process.communicate(timeout=30)
+    counts = json.loads(out.strip().splitlines()[-1])["counts"] if out.strip() else {}
+    print("\nstand-in requests: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if args.save:
+        settings = {k: v for k, v in vars(args).items() if k != "app_process"}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "profiles": results, "stand_in_requests": counts}, f, indent=2)
+        print(f"saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Microbenchmark suite for the backend's CPU hot paths (see benchmarks.suite), with results that can
+be saved and compared across commits.
+Run from the backend folder: python -m benchmarks.run [--filter parse_] [--save after.json] [--compare before.json]
+
+Each case is calibrated so one sample runs for at least --min-time seconds, warmed up, then timed
+--repeat times with the garbage collector off. Medians are compared; a case only counts as a
+regression when it is slower by more than --threshold and by more than both runs' spread (IQR).
+"""
+import os
+
+# Importing the services pulls in database.py, which needs a URL (no connection is made)
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://bench@localhost/bench")
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import suite
+
+logging.getLogger("influcrafters").setLevel(logging.ERROR)
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "") if out.returncode == 0 else "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def calibrate(fn, min_time: float) -> int:
+    """Smallest loop count (1, 2, 5, 10, 20, ...) whose run takes at least min_time."""
+    number, step = 1, 0
+    while True:
+        if _loop(fn, number) >= min_time:
+            return number
+        step += 1
+        number = (1, 2, 5)[step % 3] * 10 ** (step // 3)
+
+
+def _loop(fn, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+
+def measure(fn, repeat: int, min_time: float, warmup: int) -> dict:
+    number = calibrate(fn, min_time)
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(warmup):
+            _loop(fn, number)
+        samples = [_loop(fn, number) / number * 1e6 for _ in range(repeat)]
+    finally:
+        if enabled:
+            gc.enable()
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "median_us": statistics.median(samples),
+        "min_us": min(samples),
+        "iqr_us": quartiles[2] - quartiles[0],
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """(name, ratio, regressed) for every case present in both runs."""
+    rows = []
+    for name, new in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = new["median_us"] / old["median_us"]
+        noise = max(new["iqr_us"], old["iqr_us"])
+        regressed = ratio > 1 + threshold and new["median_us"] - old["median_us"] > noise
+        rows.append((name, ratio, regressed))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    ap.add_argument("--repeat", type=int, default=15, help="timed samples per case")
+    ap.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per sample")
+    ap.add_argument("--warmup", type=int, default=2, help="untimed samples before measuring")
+    ap.add_argument("--save", help="write results (with python/platform/commit metadata) to this JSON file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier --save")
+    ap.add_argument("--threshold", type=float, default=0.10, help="slowdown ratio that counts as a regression")
+    args = ap.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            saved = json.load(f)
+        baseline = saved["results"]
+        print(f"baseline: {saved['meta']['commit']} ({saved['meta']['python']}, {saved['meta']['platform']})")
+
+    results = {}
+    print(f"{'case':<55}{'median us':>12}{'min us':>12}{'iqr us':>10}{'loops':>8}")
+    for name, setup in suite.cases():
+        if args.filter not in name:
+            continue
+        try:
+            fn = setup()
+        except ImportError as exc:
+            print(f"{name:<55}  skipped ({exc.name} not installed)")
+            continue
+        result = results[name] = measure(fn, args.repeat, args.min_time, args.warmup)
+        print(f"{name:<55}{result['median_us']:>12.1f}{result['min_us']:>12.1f}"
+              f"{result['iqr_us']:>10.1f}{result['number']:>8}")
+
+    if args.save:
+        meta = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "settings": {"repeat": args.repeat, "min_time": args.min_time, "warmup": args.warmup},
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\nsaved {len(results)} results to {args.save}")
+
+    if baseline:
+        rows = compare(results, baseline, args.threshold)
+        print(f"\n{'case':<55}{'new/base':>10}")
+        for name, ratio, regressed in rows:
+            print(f"{name:<55}{ratio:>10.2f}{'  REGRESSION' if regressed else ''}")
+        if any(regressed for _, _, regressed in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+CPU hot paths measured by benchmarks.run, each on recorded fixtures so results are comparable across commits.
+
+A case is (name, setup) where setup() returns the zero-argument callable to time; setup work
+(reading fixtures, building DataFrames) is not timed.
+"""
+import json
+from pathlib import Path
+
+from services.calendar_generator import parse_calendar_output
+from services.calendar_render import calendar_to_text
+from services.competitor_scraper import PARSER_BACKEND, PARSER_BACKENDS, parse_competitor_html, summarize_posts
+from services.trend_analyzer import interest_points, synthesize_summary_from_data
+
+FIXTURES = Path(__file__).parent / "fixtures"
+MODEL_OUTPUTS = FIXTURES / "model_outputs"
+HTML = FIXTURES / "html"
+TRENDS = FIXTURES / "trends"
+URL = "https://example.com/blog"
+
+# Posts per week the recorded model outputs were asked for
+POSTING_FREQUENCY = 7
+
+
+def _parse_calendar(path: Path):
+    def setup():
+        text = path.read_text(encoding="utf-8")
+        return lambda: parse_calendar_output(text, POSTING_FREQUENCY)
+    return setup
+
+
+def _synthesize_summary():
+    result = json.loads((TRENDS / "trend_result.json").read_text(encoding="utf-8"))
+    return lambda: synthesize_summary_from_data(result, result["keyword"])
+
+
+def _interest_points():
+    import pandas as pd  # only this case needs pandas
+    data = json.loads((TRENDS / "interest_5y_weekly.json").read_text(encoding="utf-8"))
+    # Same shape as pytrends' interest_over_time(): a date index, the keyword's scores and isPartial
+    frame = pd.DataFrame(
+        {data["keyword"]: data["scores"], "isPartial": data["is_partial"]},
+        index=pd.DatetimeIndex(pd.to_datetime(data["dates"]), name="date"),
+    )
+    return lambda: interest_points(frame, data["keyword"])
+
+
+def _parse_competitor(path: Path):
+    def setup():
+        html = path.read_text(encoding="utf-8")
+        return lambda: parse_competitor_html(html, URL)
+    return setup
+
+
+def _keyword_stage():
+    # summarize_posts alone (keyword counting and posting frequency) on the largest page's posts
+    posts = PARSER_BACKENDS[PARSER_BACKEND]((HTML / "large_blog_index.html").read_text(encoding="utf-8"), URL)
+    return lambda: summarize_posts(posts)
+
+
+def _calendar_to_text(weeks: int):
+    def setup():
+        parsed = parse_calendar_output(
+            (MODEL_OUTPUTS / "realistic_4w_7pw.txt").read_text(encoding="utf-8"), POSTING_FREQUENCY)
+        calendar = [{"week": w + 1, "posts": parsed[w % len(parsed)]["posts"]} for w in range(weeks)]
+        return lambda: calendar_to_text(calendar)
+    return setup
+
+
+def cases():
+    yield from ((f"parse_calendar_output[{p.stem}]", _parse_calendar(p)) for p in sorted(MODEL_OUTPUTS.glob("*.txt")))
+    yield "synthesize_summary_from_data[trend_result]", _synthesize_summary
+    yield "interest_points[5y_weekly]", _interest_points
+    yield from ((f"parse_competitor_html[{PARSER_BACKEND}:{p.stem}]", _parse_competitor(p))
+                for p in sorted(HTML.glob("*.html")))
+    yield "summarize_posts[large_blog_index]", _keyword_stage
+    yield "calendar_to_text[4w]", _calendar_to_text(4)
+    yield "calendar_to_text[52w]", _calendar_to_text(52)
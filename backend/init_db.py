@@ -1,6 +1,6 @@
 import asyncio
 from database import engine, Base
-from models import brand, content_calendar, competitor, trend, user
+from models import brand, content_calendar, competitor, trend, user, tone_analysis, competitor_post, email_outbox
 
 async def init_models():
     async with engine.begin() as conn:
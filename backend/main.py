@@ -6,10 +6,34 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-from fastapi import FastAPI
+from utils.log import RequestIdMiddleware, setup_logging, shutdown_logging
+
+setup_logging()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from database import engine
 from routers import brand_voice, competitor_scraper, trend_analyzer, calendar_generator, brands
+from services.competitor_scraper import close_async_client, shutdown_parse_pool
+from services.email_sender import outbox_sender
+from services.http_cache import http_cache
+from services.tone_cache import tone_cache
+from utils.cache import all_caches
+from utils.compression import CompressionMiddleware
+from utils.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware, instrument_engine, set_cache_stats
+from utils.profiling import PROFILE_HEADER, PROFILE_TOKEN, PROFILES_PATH, ProfilingMiddleware, profile_file, token_matches
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    outbox_sender.start()
+    yield
+    await outbox_sender.stop()
+    await close_async_client()
+    shutdown_parse_pool()
+    shutdown_logging()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(brand_voice.router)
 app.include_router(competitor_scraper.router)
@@ -17,6 +41,45 @@ app.include_router(trend_analyzer.router)
 app.include_router(calendar_generator.router)
 app.include_router(brands.router)
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+# Added last so it is outermost: the id is set before anything else runs and echoed on every response
+app.add_middleware(RequestIdMiddleware)
+instrument_engine(engine)
+
+
+@REGISTRY.on_collect
+def collect_cache_stats():
+    tone = tone_cache.stats()
+    set_cache_stats("tone", tone["hits"], tone["misses"])
+    http = http_cache.stats()
+    set_cache_stats("http_scrape", http["revalidated"], http["misses"])
+    # Everything else on the shared cache reports its own counters
+    for cache in all_caches():
+        if cache.namespace not in ("tone", "scrape"):
+            stats = cache.stats()
+            set_cache_stats(cache.namespace, stats["memory_hits"] + stats["shared_hits"], stats["misses"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get(PROFILES_PATH + "/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, request: Request, format: str = "json"):
+    """A profile stored by ProfilingMiddleware: phase timings, or format=folded for the sampled stacks."""
+    if not token_matches(request.headers.get(PROFILE_HEADER, "")):
+        raise HTTPException(status_code=404, detail="Not Found")
+    kind = "folded" if format == "folded" else "json"
+    path = profile_file(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    media_type = "text/plain; charset=utf-8" if kind == "folded" else "application/json"
+    return Response(path.read_bytes(), media_type=media_type)
+
 @app.get("/ping")
 def ping():
     return {"message": "pong"}
\ No newline at end of file
@@ -1,13 +1,15 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSON
 from database import Base
 
 class Competitor(Base):
     __tablename__ = "competitors"
+    __table_args__ = (UniqueConstraint("brand_id", "url", name="uq_competitors_brand_url"),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     brand_id = Column(UUID(as_uuid=True), ForeignKey("brands.id"))
     name = Column(String, nullable=False)
+    url = Column(String)
     insights = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
@@ -0,0 +1,16 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from database import Base
+
+class CompetitorPost(Base):
+    __tablename__ = "competitor_posts"
+    __table_args__ = (UniqueConstraint("competitor_id", "post_key", name="uq_competitor_posts_key"),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    competitor_id = Column(UUID(as_uuid=True), ForeignKey("competitors.id"), nullable=False, index=True)
+    post_key = Column(String, nullable=False)  # post URL, or page URL + title when the post has no link
+    url = Column(String)
+    title = Column(String)
+    published_at = Column(DateTime)
+    first_seen_at = Column(DateTime, default=datetime.utcnow)
@@ -8,6 +8,8 @@ class ContentCalendar(Base):
     __tablename__ = "calendars"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     brand_id = Column(UUID(as_uuid=True), ForeignKey("brands.id"))
+    # One row per week; the rows of one generated calendar share this id
+    generation_id = Column(UUID(as_uuid=True), index=True)
     week = Column(Integer)
     posts = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
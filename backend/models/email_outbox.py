@@ -0,0 +1,21 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID, JSON
+from database import Base
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    recipients = Column(JSON, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    html_body = Column(Text)
+    attachments = Column(JSON)  # [{"filename", "content_type", "content"}], rendered once for all recipients
+    delivered_to = Column(JSON)  # recipients already sent to, so a retry only covers the rest
+    status = Column(String, nullable=False, default="queued", index=True)  # queued | sending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
@@ -0,0 +1,10 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text
+from database import Base
+
+class ToneAnalysis(Base):
+    __tablename__ = "tone_analyses"
+    cache_key = Column(String(64), primary_key=True)  # sha256 of model id + normalized caption
+    model = Column(String, nullable=False)
+    description = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
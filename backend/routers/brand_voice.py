@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Optional
-import httpx
+from typing import Optional, List
 import os
 from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from services.tone_cache import tone_cache, tone_cache_key
+from utils.deadline import deadline, remaining
+from utils.governor import outbound
+from services.tone_features import (
+    split_captions,
+    extract_tone_features_batch,
+    aggregate_features,
+    tone_fingerprint,
+    compare_fingerprints,
+)
 
 load_dotenv()
 
@@ -11,9 +22,21 @@ router = APIRouter()
 
 class TextInput(BaseModel):
     text: str
+    describe: bool = True  # set False to skip the LLM and get only the local tone features
+
+class CaptionBatch(BaseModel):
+    captions: List[str]
+
+class CompareToneInput(BaseModel):
+    fingerprint_a: str
+    fingerprint_b: str
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct") # Default to Mistral
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", 120))
+# Seconds for the model's tone description, including any wait for an OpenRouter slot
+TONE_DEADLINE = float(os.getenv("TONE_DEADLINE", 60))
 
 async def call_openrouter_api(prompt: str, max_tokens: int = 20):
     if not OPENROUTER_API_KEY:
@@ -33,13 +56,31 @@ async def call_openrouter_api(prompt: str, max_tokens: int = 20):
         "repetition_penalty": 1.1 # OpenRouter uses repetition_penalty instead of repeat_penalty
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload)
+    import httpx
+    async with httpx.AsyncClient() as client, outbound("openrouter"):
+        response = await client.post(f"{OPENROUTER_BASE_URL}/chat/completions", headers=headers, json=payload,
+                                     timeout=remaining(OPENROUTER_TIMEOUT))
         response.raise_for_status() # Raise an exception for 4xx or 5xx status codes
         return response.json()["choices"][0]["message"]["content"].strip()
 
 @router.post("/analyze-tone")
-async def analyze_tone(data: TextInput):
+async def analyze_tone(data: TextInput, db: AsyncSession = Depends(get_db)):
+    # Lexical features are computed locally and always returned; the LLM description is opt-out
+    features = aggregate_features(extract_tone_features_batch(split_captions(data.text)))
+    response = {
+        "tone_features": features,
+        "tone_fingerprint": tone_fingerprint(features)
+    }
+    if not data.describe:
+        return response
+
+    cache_key = tone_cache_key(data.text, OPENROUTER_MODEL)
+    cached = await tone_cache.get(db, cache_key)
+    if cached is not None:
+        response["brand_voice_description"] = cached
+        response["cached"] = True
+        return response
+
     prompt = f"""
 You are a senior brand strategist.
 
@@ -47,18 +88,34 @@ Analyze the tone, voice, and emotional expression of the following caption in de
 
 Caption: "{data.text}"
 """
-    result = await call_openrouter_api(
-        prompt,
-        max_tokens=300
-    )
-    return {"brand_voice_description": result}
+    with deadline(TONE_DEADLINE):
+        result = await call_openrouter_api(
+            prompt,
+            max_tokens=300
+        )
+    await tone_cache.set(db, cache_key, OPENROUTER_MODEL, result)
+    response["brand_voice_description"] = result
+    response["cached"] = False
+    return response
 
-@router.post("/analyze-tone")
-def analyze_tone(data: TextInput):
-    prompt = f"""
-You are a senior brand strategist.
+@router.get("/analyze-tone/cache-stats")
+def tone_cache_stats():
+    return tone_cache.stats()
 
-Analyze the tone, voice, and emotional expression of the following caption in detail. Include stylistic choices, personality traits, emotional tone, and the brand archetype it represents.
+@router.post("/analyze-tone/features")
+def analyze_tone_features(data: CaptionBatch):
+    rows = extract_tone_features_batch(data.captions)
+    aggregate = aggregate_features(rows)
+    return {
+        "captions": rows,
+        "aggregate": aggregate,
+        "tone_fingerprint": tone_fingerprint(aggregate)
+    }
 
-Caption: "{data.text}"
-"""
\ No newline at end of file
+@router.post("/compare-tone")
+def compare_tone(data: CompareToneInput):
+    try:
+        similarity = compare_fingerprints(data.fingerprint_a, data.fingerprint_b)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"similarity": similarity}
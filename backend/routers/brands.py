@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models.brand import Brand
-from sqlalchemy import select
+from services.brand_cache import brand_added, list_brand_rows
 
 router = APIRouter()
 
@@ -46,10 +46,9 @@ async def create_brand(brand: BrandCreate, db: AsyncSession = Depends(get_db)):
     db.add(new_brand)
     await db.commit()
     await db.refresh(new_brand)
+    await brand_added()
     return BrandOut.from_orm(new_brand)
 
 @router.get("/brands", response_model=list[BrandOut])
 async def list_brands(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Brand))
-    brands = result.scalars().all()
-    return [BrandOut.from_orm(b) for b in brands]
+    return [BrandOut(**row) for row in await list_brand_rows(db)]
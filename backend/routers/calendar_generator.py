@@ -1,11 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from pydantic import BaseModel, EmailStr
-from services.calendar_generator import generate_calendar
-from database import get_db
+import uuid
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, EmailStr, Field
+from services.calendar_generator import generate_calendar, generate_calendar_stream
+from services.calendar_render import calendar_to_text, render_email, ATTACHMENT_FORMATS
+from services.calendar_export import (
+    EXPORT_FORMATS,
+    calendar_exists,
+    export_filename,
+    export_stream,
+    iter_calendar_weeks,
+    parquet_available,
+)
+from services.brand_cache import resolve_brand_id
+from database import get_db, AsyncSessionLocal
+from utils.fastjson import FastJSONResponse, dumps_line
+from utils.log import get_logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from services import email_sender
 
 router = APIRouter()
+log = get_logger(__name__)
+
+MAX_BULK_DIGESTS = 50
 
 class CalendarRequest(BaseModel):
     brand_name: str
@@ -18,52 +37,174 @@ class EmailCalendarRequest(BaseModel):
     email: EmailStr
     calendar: list
 
+class CalendarPost(BaseModel):
+    day: str
+    post_type: str
+    theme: str
+    caption: str
+    hashtags: List[str] = []
+
+class CalendarWeek(BaseModel):
+    week: int = Field(..., ge=1)
+    posts: List[CalendarPost]
+
+class CalendarDigest(BaseModel):
+    recipients: List[EmailStr] = Field(..., min_length=1, max_length=100)
+    calendar: List[CalendarWeek]
+    subject: str = "Your Content Calendar"
+    formats: List[str] = ["csv", "ics"]  # attachments; any of csv, ics, html, txt
+    start_date: Optional[date] = None  # first day of week 1 in the .ics; defaults to next Monday
+
+class BulkEmailCalendarRequest(BaseModel):
+    digests: List[CalendarDigest] = Field(..., min_length=1, max_length=MAX_BULK_DIGESTS)
+
 @router.post("/generate-calendar")
 async def generate_calendar_endpoint(
     request: CalendarRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    print(f"[DEBUG] Received calendar generation request for {request.brand_name}")
     if not all([request.brand_name, request.niche, request.platform, request.posting_frequency, request.tone]):
         raise HTTPException(status_code=400, detail="All fields must be provided.")
     try:
-        print("[DEBUG] Calling generate_calendar service")
+        calendar_id = uuid.uuid4()
         result = await generate_calendar(
             brand_name=request.brand_name,
             niche=request.niche,
             platform=request.platform,
             posting_frequency=request.posting_frequency,
             tone=request.tone,
-            db=db
+            db=db,
+            calendar_id=calendar_id
         )
-        print(f"[DEBUG] Successfully generated calendar: {result}")
-        return result
+        log.info("calendar.generated", calendar_id=calendar_id, weeks=len(result))
+        # The body stays a plain list of weeks; the stored calendar's id (for /calendars/{id}/export) goes in a header
+        return FastJSONResponse(result, headers={"X-Calendar-Id": str(calendar_id)})
     except Exception as e:
-        print(f"[ERROR] Calendar generation failed: {str(e)}")
+        log.exception("calendar.generate_failed", calendar_id=calendar_id)
         raise HTTPException(status_code=500, detail="Calendar generation failed")
 
+@router.post("/generate-calendar/stream")
+async def generate_calendar_stream_endpoint(request: CalendarRequest):
+    """NDJSON progress events: status, a week as each one is written, then done with the stored calendar and its id."""
+    if not all([request.brand_name, request.niche, request.platform, request.posting_frequency, request.tone]):
+        raise HTTPException(status_code=400, detail="All fields must be provided.")
+    calendar_id = uuid.uuid4()
+
+    async def stream():
+        # The request-scoped session may be closed before streaming starts, so use our own
+        async with AsyncSessionLocal() as session:
+            try:
+                async for event in generate_calendar_stream(
+                    brand_name=request.brand_name,
+                    niche=request.niche,
+                    platform=request.platform,
+                    posting_frequency=request.posting_frequency,
+                    tone=request.tone,
+                    db=session,
+                    calendar_id=calendar_id
+                ):
+                    yield dumps_line(event)
+            except Exception as e:
+                log.exception("calendar.generate_stream_failed", calendar_id=calendar_id)
+                yield dumps_line({"event": "error", "message": "Calendar generation failed"})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Calendar-Id": str(calendar_id)})
+
 @router.post("/email-calendar")
 async def email_calendar(
-    request: EmailCalendarRequest
+    request: EmailCalendarRequest,
+    db: AsyncSession = Depends(get_db)
 ):
-    print("[DEBUG] /email-calendar endpoint called")
     try:
-        def calendar_to_text(calendar):
-            lines = []
-            for week in calendar:
-                lines.append(f"Week {week['week']}")
-                for post in week['posts']:
-                    lines.append(f"  {post['day']} - {post['post_type']} - {post['theme']}")
-                    lines.append(f"    Caption: {post['caption']}")
-                    lines.append(f"    Hashtags: {' '.join(post.get('hashtags', []))}")
-                lines.append("")
-            return '\n'.join(lines)
         text_body = calendar_to_text(request.calendar)
         subject = "Your Content Calendar"
-        print(f"[DEBUG] Attempting to send email to {request.email}")
-        email_sender.send_email(request.email, subject, text_body)
-        print(f"[DEBUG] Email send function completed for {request.email}")
-        return {"message": "Email sent (if successful)"}
+        # Queued for the background sender; the caller polls /email-deliveries/{id} for the outcome
+        delivery = await email_sender.enqueue_email(db, [request.email], subject, text_body)
+        log.info("email.queued", delivery_id=delivery.id, recipients=1)
+        return {"message": "Email queued", "delivery_id": str(delivery.id), "status": delivery.status}
     except Exception as e:
-        print(f"[ERROR] Exception in /email-calendar: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        log.exception("email.queue_failed")
+        return {"error": str(e)}
+
+@router.post("/email-calendar/bulk")
+async def email_calendar_bulk(
+    request: BulkEmailCalendarRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Queue one digest per calendar. Each calendar's bodies and attachments are rendered once and
+    sent to every recipient individually over the background sender's single SMTP session.
+    """
+    for digest in request.digests:
+        unknown = [fmt for fmt in digest.formats if fmt not in ATTACHMENT_FORMATS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unsupported attachment format(s): {', '.join(unknown)}")
+    deliveries = []
+    for digest in request.digests:
+        calendar = [week.model_dump() for week in digest.calendar]
+        text_body, html_body, attachments = render_email(calendar, digest.subject, digest.formats, digest.start_date)
+        delivery = await email_sender.enqueue_email(db, digest.recipients, digest.subject, text_body, html_body, attachments)
+        deliveries.append({"delivery_id": str(delivery.id), "recipients": delivery.recipients, "status": delivery.status})
+    log.info("email.digests_queued", digests=len(deliveries),
+             recipients=sum(len(d["recipients"]) for d in deliveries))
+    return {"message": "Emails queued", "deliveries": deliveries}
+
+@router.get("/email-deliveries/{delivery_id}")
+async def email_delivery_status(delivery_id: str, db: AsyncSession = Depends(get_db)):
+    try:
+        delivery_uuid = uuid.UUID(delivery_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid delivery id.")
+    delivery = await email_sender.get_delivery(db, delivery_uuid)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail="Delivery not found.")
+    return {
+        "delivery_id": str(delivery.id),
+        "status": delivery.status,
+        "recipients": delivery.recipients,
+        "delivered_to": delivery.delivered_to or [],
+        "attempts": delivery.attempts,
+        "last_error": delivery.last_error,
+        "next_attempt_at": delivery.next_attempt_at.isoformat() if delivery.next_attempt_at and delivery.status == "queued" else None,
+        "sent_at": delivery.sent_at.isoformat() if delivery.sent_at else None
+    }
+
+def check_export_format(fmt: str):
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server.")
+
+def export_response(stream, fmt: str, stem: str) -> StreamingResponse:
+    media_type = EXPORT_FORMATS[fmt][0]
+    return StreamingResponse(stream, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{export_filename(stem, fmt)}"'
+    })
+
+@router.get("/calendars/{calendar_id}/export")
+async def export_calendar(
+    calendar_id: str,
+    format: str = Query("csv", pattern="^(csv|ics|parquet)$"),
+    start_date: Optional[date] = Query(None, description="First day of week 1 in .ics exports; defaults to the Monday after generation"),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        calendar_uuid = uuid.UUID(calendar_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid calendar id.")
+    check_export_format(format)
+    if not await calendar_exists(db, calendar_uuid):
+        raise HTTPException(status_code=404, detail="Calendar not found.")
+    rows = iter_calendar_weeks(calendar_id=calendar_uuid)
+    return export_response(export_stream(format, rows, start=start_date), format, f"calendar-{calendar_uuid}")
+
+@router.get("/brands/{brand_id}/calendars/export")
+async def export_brand_calendars(
+    brand_id: str,
+    format: str = Query("csv", pattern="^(csv|ics|parquet)$"),
+    start_date: Optional[date] = Query(None, description="First day of week 1 in .ics exports; defaults to the Monday after each generation"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Every stored calendar of a brand, oldest first, streamed from the DB in batches."""
+    brand_uuid = await resolve_brand_id(db, brand_id)
+    check_export_format(format)
+    rows = iter_calendar_weeks(brand_id=brand_uuid)
+    return export_response(export_stream(format, rows, include_calendar=True, start=start_date), format, f"brand-{brand_uuid}-calendars")
@@ -1,15 +1,110 @@
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.competitor_scraper import scrape_competitor
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, AsyncSessionLocal
+from services.competitor_scraper import scrape_competitor_async, scrape_competitors, SCRAPE_TIMEOUT
+from services.competitor_crawler import crawl_competitor, CRAWL_MAX_PAGES, CRAWL_MAX_DEPTH
+from services.brand_cache import resolve_brand_id
+from services.competitor_store import persist_scrape, list_competitors
+from services.http_cache import http_cache
+from services.keyword_index import top_competitor_phrases
+from utils.fastjson import FastJSONResponse, dumps_line
+from utils.governor import BATCH, priority
+from utils.log import get_logger
+
+MAX_COMPETITOR_URLS = 100
 
 router = APIRouter()
+log = get_logger(__name__)
 
 class ScrapeCompetitorRequest(BaseModel):
     url: str
+    brand_id: Optional[str] = None  # when set, the scrape is stored against this brand's competitor
+    name: Optional[str] = None
+
+class ScrapeCompetitorsRequest(BaseModel):
+    urls: List[str]
+    timeout: Optional[float] = None  # per-URL timeout in seconds
+    brand_id: Optional[str] = None
+
+class CrawlCompetitorRequest(BaseModel):
+    url: str
+    brand_id: Optional[str] = None
+    name: Optional[str] = None
+    max_pages: Optional[int] = None
+    max_depth: Optional[int] = None
 
 @router.post("/scrape-competitor")
-def scrape_competitor_endpoint(request: ScrapeCompetitorRequest):
+async def scrape_competitor_endpoint(request: ScrapeCompetitorRequest, db: AsyncSession = Depends(get_db)):
+    if not request.url:
+        raise HTTPException(status_code=400, detail="'url' must be provided.")
+    brand_uuid = await resolve_brand_id(db, request.brand_id)
+    result = await scrape_competitor_async(request.url)
+    if brand_uuid and "error" not in result:
+        result["history"] = await persist_scrape(db, brand_uuid, request.url, result["posts"], request.name)
+    return FastJSONResponse(result)
+
+@router.post("/crawl-competitor")
+async def crawl_competitor_endpoint(request: CrawlCompetitorRequest, db: AsyncSession = Depends(get_db)):
     if not request.url:
         raise HTTPException(status_code=400, detail="'url' must be provided.")
-    result = scrape_competitor(request.url)
-    return result
\ No newline at end of file
+    brand_uuid = await resolve_brand_id(db, request.brand_id)
+    # Callers may lower the limits but never raise them above the configured ceiling
+    max_pages = max(1, min(request.max_pages or CRAWL_MAX_PAGES, CRAWL_MAX_PAGES))
+    max_depth = max(0, min(request.max_depth if request.max_depth is not None else CRAWL_MAX_DEPTH, CRAWL_MAX_DEPTH))
+    result = await crawl_competitor(request.url, max_pages=max_pages, max_depth=max_depth)
+    if brand_uuid and "error" not in result:
+        result["history"] = await persist_scrape(db, brand_uuid, request.url, result["posts"], request.name)
+    return FastJSONResponse(result)
+
+@router.get("/brands/{brand_id}/competitors")
+async def list_brand_competitors(brand_id: str, db: AsyncSession = Depends(get_db)):
+    brand_uuid = await resolve_brand_id(db, brand_id)
+    return await list_competitors(db, brand_uuid)
+
+@router.get("/scrape-competitor/cache-stats")
+def scrape_cache_stats():
+    return http_cache.stats()
+
+@router.post("/scrape-competitors")
+async def scrape_competitors_endpoint(request: ScrapeCompetitorsRequest, db: AsyncSession = Depends(get_db)):
+    urls = [u.strip() for u in request.urls if u and u.strip()]
+    if not urls:
+        raise HTTPException(status_code=400, detail="'urls' must contain at least one URL.")
+    if len(urls) > MAX_COMPETITOR_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMPETITOR_URLS} URLs per request.")
+    timeout = min(request.timeout or SCRAPE_TIMEOUT, SCRAPE_TIMEOUT * 3)
+    brand_uuid = await resolve_brand_id(db, request.brand_id)
+
+    async def stream():
+        # The request-scoped session may be closed before streaming starts, so use our own.
+        # Bulk scrapes run in the batch lane so single-URL scrapes from the UI aren't stuck behind them.
+        with priority(BATCH):
+            async with AsyncSessionLocal() as session:
+                # One JSON document per line, in completion order
+                async for result in scrape_competitors(urls, timeout):
+                    if brand_uuid and "error" not in result:
+                        try:
+                            result["history"] = await persist_scrape(session, brand_uuid, result["url"], result["posts"])
+                        except Exception:
+                            # Report it like a failed scrape and carry on with the other URLs
+                            log.exception("competitors.persist_failed", url=result["url"])
+                            await session.rollback()
+                            result = {"url": result["url"], "error": "Failed to store the scrape results."}
+                    yield dumps_line(result)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/brands/{brand_id}/competitor-keywords")
+async def competitor_keywords(
+    brand_id: str,
+    days: Optional[int] = Query(None, ge=1, description="Only posts from the last N days"),
+    min_n: int = Query(1, ge=1, le=3),
+    max_n: int = Query(3, ge=1, le=3),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
+    brand_uuid = await resolve_brand_id(db, brand_id)
+    return await top_competitor_phrases(db, brand_uuid, days=days, min_n=min_n, max_n=max_n, limit=limit)
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.trend_analyzer import analyze_trends
+from services.trend_analyzer import analyze_trends, analyze_trends_stream
+from utils.fastjson import FastJSONResponse, dumps_line
+from utils.log import get_logger
 
 router = APIRouter()
+log = get_logger(__name__)
 
 class AnalyzeTrendsRequest(BaseModel):
     keyword: str
@@ -12,4 +16,20 @@ def analyze_trends_endpoint(request: AnalyzeTrendsRequest):
     if not request.keyword:
         raise HTTPException(status_code=400, detail="'keyword' must be provided.")
     result = analyze_trends(request.keyword)
-    return result
\ No newline at end of file
+    return FastJSONResponse(result)
+
+@router.post("/analyze-trends/stream")
+async def analyze_trends_stream_endpoint(request: AnalyzeTrendsRequest):
+    """NDJSON progress events: status, reddit, google, summary, then done with the full /analyze-trends result."""
+    if not request.keyword:
+        raise HTTPException(status_code=400, detail="'keyword' must be provided.")
+
+    async def stream():
+        try:
+            async for event in analyze_trends_stream(request.keyword):
+                yield dumps_line(event)
+        except Exception:
+            log.exception("trends.analyze_stream_failed", keyword=request.keyword)
+            yield dumps_line({"event": "error", "message": "Trend analysis failed"})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,34 @@
+"""
+Simple migration: add generation_id column (and its index) to calendars table if it doesn't exist.
+Run: python backend\scripts\add_calendar_generation_id.py
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Load .env from project root
+env_path = Path(__file__).resolve().parents[1] / '.env'
+load_dotenv(dotenv_path=env_path)
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    raise SystemExit('DATABASE_URL not set in .env')
+
+print('Using DATABASE_URL:', DATABASE_URL)
+sync_db_url = DATABASE_URL
+if DATABASE_URL.startswith('postgresql+asyncpg://'):
+    sync_db_url = DATABASE_URL.replace('postgresql+asyncpg://', 'postgresql://')
+
+engine = create_engine(sync_db_url)
+
+with engine.begin() as conn:
+    print('Running ALTER TABLE to add generation_id if missing...')
+    conn.execute(text(
+        "ALTER TABLE IF EXISTS calendars ADD COLUMN IF NOT EXISTS generation_id UUID"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_calendars_generation_id ON calendars (generation_id)"
+    ))
+
+print('Done.')
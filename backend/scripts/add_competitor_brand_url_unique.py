@@ -0,0 +1,67 @@
+"""
+Simple migration: merge duplicate competitors (same brand_id and url) into the oldest row and add the
+uq_competitors_brand_url unique constraint if it doesn't exist.
+Posts of the duplicates move to the kept row (posts it already has are dropped); their insights are
+not merged, the kept row's aggregates continue from the next scrape.
+Run: python backend\\scripts\\add_competitor_brand_url_unique.py
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Load .env from project root
+env_path = Path(__file__).resolve().parents[1] / '.env'
+load_dotenv(dotenv_path=env_path)
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    raise SystemExit('DATABASE_URL not set in .env')
+
+print('Using DATABASE_URL:', DATABASE_URL)
+sync_db_url = DATABASE_URL
+if DATABASE_URL.startswith('postgresql+asyncpg://'):
+    sync_db_url = DATABASE_URL.replace('postgresql+asyncpg://', 'postgresql://')
+
+engine = create_engine(sync_db_url)
+
+with engine.begin() as conn:
+    exists = conn.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'uq_competitors_brand_url'"
+    )).first()
+    if exists:
+        print('Constraint already present.')
+    else:
+        print('Merging duplicate competitors...')
+        conn.execute(text("""
+            CREATE TEMP TABLE competitor_dupes ON COMMIT DROP AS
+            SELECT id, keeper FROM (
+                SELECT id, first_value(id) OVER (PARTITION BY brand_id, url ORDER BY created_at, id) AS keeper
+                FROM competitors
+            ) ranked
+            WHERE id <> keeper
+        """))
+        # Keep one post per (kept competitor, post_key), preferring the kept competitor's own
+        conn.execute(text("""
+            DELETE FROM competitor_posts WHERE id IN (
+                SELECT id FROM (
+                    SELECT p.id, row_number() OVER (
+                        PARTITION BY COALESCE(d.keeper, p.competitor_id), p.post_key
+                        ORDER BY (d.id IS NOT NULL), p.first_seen_at, p.id
+                    ) AS rn
+                    FROM competitor_posts p LEFT JOIN competitor_dupes d ON d.id = p.competitor_id
+                ) ranked
+                WHERE rn > 1
+            )
+        """))
+        conn.execute(text(
+            "UPDATE competitor_posts p SET competitor_id = d.keeper FROM competitor_dupes d WHERE p.competitor_id = d.id"
+        ))
+        removed = conn.execute(text("DELETE FROM competitors c USING competitor_dupes d WHERE c.id = d.id")).rowcount
+        print(f'Removed {removed} duplicate competitors.')
+        print('Adding unique constraint on (brand_id, url)...')
+        conn.execute(text(
+            "ALTER TABLE competitors ADD CONSTRAINT uq_competitors_brand_url UNIQUE (brand_id, url)"
+        ))
+
+print('Done.')
@@ -0,0 +1,32 @@
+"""
+Simple migration: add url column to competitors table if it doesn't exist.
+New tables (competitor_posts) are created by init_db.py.
+Run: python backend\scripts\add_competitor_url.py
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Load .env from project root
+env_path = Path(__file__).resolve().parents[1] / '.env'
+load_dotenv(dotenv_path=env_path)
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    raise SystemExit('DATABASE_URL not set in .env')
+
+print('Using DATABASE_URL:', DATABASE_URL)
+sync_db_url = DATABASE_URL
+if DATABASE_URL.startswith('postgresql+asyncpg://'):
+    sync_db_url = DATABASE_URL.replace('postgresql+asyncpg://', 'postgresql://')
+
+engine = create_engine(sync_db_url)
+
+with engine.begin() as conn:
+    print('Running ALTER TABLE to add url if missing...')
+    conn.execute(text(
+        "ALTER TABLE IF EXISTS competitors ADD COLUMN IF NOT EXISTS url VARCHAR"
+    ))
+
+print('Done.')
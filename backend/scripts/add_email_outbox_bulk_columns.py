@@ -0,0 +1,31 @@
+"""
+Simple migration: add html_body, attachments and delivered_to columns to email_outbox if they don't exist.
+Run: python backend\scripts\add_email_outbox_bulk_columns.py
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Load .env from project root
+env_path = Path(__file__).resolve().parents[1] / '.env'
+load_dotenv(dotenv_path=env_path)
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+if not DATABASE_URL:
+    raise SystemExit('DATABASE_URL not set in .env')
+
+print('Using DATABASE_URL:', DATABASE_URL)
+sync_db_url = DATABASE_URL
+if DATABASE_URL.startswith('postgresql+asyncpg://'):
+    sync_db_url = DATABASE_URL.replace('postgresql+asyncpg://', 'postgresql://')
+
+engine = create_engine(sync_db_url)
+
+with engine.begin() as conn:
+    print('Running ALTER TABLE to add bulk email columns if missing...')
+    conn.execute(text("ALTER TABLE IF EXISTS email_outbox ADD COLUMN IF NOT EXISTS html_body TEXT"))
+    conn.execute(text("ALTER TABLE IF EXISTS email_outbox ADD COLUMN IF NOT EXISTS attachments JSON"))
+    conn.execute(text("ALTER TABLE IF EXISTS email_outbox ADD COLUMN IF NOT EXISTS delivered_to JSON"))
+
+print('Done.')
@@ -0,0 +1,83 @@
+import os
+import uuid
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.brand import Brand
+from utils.cache import Cache
+
+BRAND_CACHE_TTL = float(os.getenv("BRAND_CACHE_TTL", 600))
+# The full list is re-read more often: a worker that read the table just before another one inserted
+# a brand can store a list that is missing it
+BRAND_LIST_CACHE_TTL = float(os.getenv("BRAND_LIST_CACHE_TTL", 60))
+
+brand_cache = Cache("brands", ttl=BRAND_CACHE_TTL)
+
+
+def brand_row(brand: Brand) -> dict:
+    return {
+        "id": str(brand.id),
+        "name": brand.name,
+        "niche": brand.niche,
+        "tone": brand.tone,
+        "platform": brand.platform,
+        "posting_frequency": brand.posting_frequency,
+    }
+
+
+async def brand_added():
+    """Call after inserting a brand, so no worker keeps serving the old list."""
+    await brand_cache.adelete("all")
+
+
+async def brand_exists(db: AsyncSession, brand_id: uuid.UUID) -> bool:
+    key = f"id:{brand_id}"
+    if await brand_cache.aget(key):
+        return True
+    if await db.get(Brand, brand_id) is None:
+        return False
+    await brand_cache.aset(key, True)
+    return True
+
+
+async def resolve_brand_id(db: AsyncSession, brand_id: Optional[str]) -> Optional[uuid.UUID]:
+    """The brand id from a request (None if not given); 400 if it is malformed, 404 if there is no such brand."""
+    if not brand_id:
+        return None
+    try:
+        brand_uuid = uuid.UUID(brand_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'brand_id' is not a valid id.")
+    if not await brand_exists(db, brand_uuid):
+        raise HTTPException(status_code=404, detail="Brand not found.")
+    return brand_uuid
+
+
+async def brand_id_for_name(db: AsyncSession, name: str, **fields) -> uuid.UUID:
+    """Id of the first brand with this name, creating one with `fields` if there is none."""
+    key = f"name:{name}"
+    cached = await brand_cache.aget(key)
+    if cached is not None:
+        return uuid.UUID(cached)
+    result = await db.execute(select(Brand).where(Brand.name == name))
+    brand = result.scalars().first()
+    if not brand:
+        brand = Brand(name=name, **fields)
+        db.add(brand)
+        await db.commit()
+        await db.refresh(brand)
+        await brand_added()
+    await brand_cache.aset(key, str(brand.id))
+    return brand.id
+
+
+async def list_brand_rows(db: AsyncSession) -> List[dict]:
+    rows = await brand_cache.aget("all")
+    if rows is None:
+        result = await db.execute(select(Brand))
+        rows = [brand_row(b) for b in result.scalars().all()]
+        await brand_cache.aset("all", rows, ttl=BRAND_LIST_CACHE_TTL)
+    return rows
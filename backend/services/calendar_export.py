@@ -0,0 +1,182 @@
+import csv
+import importlib.util
+import io
+import os
+import uuid
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.content_calendar import ContentCalendar
+from services.calendar_render import CSV_COLUMNS, csv_row, ics_header, ics_event, ics_stamp, next_monday, post_date
+
+
+# format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ics": ("text/calendar; charset=utf-8", "ics"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Week rows fetched from the DB per round trip while streaming
+EXPORT_BATCH_ROWS = int(os.getenv("CALENDAR_EXPORT_BATCH_ROWS", 500))
+# Text exports are flushed to the client once this much has been buffered
+EXPORT_CHUNK_BYTES = int(os.getenv("CALENDAR_EXPORT_CHUNK_BYTES", 64 * 1024))
+# Posts per Parquet row group
+PARQUET_ROW_GROUP = int(os.getenv("CALENDAR_EXPORT_PARQUET_ROW_GROUP", 5000))
+
+
+def parquet_available() -> bool:
+    # Parquet export is optional; pyarrow is only imported once a Parquet export is requested
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+async def calendar_exists(db: AsyncSession, calendar_id: uuid.UUID) -> bool:
+    result = await db.execute(select(ContentCalendar.id).where(ContentCalendar.generation_id == calendar_id).limit(1))
+    return result.first() is not None
+
+
+async def iter_calendar_weeks(calendar_id: uuid.UUID = None, brand_id: uuid.UUID = None) -> AsyncIterator[tuple]:
+    """
+    (calendar_id, created_at, week, posts) rows, streamed from a server-side cursor in batches.
+    Opens its own session because the request-scoped one may be closed before streaming starts.
+    """
+    query = select(ContentCalendar.generation_id, ContentCalendar.created_at, ContentCalendar.week, ContentCalendar.posts)
+    if calendar_id is not None:
+        query = query.where(ContentCalendar.generation_id == calendar_id)
+    if brand_id is not None:
+        query = query.where(ContentCalendar.brand_id == brand_id, ContentCalendar.generation_id.isnot(None))
+    query = query.order_by(ContentCalendar.created_at, ContentCalendar.generation_id, ContentCalendar.week)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        async for row in result:
+            yield tuple(row)
+
+
+async def stream_csv(rows: AsyncIterator[tuple], include_calendar: bool = False) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow((["Calendar ID", "Generated At"] if include_calendar else []) + CSV_COLUMNS)
+    async for calendar_id, created_at, week, posts in rows:
+        prefix = [str(calendar_id), created_at.isoformat() if created_at else ""] if include_calendar else []
+        for post in posts or []:
+            writer.writerow(prefix + csv_row(week, post))
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_ics(rows: AsyncIterator[tuple], start: Optional[date] = None,
+                     name: str = "Content Calendar") -> AsyncIterator[bytes]:
+    """Week 1 of each calendar starts on `start`, or the Monday after it was generated."""
+    stamp = ics_stamp()
+    lines = ics_header(name)
+    size = 0
+    async for calendar_id, created_at, week, posts in rows:
+        week_start = start or next_monday(created_at.date() if created_at else None)
+        for position, post in enumerate(posts or []):
+            day = post_date(week_start, week, post.get("day", ""), position)
+            event = ics_event(post, day, f"{calendar_id}-w{week}-{position}@influcrafters", stamp)
+            lines += event
+            size += sum(len(line) for line in event)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ("\r\n".join(lines) + "\r\n").encode("utf-8")
+            lines, size = [], 0
+    lines.append("END:VCALENDAR")
+    yield ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object that collects what ParquetWriter writes so it can be yielded as it goes."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("calendar_id", pa.string()),
+        ("generated_at", pa.timestamp("us")),
+        ("week", pa.int32()),
+        ("day", pa.string()),
+        ("post_type", pa.string()),
+        ("theme", pa.string()),
+        ("caption", pa.string()),
+        ("hashtags", pa.list_(pa.string())),
+    ])
+
+
+async def stream_parquet(rows: AsyncIterator[tuple]) -> AsyncIterator[bytes]:
+    """One row group per PARQUET_ROW_GROUP posts; only the current group is held in memory."""
+    if not parquet_available():
+        raise RuntimeError("Parquet export requires pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _parquet_schema(pa)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    columns = {name: [] for name in schema.names}
+
+    def flush_group():
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    try:
+        async for calendar_id, created_at, week, posts in rows:
+            for post in posts or []:
+                columns["calendar_id"].append(str(calendar_id))
+                columns["generated_at"].append(created_at)
+                columns["week"].append(week)
+                columns["day"].append(post.get("day"))
+                columns["post_type"].append(post.get("post_type"))
+                columns["theme"].append(post.get("theme"))
+                columns["caption"].append(post.get("caption"))
+                columns["hashtags"].append(list(post.get("hashtags") or []))
+            if len(columns["week"]) >= PARQUET_ROW_GROUP:
+                flush_group()
+                yield sink.drain()
+        if columns["week"]:
+            flush_group()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(fmt: str, rows: AsyncIterator[tuple], include_calendar: bool = False,
+                  start: Optional[date] = None, name: str = "Content Calendar") -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        return stream_csv(rows, include_calendar)
+    if fmt == "ics":
+        return stream_ics(rows, start, name)
+    if fmt == "parquet":
+        return stream_parquet(rows)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def export_filename(stem: str, fmt: str) -> str:
+    return f"{stem}-{datetime.utcnow():%Y%m%d}.{EXPORT_FORMATS[fmt][1]}"
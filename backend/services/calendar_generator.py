@@ -2,17 +2,32 @@ import random
 import uuid
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from models.brand import Brand
 from models.content_calendar import ContentCalendar
 from database import get_db
-from sqlalchemy.future import select
 from fastapi import Depends
 import re
-import httpx
+import json
 import os
+from typing import Optional
+from utils.log import get_logger
+from utils.deadline import deadline, deadline_at, ends_at, has_time, remaining
+from utils.governor import outbound
+from utils.profiling import phase
+from services.brand_cache import brand_id_for_name
+
+log = get_logger(__name__)
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct") # Default to Mistral
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", 120))
+OPENROUTER_STREAM_TIMEOUT = float(os.getenv("OPENROUTER_STREAM_TIMEOUT", 60))
+# Seconds for the model calls of one calendar (first draft plus continuations); storing it isn't cut short
+CALENDAR_DEADLINE = float(os.getenv("CALENDAR_DEADLINE", 180))
+
+WEEK_HEADER_RE = re.compile(r"Week\s*\d+:", re.IGNORECASE)
+# A header split across stream deltas starts at most this many characters before the end of the text
+WEEK_HEADER_TAIL = 32
 
 async def call_openrouter_api(prompt: str, max_tokens: int = 200):
     if not OPENROUTER_API_KEY:
@@ -32,11 +47,54 @@ async def call_openrouter_api(prompt: str, max_tokens: int = 200):
         "repetition_penalty": 1.1 # OpenRouter uses repetition_penalty instead of repeat_penalty
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload)
+    import httpx
+    async with httpx.AsyncClient() as client, outbound("openrouter"):
+        response = await client.post(f"{OPENROUTER_BASE_URL}/chat/completions", headers=headers, json=payload,
+                                     timeout=remaining(OPENROUTER_TIMEOUT))
         response.raise_for_status() # Raise an exception for 4xx or 5xx status codes
         return response.json()["choices"][0]["message"]["content"].strip()
 
+async def stream_openrouter_api(prompt: str, max_tokens: int = 200):
+    """Yield content deltas from a streamed (server-sent events) chat completion."""
+    if not OPENROUTER_API_KEY:
+        raise ValueError("OPENROUTER_API_KEY environment variable not set.")
+
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "top_p": 0.95,
+        "top_k": 40,
+        "repetition_penalty": 1.1,
+        "stream": True
+    }
+
+    # Generous read timeout: it only has to cover the gap between two chunks
+    import httpx
+    timeout = httpx.Timeout(remaining(OPENROUTER_STREAM_TIMEOUT), connect=10)
+    async with httpx.AsyncClient(timeout=timeout) as client, outbound("openrouter_stream", provider="openrouter"):
+        async with client.stream("POST", f"{OPENROUTER_BASE_URL}/chat/completions", headers=headers, json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                # Stops the stream once the request's budget is spent
+                remaining()
+                # Lines starting with ":" are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+@phase("parse")
 def parse_calendar_output(output_text, posting_frequency):
     weeks = []
     
@@ -50,7 +108,7 @@ def parse_calendar_output(output_text, posting_frequency):
         
         for i in range(1, len(week_sections), 2):
             if i + 1 >= len(week_sections):
-                print(f"[WARNING] Incomplete week section at index {i}")
+                log.warning("calendar.parse.incomplete_week", index=i)
                 continue
                 
             try:
@@ -63,7 +121,7 @@ def parse_calendar_output(output_text, posting_frequency):
                 
                 # Ensure we have exactly posting_frequency posts per week
                 if len(post_blocks[1:]) != posting_frequency:
-                    print(f"[WARNING] Expected {posting_frequency} posts but found {len(post_blocks[1:])} in week {week_num}")
+                    log.debug("calendar.parse.post_count_mismatch", week=week_num, expected=posting_frequency, found=len(post_blocks[1:]))
                     
                 for post_block in post_blocks[1:]:  # Skip first empty block
                     try:
@@ -89,7 +147,7 @@ def parse_calendar_output(output_text, posting_frequency):
                             "hashtags": [h.strip() for h in hashtags_text.split(',')] if hashtags_text else []
                         })
                     except Exception as e:
-                        print(f"[WARNING] Error parsing post block: {str(e)}")
+                        log.warning("calendar.parse.post_failed", week=week_num, error=str(e))
                         # Add a placeholder post if parsing fails
                         week["posts"].append({
                             "day": "N/A",
@@ -101,29 +159,21 @@ def parse_calendar_output(output_text, posting_frequency):
                 
                 weeks.append(week)
             except Exception as e:
-                print(f"[WARNING] Error parsing week {i}: {str(e)}")
+                log.warning("calendar.parse.week_failed", index=i, error=str(e))
     except Exception as e:
-        print(f"[ERROR] Failed to parse calendar output: {str(e)}")
+        log.error("calendar.parse.failed", output_chars=len(output_text or ""), error=str(e))
         # Return a minimal valid structure
         return [{"week": 1, "posts": [{"day": "N/A", "post_type": "N/A", "theme": "N/A", "caption": "Error parsing calendar", "hashtags": []}]}]
     
     # If no weeks were parsed, return a minimal valid structure
     if not weeks:
-        print("[WARNING] No weeks parsed, returning minimal structure")
+        log.warning("calendar.parse.no_weeks", output_chars=len(output_text or ""))
         return [{"week": 1, "posts": [{"day": "N/A", "post_type": "N/A", "theme": "N/A", "caption": "No content generated", "hashtags": []}]}]
     
     return weeks
 
-async def generate_calendar(
-    brand_name: str,
-    niche: str,
-    platform: str,
-    posting_frequency: int,
-    tone: str,
-    db: AsyncSession = Depends(get_db)
-):
-    print(f"[DEBUG] Generating calendar for {brand_name}")
-    prompt = f"""
+def build_calendar_prompt(brand_name: str, niche: str, platform: str, posting_frequency: int, tone: str) -> str:
+    return f"""
 You are a social media strategist.
 
 Generate a 4-week content calendar for a brand named '{brand_name}' in the '{niche}' niche, for the '{platform}' platform, with exactly {posting_frequency} posts per week (one for each day specified), using a '{tone}' brand voice.
@@ -157,13 +207,24 @@ Day 2 - Post:
 
 Now, generate the 4-week content calendar with exactly {posting_frequency} posts per week (Make sure to include all fields and use relevant themes, captions, and hashtags as well as {posting_frequency} number of contents are created per week.).:
 """
-    print(f"[DEBUG] Generated prompt: {prompt[:200]}...")  # Log first 200 chars of prompt
+
+async def finish_calendar(
+    output_text: Optional[str],
+    brand_name: str,
+    niche: str,
+    platform: str,
+    posting_frequency: int,
+    tone: str,
+    db: AsyncSession,
+    calendar_id: uuid.UUID = None
+):
+    """Parse the model output (asking the model to fill any gaps), fall back to a synthetic calendar, normalize and store."""
     try:
-        print("[DEBUG] Calling OpenRouter API")
-        output_text = await call_openrouter_api(prompt, max_tokens=4000)
-        print(f"[DEBUG] Received API response: {output_text[:200]}...")  # Log first 200 chars
+        if not output_text:
+            raise ValueError("No output from the model")
         calendar_struct = parse_calendar_output(output_text, posting_frequency)
-        print(f"[DEBUG] Parsed calendar structure: {calendar_struct}")
+        log.debug("calendar.parsed", weeks=len(calendar_struct),
+                  posts=sum(len(w.get("posts", [])) for w in calendar_struct))
         # If model returned incomplete weeks or wrong post counts, attempt to ask the model to continue/fill missing parts
         try_count = 0
         max_retries = 2
@@ -175,9 +236,12 @@ Now, generate the 4-week content calendar with exactly {posting_frequency} posts
             return missing_weeks, weeks_with_few_posts
 
         missing_weeks, weeks_with_few_posts = check_completeness(calendar_struct)
-        while (missing_weeks or weeks_with_few_posts) and try_count < max_retries:
+        # A continuation started with less than 10s left would only time out
+        while (missing_weeks or weeks_with_few_posts) and try_count < max_retries and has_time(10):
             try_count += 1
-            print(f"[DEBUG] Detected missing weeks {missing_weeks} or weeks with wrong post counts {weeks_with_few_posts}; requesting continuation (attempt {try_count})")
+            log.info("calendar.continuation_requested", attempt=try_count,
+                     missing_weeks=",".join(map(str, missing_weeks)),
+                     short_weeks=",".join(map(str, weeks_with_few_posts)))
             followup_prompt = ""
             if missing_weeks:
                 followup_prompt += f"Continue the 4-week calendar by producing the missing week numbers: {missing_weeks}. Use the same format as before and include exactly {posting_frequency} posts per week.\n\n"
@@ -187,9 +251,8 @@ Now, generate the 4-week content calendar with exactly {posting_frequency} posts
             followup_prompt = f"The model previously returned the following calendar (possibly incomplete):\n\n{output_text}\n\nPlease continue/fill as requested:\n{followup_prompt}"
             try:
                 continuation = await call_openrouter_api(followup_prompt, max_tokens=2000)
-                print(f"[DEBUG] Received continuation from model: {continuation[:200]}...")
                 cont_struct = parse_calendar_output(continuation, posting_frequency)
-                print(f"[DEBUG] Parsed continuation structure: {cont_struct}")
+                log.debug("calendar.continuation_parsed", output_chars=len(continuation), weeks=len(cont_struct))
                 # Merge continuation weeks into calendar_struct (prefer model-provided weeks)
                 existing_weeks = {int(w.get('week')): w for w in calendar_struct if isinstance(w, dict)}
                 for cw in cont_struct:
@@ -202,11 +265,11 @@ Now, generate the 4-week content calendar with exactly {posting_frequency} posts
                 # Recreate calendar_struct preserving order
                 calendar_struct = [existing_weeks.get(i, {"week": i, "posts": []}) for i in range(1, max(existing_weeks.keys())+1)]
             except Exception as e:
-                print(f"[WARN] Continuation request failed: {e}")
+                log.warning("calendar.continuation_failed", attempt=try_count, error=str(e))
             missing_weeks, weeks_with_few_posts = check_completeness(calendar_struct)
     except Exception as e:
         # If external API fails or parsing fails, fall back to a deterministic synthetic calendar
-        print(f"[WARN] OpenRouter API failed or returned unparsable output: {str(e)}; falling back to synthetic calendar")
+        log.warning("calendar.synthetic_fallback", error=str(e))
         def synthetic_post(week_idx, post_idx):
             return {
                 "day": f"Day {post_idx+1}",
@@ -220,7 +283,6 @@ Now, generate the 4-week content calendar with exactly {posting_frequency} posts
         for w in range(4):
             week_posts = [synthetic_post(w, p) for p in range(posting_frequency)]
             calendar_struct.append({"week": w+1, "posts": week_posts})
-        print(f"[DEBUG] Synthetic calendar created with {len(calendar_struct)} weeks")
     # Normalize to exactly 4 weeks and exactly posting_frequency posts per week
     normalized_weeks = []
     # Build a lookup by week number
@@ -249,11 +311,102 @@ Now, generate the 4-week content calendar with exactly {posting_frequency} posts
     calendar_struct = normalized_weeks
     
     # Store brand if not exists
-    result = await db.execute(select(Brand).where(Brand.name == brand_name))
-    brand = result.scalars().first()
-    if not brand:
-        brand = Brand(name=brand_name, niche=niche, tone=tone, platform=platform)
-        db.add(brand)
-        await db.commit()
-        await db.refresh(brand)
-    return calendar_struct
\ No newline at end of file
+    brand_id = await brand_id_for_name(db, brand_name, niche=niche, tone=tone, platform=platform)
+
+    # Store the weeks so the calendar can be exported later; they share one generation id
+    calendar_id = calendar_id or uuid.uuid4()
+    db.add_all([
+        ContentCalendar(brand_id=brand_id, generation_id=calendar_id, week=w["week"], posts=w["posts"])
+        for w in calendar_struct
+    ])
+    await db.commit()
+    log.info("calendar.stored", calendar_id=calendar_id, brand_id=brand_id, weeks=len(calendar_struct))
+    return calendar_struct
+
+async def generate_calendar(
+    brand_name: str,
+    niche: str,
+    platform: str,
+    posting_frequency: int,
+    tone: str,
+    db: AsyncSession = Depends(get_db),
+    calendar_id: uuid.UUID = None
+):
+    prompt = build_calendar_prompt(brand_name, niche, platform, posting_frequency, tone)
+    log.info("calendar.generate", brand=brand_name, posting_frequency=posting_frequency, prompt_chars=len(prompt))
+    output_text = None
+    with deadline(CALENDAR_DEADLINE):
+        try:
+            output_text = await call_openrouter_api(prompt, max_tokens=4000)
+            log.debug("calendar.model_output", output_chars=len(output_text))
+        except Exception as e:
+            log.warning("calendar.model_failed", error=str(e))
+        return await finish_calendar(output_text, brand_name, niche, platform, posting_frequency, tone, db, calendar_id)
+
+def completed_weeks(output_text: str, posting_frequency: int) -> list:
+    """Weeks whose text is finished, i.e. the next "Week N:" header has already started streaming."""
+    headers = list(WEEK_HEADER_RE.finditer(output_text))
+    if len(headers) < 2:
+        return []
+    return parse_calendar_output(output_text[:headers[-1].start()], posting_frequency)
+
+async def generate_calendar_stream(
+    brand_name: str,
+    niche: str,
+    platform: str,
+    posting_frequency: int,
+    tone: str,
+    db: AsyncSession,
+    calendar_id: uuid.UUID = None
+):
+    """
+    Yields progress events while the model writes the calendar: a "week" event as each week completes,
+    then "done" with the final (normalized, stored) calendar, which may differ from the previews.
+    The model calls share one CALENDAR_DEADLINE budget, as in generate_calendar. The calendar is
+    stored under calendar_id (a new one if not given), which the "done" event reports.
+    """
+    calendar_id = calendar_id or uuid.uuid4()
+    prompt = build_calendar_prompt(brand_name, niche, platform, posting_frequency, tone)
+    log.info("calendar.generate_stream", brand=brand_name, posting_frequency=posting_frequency, prompt_chars=len(prompt))
+    # The budget is entered around each model call rather than held across the yields
+    at = ends_at(CALENDAR_DEADLINE)
+    yield {"event": "status", "message": "Generating calendar..."}
+    output_text = ""
+    scanned = 0
+    sent_weeks = set()
+    deltas = stream_openrouter_api(prompt, max_tokens=4000)
+    try:
+        while True:
+            with deadline_at(at):
+                try:
+                    delta = await deltas.__anext__()
+                except StopAsyncIteration:
+                    break
+            output_text += delta
+            # Only re-parse when a new week header shows up; the text before `scanned` has been searched already
+            new_header = False
+            for match in WEEK_HEADER_RE.finditer(output_text, scanned):
+                new_header = True
+                scanned = match.end()
+            scanned = max(scanned, len(output_text) - WEEK_HEADER_TAIL)
+            if not new_header:
+                continue
+            for week in completed_weeks(output_text, posting_frequency):
+                if week["week"] not in sent_weeks:
+                    sent_weeks.add(week["week"])
+                    yield {"event": "week", "week": week}
+        # The stream has ended, so the last week is complete too
+        if WEEK_HEADER_RE.search(output_text):
+            for week in parse_calendar_output(output_text, posting_frequency):
+                if week["week"] not in sent_weeks:
+                    sent_weeks.add(week["week"])
+                    yield {"event": "week", "week": week}
+    except Exception as e:
+        log.warning("calendar.model_stream_failed", output_chars=len(output_text), error=str(e))
+        yield {"event": "status", "message": "Model unavailable or interrupted; completing the calendar..."}
+    finally:
+        await deltas.aclose()
+    yield {"event": "status", "message": "Finalizing calendar..."}
+    with deadline_at(at):
+        calendar = await finish_calendar(output_text or None, brand_name, niche, platform, posting_frequency, tone, db, calendar_id)
+    yield {"event": "done", "calendar_id": str(calendar_id), "calendar": calendar}
\ No newline at end of file
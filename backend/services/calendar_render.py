@@ -0,0 +1,167 @@
+import csv
+import html
+import io
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# format -> (filename extension, MIME type)
+ATTACHMENT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "ics": ("ics", "text/calendar"),
+    "html": ("html", "text/html"),
+    "txt": ("txt", "text/plain"),
+}
+
+CSV_COLUMNS = ["Week", "Day", "Post Type", "Theme", "Caption", "Hashtags"]
+
+
+def _rows(calendar: list):
+    for week in calendar:
+        for post in week.get("posts", []):
+            yield week, post
+
+
+def calendar_to_text(calendar: list) -> str:
+    lines = []
+    for week in calendar:
+        lines.append(f"Week {week['week']}")
+        for post in week['posts']:
+            lines.append(f"  {post['day']} - {post['post_type']} - {post['theme']}")
+            lines.append(f"    Caption: {post['caption']}")
+            lines.append(f"    Hashtags: {' '.join(post.get('hashtags', []))}")
+        lines.append("")
+    return '\n'.join(lines)
+
+
+def calendar_to_html(calendar: list, title: str = "Your Content Calendar") -> str:
+    esc = html.escape
+    parts = [f"<html><body><h1>{esc(title)}</h1>"]
+    for week in calendar:
+        parts.append(f"<h2>Week {esc(str(week['week']))}</h2>")
+        parts.append('<table border="1" cellpadding="4" cellspacing="0">')
+        parts.append("<tr><th>Day</th><th>Post Type</th><th>Theme</th><th>Caption</th><th>Hashtags</th></tr>")
+        for post in week['posts']:
+            parts.append(
+                f"<tr><td>{esc(post['day'])}</td><td>{esc(post['post_type'])}</td><td>{esc(post['theme'])}</td>"
+                f"<td>{esc(post['caption'])}</td><td>{esc(' '.join(post.get('hashtags', [])))}</td></tr>"
+            )
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def csv_row(week_number, post: dict) -> list:
+    return [week_number, post["day"], post["post_type"], post["theme"],
+            post["caption"], " ".join(post.get("hashtags", []))]
+
+
+def calendar_to_csv(calendar: list) -> str:
+    # Same columns as the CSV download in the frontend
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for week, post in _rows(calendar):
+        writer.writerow(csv_row(week["week"], post))
+    return out.getvalue()
+
+
+def next_monday(today: Optional[date] = None) -> date:
+    today = today or date.today()
+    return today + timedelta(days=(7 - today.weekday()) % 7 or 7)
+
+
+def post_date(start: date, week_number: int, day: str, position: int) -> date:
+    """Calendar date for a post; days that aren't weekday names fall back to the post's order in the week."""
+    day_name = (day or "").strip().lower()
+    offset = next((i for i, name in enumerate(WEEKDAYS) if day_name.startswith(name[:3])), min(position, 6))
+    return start + timedelta(weeks=max(int(week_number), 1) - 1, days=offset)
+
+
+def _ics_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_fold(line: str) -> List[str]:
+    # RFC 5545 lines are limited to 75 octets; continuation lines start with a space
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return [line]
+    folded, chunk = [], ""
+    for ch in line:
+        if len((chunk + ch).encode("utf-8")) > (75 if not folded else 74):
+            folded.append(chunk)
+            chunk = ""
+        chunk += ch
+    folded.append(chunk)
+    return [folded[0]] + [" " + part for part in folded[1:]]
+
+
+def ics_header(name: str = "Content Calendar") -> List[str]:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Influcrafters//Content Calendar//EN",
+             f"X-WR-CALNAME:{_ics_text(name)}"]
+    return [folded for line in lines for folded in _ics_fold(line)]
+
+
+def ics_event(post: dict, day: date, uid: str, stamp: str) -> List[str]:
+    """Folded lines of one all-day VEVENT for a post."""
+    description = post["caption"]
+    if post.get("hashtags"):
+        description += "\n" + " ".join(post["hashtags"])
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{_ics_text(post['post_type'] + ': ' + post['theme'])}",
+        f"DESCRIPTION:{_ics_text(description)}",
+        "END:VEVENT",
+    ]
+    return [folded for line in lines for folded in _ics_fold(line)]
+
+
+def ics_stamp() -> str:
+    return datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+
+
+def calendar_to_ics(calendar: list, start: Optional[date] = None, name: str = "Content Calendar") -> str:
+    """All-day VEVENT per post, week 1 starting on `start` (next Monday by default)."""
+    start = start or next_monday()
+    stamp = ics_stamp()
+    lines = ics_header(name)
+    for week in calendar:
+        for position, post in enumerate(week.get("posts", [])):
+            day = post_date(start, week["week"], post.get("day", ""), position)
+            lines += ics_event(post, day, f"{day:%Y%m%d}-w{week['week']}-{position}@influcrafters", stamp)
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def render_attachments(calendar: list, formats: List[str], start: Optional[date] = None,
+                       basename: str = "content-calendar") -> List[Dict]:
+    """Render each requested file format once; the result is shared by every recipient of the email."""
+    renderers = {
+        "csv": lambda: calendar_to_csv(calendar),
+        "ics": lambda: calendar_to_ics(calendar, start),
+        "html": lambda: calendar_to_html(calendar),
+        "txt": lambda: calendar_to_text(calendar),
+    }
+    attachments = []
+    for fmt in dict.fromkeys(formats):
+        if fmt not in ATTACHMENT_FORMATS:
+            raise ValueError(f"Unsupported attachment format: {fmt}")
+        ext, content_type = ATTACHMENT_FORMATS[fmt]
+        attachments.append({"filename": f"{basename}.{ext}", "content_type": content_type, "content": renderers[fmt]()})
+    return attachments
+
+
+def render_email(calendar: list, subject: str, formats: List[str] = None,
+                 start: Optional[date] = None) -> Tuple[str, str, List[Dict]]:
+    """(text body, html body, attachments) for a calendar email."""
+    return (
+        calendar_to_text(calendar),
+        calendar_to_html(calendar, subject),
+        render_attachments(calendar, formats or [], start),
+    )
@@ -0,0 +1,283 @@
+import asyncio
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, unquote
+from services.competitor_scraper import (
+    fetch_competitor,
+    parse_off_loop,
+    XML_CONTENT_TYPES,
+    summarize_posts,
+    PARSER_BACKENDS,
+    PARSER_BACKEND,
+    HTML_PARSER,
+    SCRAPE_TIMEOUT,
+)
+
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 30))
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", 3))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 4))
+# Sitemaps can list tens of thousands of URLs; keep the most recent ones
+CRAWL_MAX_SITEMAP_POSTS = int(os.getenv("CRAWL_MAX_SITEMAP_POSTS", 1000))
+
+# Tried on the site's origin when the page doesn't advertise a feed
+FEED_PATHS = ("/feed", "/rss", "/rss.xml", "/feed.xml", "/atom.xml", "/index.xml")
+FEED_TYPES = ("application/rss+xml", "application/atom+xml", "application/feed+json")
+
+LINK_STRAINER_TAGS = ["link", "a"]
+PAGINATION_RE = re.compile(r"(/page/\d+/?$)|([?&](page|paged|p)=\d+)", re.IGNORECASE)
+
+
+def _local(tag: str) -> str:
+    # "{http://www.w3.org/2005/Atom}entry" -> "entry"
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(el, *names) -> Optional[str]:
+    for child in el:
+        if _local(child.tag) in names and child.text and child.text.strip():
+            return child.text.strip()
+    return None
+
+
+def _normalize_date(raw: Optional[str]) -> Optional[str]:
+    if not raw:
+        return None
+    try:
+        # RSS uses RFC 822 dates
+        return parsedate_to_datetime(raw).isoformat()
+    except (TypeError, ValueError, IndexError):
+        return raw  # Atom / sitemaps are already ISO 8601
+
+
+def parse_feed(xml_text: bytes, base_url: str) -> List[Dict]:
+    """Posts from an RSS 2.0, RSS 1.0 (RDF) or Atom document."""
+    root = ET.fromstring(xml_text)
+    posts = []
+    for el in root.iter():
+        kind = _local(el.tag)
+        if kind not in ("item", "entry"):
+            continue
+        link = _child_text(el, "link")
+        if kind == "entry" or not link:
+            # Atom puts the URL in <link href="..."/>, preferring rel="alternate"
+            for child in el:
+                if _local(child.tag) == "link" and child.get("href") and child.get("rel", "alternate") == "alternate":
+                    link = child.get("href")
+                    break
+        posts.append({
+            "title": _child_text(el, "title") or "",
+            "url": urljoin(base_url, link) if link else base_url,
+            "date": _normalize_date(_child_text(el, "pubDate", "published", "updated", "date"))
+        })
+    return posts
+
+
+def parse_sitemap(xml_text: bytes) -> Tuple[List[Tuple[str, Optional[str]]], List[str]]:
+    """Returns ([(page_url, lastmod)], [child_sitemap_url]) for a urlset or sitemapindex."""
+    root = ET.fromstring(xml_text)
+    pages, children = [], []
+    for el in root:
+        loc = _child_text(el, "loc")
+        if not loc:
+            continue
+        if _local(el.tag) == "sitemap":
+            children.append(loc)
+        elif _local(el.tag) == "url":
+            pages.append((loc, _child_text(el, "lastmod")))
+    return pages, children
+
+
+def title_from_url(url: str) -> str:
+    slug = unquote(urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1])
+    slug = re.sub(r"\.\w+$", "", slug)
+    return re.sub(r"[-_]+", " ", slug).strip()
+
+
+def discover_links(html: str, page_url: str) -> Dict[str, List[str]]:
+    """Feed links advertised in <head>, plus rel=next / numbered pagination links."""
+    from bs4 import BeautifulSoup, SoupStrainer  # imported on first use to keep app startup light
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer(LINK_STRAINER_TAGS))
+    feeds, pagination = [], []
+    host = urlsplit(page_url).netloc
+    for tag in soup.find_all(["link", "a"], href=True):
+        rel = [r.lower() for r in (tag.get("rel") or [])]
+        href = urljoin(page_url, tag["href"])
+        if tag.name == "link" and "alternate" in rel and (tag.get("type") or "").lower() in FEED_TYPES:
+            feeds.append(href)
+        elif "next" in rel or (urlsplit(href).netloc == host and PAGINATION_RE.search(href)):
+            pagination.append(href.split("#", 1)[0])
+    return {"feeds": list(dict.fromkeys(feeds)), "pagination": list(dict.fromkeys(pagination))}
+
+
+async def _get(url: str, timeout: float):
+    """Raw bytes of an XML/text resource (feed, sitemap, robots.txt), or None."""
+    try:
+        response = await fetch_competitor(url, timeout, content_types=XML_CONTENT_TYPES, decode=False)
+    except Exception:
+        return None
+    return response if response.status_code == 200 else None
+
+
+async def _get_text(url: str, timeout: float) -> Optional[str]:
+    """Decoded HTML page, or None."""
+    try:
+        response = await fetch_competitor(url, timeout)
+    except Exception:
+        return None
+    return response.text if response.status_code == 200 else None
+
+
+async def _try_feeds(candidates: List[str], max_fetches: int, concurrency: int,
+                     timeout: float) -> Tuple[int, Optional[str], List[Dict]]:
+    """Probe candidates in order, `concurrency` at a time, stopping at the first batch with a feed; returns (fetched, url, posts)."""
+    fetched = 0
+    candidates = candidates[:max(0, max_fetches)]
+    for start in range(0, len(candidates), concurrency):
+        batch = candidates[start:start + concurrency]
+        responses = await asyncio.gather(*(_get(feed_url, timeout) for feed_url in batch))
+        fetched += len(batch)
+        for feed_url, response in zip(batch, responses):
+            if response is None or b"<" not in response.content[:200]:
+                continue
+            try:
+                # Hand XML parsers bytes so they honour the document's own encoding declaration
+                posts = await parse_off_loop(parse_feed, response.content, feed_url)
+            except Exception:
+                continue
+            if posts:
+                return fetched, feed_url, posts
+    return fetched, None, []
+
+
+async def _try_sitemaps(url: str, max_fetches: int, timeout: float) -> Tuple[int, List[Dict]]:
+    """Returns (fetched, posts); robots.txt and every sitemap count against max_fetches."""
+    if max_fetches <= 0:
+        return 0, []
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    # Only keep pages under the path we were pointed at (e.g. /blog/) when there is one
+    prefix = parts.path.rstrip("/")
+    frontier = deque()
+    robots = await _get(f"{origin}/robots.txt", timeout)
+    if robots:
+        for line in robots.content.decode("utf-8", errors="replace").splitlines():
+            if line.lower().startswith("sitemap:"):
+                frontier.append(line.split(":", 1)[1].strip())
+    if not frontier:
+        frontier.append(f"{origin}/sitemap.xml")
+
+    seen, entries, fetched = set(), [], 1
+    while frontier and fetched < max_fetches:
+        sitemap_url = frontier.popleft()
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        fetched += 1
+        response = await _get(sitemap_url, timeout)
+        if response is None:
+            continue
+        try:
+            pages, children = await parse_off_loop(parse_sitemap, response.content)
+        except Exception:
+            continue
+        frontier.extend(c for c in children if c not in seen)
+        entries.extend(
+            (loc, lastmod) for loc, lastmod in pages
+            if urlsplit(loc).path.startswith(prefix + "/") and urlsplit(loc).path.rstrip("/") != prefix
+        )
+
+    # Undated entries carry no cadence information; sort the rest newest first and cap
+    dated = sorted((e for e in entries if e[1]), key=lambda e: e[1], reverse=True)[:CRAWL_MAX_SITEMAP_POSTS]
+    posts = [{"title": title_from_url(loc), "url": loc, "date": lastmod} for loc, lastmod in dated]
+    return fetched, posts
+
+
+async def _crawl_archive(url: str, first_html: str, links: Dict, fetched: int, max_pages: int, max_depth: int,
+                         concurrency: int, timeout: float) -> Tuple[int, List[Dict]]:
+    """Posts from the first page and its pagination; `fetched` pages already count against max_pages."""
+    extract = PARSER_BACKENDS[PARSER_BACKEND]
+    try:
+        posts = list(await parse_off_loop(extract, first_html, url))
+    except Exception:
+        posts = []
+    seen = {url}
+    frontier = deque()
+    if max_depth > 0:
+        for link in links["pagination"]:
+            if link not in seen and len(frontier) < max_pages - fetched:
+                seen.add(link)
+                frontier.append((link, 1))
+
+    while frontier and fetched < max_pages:
+        batch = []
+        while frontier and len(batch) < min(concurrency, max_pages - fetched):
+            batch.append(frontier.popleft())
+        pages = await asyncio.gather(*(_get_text(page_url, timeout) for page_url, _ in batch))
+        fetched += len(batch)
+        for (page_url, depth), html in zip(batch, pages):
+            if not html:
+                continue
+            try:
+                posts.extend(await parse_off_loop(extract, html, page_url))
+                if depth >= max_depth:
+                    continue
+                page_links = await asyncio.to_thread(discover_links, html, page_url)
+            except Exception:
+                # One unparseable archive page doesn't fail the crawl
+                continue
+            for link in page_links["pagination"]:
+                # Bounded frontier: never queue more than we could still fetch
+                if link not in seen and len(frontier) < max_pages - fetched:
+                    seen.add(link)
+                    frontier.append((link, depth + 1))
+    return fetched, posts
+
+
+def _dedupe(posts: List[Dict], page_url: str) -> List[Dict]:
+    unique = {}
+    for post in posts:
+        key = post["url"] if post["url"] != page_url else f"{page_url}#{post['title']}"
+        unique.setdefault(key, post)
+    return list(unique.values())
+
+
+async def crawl_competitor(url: str, max_pages: int = CRAWL_MAX_PAGES, max_depth: int = CRAWL_MAX_DEPTH,
+                           concurrency: int = CRAWL_CONCURRENCY, timeout: float = SCRAPE_TIMEOUT) -> dict:
+    """
+    Collect a competitor's post history, cheapest source first:
+    RSS/Atom feed, then sitemap.xml, then following the paginated HTML archive. Every request,
+    including probes that find nothing, counts against max_pages.
+    """
+    html = await _get_text(url, timeout)
+    if html is None:
+        return {"url": url, "error": "Failed to fetch or parse the URL."}
+    try:
+        links = await asyncio.to_thread(discover_links, html, url)
+    except Exception:
+        return {"url": url, "error": "Failed to fetch or parse the URL."}
+
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    fetched = 1
+    # Advertised feeds first; the well-known paths are only guessed at when none of them works
+    well_known = [origin + path for path in FEED_PATHS if origin + path not in links["feeds"]]
+    for candidates in (links["feeds"], well_known):
+        probes, feed_url, posts = await _try_feeds(candidates, max_pages - fetched, concurrency, timeout)
+        fetched += probes
+        if posts:
+            return {"url": url, "source": "feed", "source_url": feed_url, "pages_fetched": fetched,
+                    **summarize_posts(_dedupe(posts, url))}
+
+    probes, posts = await _try_sitemaps(url, max_pages - fetched, timeout)
+    fetched += probes
+    if posts:
+        return {"url": url, "source": "sitemap", "pages_fetched": fetched,
+                **summarize_posts(_dedupe(posts, url))}
+
+    fetched, posts = await _crawl_archive(url, html, links, fetched, max_pages, max_depth, concurrency, timeout)
+    return {"url": url, "source": "archive", "pages_fetched": fetched,
+            **summarize_posts(_dedupe(posts, url))}
@@ -1,16 +1,73 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import codecs
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
 from collections import Counter
 import re
 from datetime import datetime
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, AsyncIterator
+from urllib.parse import urlsplit
+from services.http_cache import http_cache
+from utils.governor import outbound
+from utils.profiling import phase
+
+if TYPE_CHECKING:
+    import httpx
+
+SCRAPE_MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", 10))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv("SCRAPE_PER_HOST_LIMIT", 2))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", 10))
+# Bodies larger than this are abandoned mid-download instead of being buffered
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", 5 * 1024 * 1024))
+# Pages at least this large are parsed in a worker process; smaller ones aren't worth the IPC
+SCRAPE_PROCESS_PARSE_MIN_BYTES = int(os.getenv("SCRAPE_PROCESS_PARSE_MIN_BYTES", 256 * 1024))
+SCRAPE_PARSE_WORKERS = int(os.getenv("SCRAPE_PARSE_WORKERS", 2))
+
+# Content-type fragments accepted for each kind of document; an empty header is allowed through
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+XML_CONTENT_TYPES = ("xml", "rss", "atom", "text/plain", "text/html")
+
+# Parsing backends: "lxml" walks the tree with lxml.html directly, "bs4" goes through BeautifulSoup.
+# lxml is several times faster; fall back to bs4 + html.parser when it isn't installed.
+# Both (and httpx) are imported on first use, not when the app starts.
+if importlib.util.find_spec("lxml") is not None:
+    DEFAULT_PARSER_BACKEND = "lxml"
+    DEFAULT_HTML_PARSER = "lxml"
+else:
+    DEFAULT_PARSER_BACKEND = "bs4"
+    DEFAULT_HTML_PARSER = "html.parser"
+PARSER_BACKEND = os.getenv("COMPETITOR_PARSER_BACKEND", DEFAULT_PARSER_BACKEND)
+HTML_PARSER = os.getenv("COMPETITOR_HTML_PARSER", DEFAULT_HTML_PARSER)
+
+# Only these subtrees are ever inspected, so skip building nodes for the rest of the page
+POST_STRAINER_TAGS = ("article", "h2", "h3")
+
+STOPWORDS = frozenset(['the','and','of','to','in','a','for','on','with','at','by','an','is','from','as','it','that','this','be','are','was','or','but','not','your','you','we','our'])
+
+class ScrapeRejected(Exception):
+    """The response was refused before or while downloading (wrong content type, over the byte budget)."""
 
-def scrape_competitor(url: str) -> dict:
-    try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-    except Exception:
-        return {"error": "Failed to fetch or parse the URL."}
+
+def _check_content_type(content_type: str, allowed) -> None:
+    content_type = (content_type or "").lower()
+    if content_type and allowed and not any(fragment in content_type for fragment in allowed):
+        raise ScrapeRejected(f"Unsupported content type: {content_type.split(';')[0]}")
+
+
+def _check_declared_length(headers, max_bytes: int) -> None:
+    declared = headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ScrapeRejected(f"Page exceeds the {max_bytes} byte limit.")
+
+
+def extract_posts_bs4(html: str, url: str, parser: str = None, strainer_tags=POST_STRAINER_TAGS) -> List[Dict]:
+    from bs4 import BeautifulSoup, SoupStrainer
+    strainer = SoupStrainer(list(strainer_tags)) if strainer_tags else None
+    soup = BeautifulSoup(html, parser or HTML_PARSER, parse_only=strainer)
 
     # Try to find articles/posts
     articles = soup.find_all(['article'])
@@ -19,8 +76,6 @@ def scrape_competitor(url: str) -> dict:
         articles = soup.find_all(['h2', 'h3'])
 
     posts = []
-    title_words = []
-    dates = []
     for art in articles:
         # Try to extract title
         title = None
@@ -48,36 +103,98 @@ def scrape_competitor(url: str) -> dict:
             a = art.find('a', href=True)
             if a:
                 link = a['href']
-        if title:
-            title_words.extend(re.findall(r'\w+', title.lower()))
         posts.append({
             "title": title or "",
             "url": link or url,
             "date": date or None
         })
-        if date:
-            try:
-                dates.append(datetime.fromisoformat(date[:19]))
-            except Exception:
-                pass
+    return posts
+
+def _lxml_text(el) -> str:
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return "".join(t.strip() for t in el.itertext())
+
+def extract_posts_lxml(html: str, url: str) -> List[Dict]:
+    import lxml.html
+    try:
+        root = lxml.html.fromstring(html)
+    except ValueError:
+        # Strings carrying an XML encoding declaration must be handed over as bytes
+        try:
+            root = lxml.html.fromstring(html.encode("utf-8"))
+        except lxml.etree.ParserError:
+            return []  # empty document
+    except lxml.etree.ParserError:
+        return []  # empty document
+
+    posts = []
+    articles = root.xpath("//article")
+    if articles:
+        for art in articles:
+            h = art.xpath("(.//*[self::h1 or self::h2 or self::h3])[1]")
+            a = art.xpath("(.//a[@href])[1]")
+            time_tag = art.xpath("(.//time)[1]")
+            date = None
+            if time_tag:
+                date = time_tag[0].get("datetime")
+                if date is None:
+                    date = _lxml_text(time_tag[0])
+            posts.append({
+                "title": (_lxml_text(h[0]) if h else None) or "",
+                "url": (a[0].get("href") if a else None) or url,
+                "date": date or None
+            })
+    else:
+        # Fallback: headings in document order
+        for heading in root.xpath("//h2 | //h3"):
+            a = heading.xpath("(.//a[@href])[1]")
+            posts.append({
+                "title": _lxml_text(heading),
+                "url": (a[0].get("href") if a else None) or url,
+                "date": None
+            })
+    return posts
+
+PARSER_BACKENDS = {
+    "bs4": extract_posts_bs4,
+    "lxml": extract_posts_lxml,
+}
+
+def parse_post_date(raw: str):
+    try:
+        return datetime.fromisoformat(raw[:19])
+    except Exception:
+        return None
+
+def format_frequency(post_count: int, first: datetime, last: datetime) -> str:
+    days = (last - first).days or 1
+    freq = post_count / days
+    if freq >= 1:
+        return f"{freq:.1f} posts/day"
+    return f"{(7*freq):.1f} posts/week"
+
+def title_keywords(title: str) -> List[str]:
+    return [w for w in re.findall(r'\w+', title.lower()) if w not in STOPWORDS and len(w) > 2]
+
+def summarize_posts(posts: List[Dict]) -> dict:
+    keywords = []
+    dates = []
+    for post in posts:
+        if post["title"]:
+            keywords.extend(title_keywords(post["title"]))
+        if post["date"]:
+            date = parse_post_date(post["date"])
+            if date:
+                dates.append(date)
     # Stats
     total_posts = len(posts)
     avg_title_length = int(sum(len(p['title'].split()) for p in posts) / total_posts) if total_posts else 0
     # Posting frequency
-    estimated_frequency = None
     if len(dates) > 1:
-        dates.sort()
-        days = (dates[-1] - dates[0]).days or 1
-        freq = total_posts / days
-        if freq >= 1:
-            estimated_frequency = f"{freq:.1f} posts/day"
-        else:
-            estimated_frequency = f"{(7*freq):.1f} posts/week"
+        estimated_frequency = format_frequency(total_posts, min(dates), max(dates))
     else:
         estimated_frequency = "Unknown"
     # Top keywords
-    stopwords = set(['the','and','of','to','in','a','for','on','with','at','by','an','is','from','as','it','that','this','be','are','was','or','but','not','your','you','we','our'])
-    keywords = [w for w in title_words if w not in stopwords and len(w) > 2]
     top_keywords = [w for w, _ in Counter(keywords).most_common(5)]
     return {
         "total_posts": total_posts,
@@ -85,4 +202,195 @@ def scrape_competitor(url: str) -> dict:
         "estimated_frequency": estimated_frequency,
         "top_keywords": top_keywords,
         "posts": posts
-    } 
\ No newline at end of file
+    }
+
+def parse_competitor_html(html: str, url: str, backend: str = None) -> dict:
+    extract = PARSER_BACKENDS[backend or PARSER_BACKEND]
+    return summarize_posts(extract(html, url))
+
+
+class ScrapeLimiter:
+    """
+    Per-host cap so one site isn't hammered. The process-wide cap (SCRAPE_MAX_CONCURRENCY) is the
+    governor's competitor_site limit, which also lets interactive scrapes go ahead of batch ones.
+    A host's entry is dropped once nobody is using or waiting for it, so only busy hosts are kept.
+    """
+
+    def __init__(self, per_host: int = SCRAPE_PER_HOST_LIMIT):
+        self.per_host = per_host
+        # host -> [semaphore, scrapes holding or waiting for it]
+        self._hosts: Dict[str, list] = {}
+
+    @asynccontextmanager
+    async def host(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._hosts[host]
+
+
+_client = None
+_limiter = None
+
+def get_async_client() -> "httpx.AsyncClient":
+    # One pooled client for the whole process so connections are reused across requests
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+        _client = httpx.AsyncClient(
+            timeout=SCRAPE_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=SCRAPE_MAX_CONCURRENCY, max_keepalive_connections=SCRAPE_MAX_CONCURRENCY)
+        )
+    return _client
+
+def get_limiter() -> ScrapeLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = ScrapeLimiter()
+    return _limiter
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+class FetchedPage:
+    """Status, headers and the capped body of a streamed response."""
+    __slots__ = ("url", "status_code", "headers", "text", "content")
+
+    def __init__(self, url, status_code, headers, text=None, content=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.content = content
+
+
+def _lookup_codec(name):
+    try:
+        return codecs.lookup(name).name if name else None
+    except LookupError:
+        return None
+
+
+async def _read_capped(response: "httpx.Response", max_bytes: int, decode: bool):
+    # Decode chunk by chunk so we never hold the raw bytes and the text of a large page at once
+    decoder = None
+    if decode:
+        codec = _lookup_codec(response.charset_encoding) or "utf-8"
+        decoder = codecs.getincrementaldecoder(codec)(errors="replace")
+    parts, size = [], 0
+    async for chunk in response.aiter_bytes():
+        size += len(chunk)
+        if size > max_bytes:
+            raise ScrapeRejected(f"Page exceeds the {max_bytes} byte limit.")
+        parts.append(decoder.decode(chunk) if decoder else chunk)
+    if decoder:
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+    return b"".join(parts)
+
+
+async def fetch_competitor(url: str, timeout: float = SCRAPE_TIMEOUT, headers: Dict[str, str] = None,
+                           max_bytes: int = SCRAPE_MAX_BYTES, content_types=HTML_CONTENT_TYPES,
+                           decode: bool = True) -> FetchedPage:
+    """
+    Stream a page through the shared client and limiter. Non-200 responses come back without a body;
+    wrong content types and bodies over max_bytes raise ScrapeRejected before the rest is downloaded.
+    With decode=False the raw bytes are returned in .content (XML parsers want those).
+    """
+    limiter = get_limiter()
+
+    async def fetch():
+        async with get_async_client().stream("GET", url, timeout=timeout, headers=headers) as response:
+            if response.status_code != 200:
+                return FetchedPage(str(response.url), response.status_code, response.headers)
+            _check_content_type(response.headers.get("Content-Type"), content_types)
+            _check_declared_length(response.headers, max_bytes)
+            body = await _read_capped(response, max_bytes, decode)
+            if decode:
+                return FetchedPage(str(response.url), 200, response.headers, text=body)
+            return FetchedPage(str(response.url), 200, response.headers, content=body)
+
+    async with limiter.host(url):
+        # The histogram shows fetch time only; waiting for a slot is recorded as governor wait
+        async with outbound("competitor_site"):
+            # wait_for bounds the whole exchange, including servers that trickle bytes
+            return await asyncio.wait_for(fetch(), timeout)
+
+
+_parse_pool = None
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn: forking a process that is running an event loop and thread pools is not safe
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=SCRAPE_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+async def parse_off_loop(fn, html: str, *args):
+    """Run a CPU-bound parse without blocking the event loop: large pages in a worker process, small ones in a thread."""
+    with phase("parse"):
+        if SCRAPE_PARSE_WORKERS > 0 and len(html) >= SCRAPE_PROCESS_PARSE_MIN_BYTES:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(get_parse_pool(), fn, html, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start a fresh pool next time and finish this one in a thread
+                shutdown_parse_pool()
+        return await asyncio.to_thread(fn, html, *args)
+
+
+async def scrape_competitor_async(url: str, timeout: float = SCRAPE_TIMEOUT) -> dict:
+    cached = await asyncio.to_thread(http_cache.get, url)
+    try:
+        response = await fetch_competitor(url, timeout, http_cache.conditional_headers(cached))
+    except asyncio.TimeoutError:
+        return {"url": url, "error": "Timed out fetching the URL."}
+    except ScrapeRejected as e:
+        return {"url": url, "error": str(e)}
+    except Exception:
+        return {"url": url, "error": "Failed to fetch or parse the URL."}
+    if response.status_code == 304 and cached:
+        http_cache.hit(url)
+        return {"url": url, **cached["result"]}
+    http_cache.miss()
+    if response.status_code != 200:
+        return {"url": url, "error": f"Fetching the URL returned HTTP {response.status_code}."}
+    try:
+        result = await parse_off_loop(parse_competitor_html, response.text, url)
+    except Exception:
+        return {"url": url, "error": "Failed to fetch or parse the URL."}
+    await asyncio.to_thread(
+        http_cache.put, url, response.headers.get("ETag"), response.headers.get("Last-Modified"), result
+    )
+    return {"url": url, **result}
+
+async def scrape_competitors(urls: List[str], timeout: float = SCRAPE_TIMEOUT) -> AsyncIterator[dict]:
+    """Scrape many URLs concurrently, yielding each result as soon as it finishes."""
+    tasks = [asyncio.create_task(scrape_competitor_async(url, timeout)) for url in dict.fromkeys(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream: don't leave fetches running
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,143 @@
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict
+from urllib.parse import urlsplit
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.competitor import Competitor
+from models.competitor_post import CompetitorPost
+from services.competitor_scraper import parse_post_date, format_frequency, title_keywords
+from services.keyword_index import index_new_posts
+
+# Keyword counts kept in Competitor.insights are trimmed to this many entries to bound the JSON size
+MAX_TRACKED_KEYWORDS = 500
+# Times a scrape is re-diffed after a concurrent scrape of the same page stored some of its posts first
+PERSIST_ATTEMPTS = 3
+
+
+def post_key(post: Dict, page_url: str) -> str:
+    # Posts without their own link fall back to the page URL, so add the title to tell them apart
+    if post.get("url") and post["url"] != page_url:
+        return post["url"]
+    return f"{page_url}#{post.get('title', '')}"
+
+
+async def get_or_create_competitor(db: AsyncSession, brand_id: uuid.UUID, url: str, name: str = None) -> Competitor:
+    lookup = select(Competitor).where(Competitor.brand_id == brand_id, Competitor.url == url)
+    competitor = (await db.execute(lookup)).scalars().first()
+    if competitor is None:
+        # Concurrent scrapes of the same page can both get here; the (brand_id, url) constraint lets one insert win
+        insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+        await db.execute(
+            insert(Competitor)
+            .values(brand_id=brand_id, url=url, name=name or urlsplit(url).netloc or url, insights={})
+            .on_conflict_do_nothing(index_elements=["brand_id", "url"])
+        )
+        competitor = (await db.execute(lookup)).scalars().one()
+    return competitor
+
+
+def update_insights(insights: dict, new_posts: List[CompetitorPost]) -> dict:
+    """Fold newly inserted posts into the running aggregates; previously stored posts are never revisited."""
+    insights = dict(insights or {})
+    total = insights.get("total_posts", 0) + len(new_posts)
+    title_words = insights.get("title_word_total", 0) + sum(len((p.title or "").split()) for p in new_posts)
+    keyword_counts = Counter(insights.get("keyword_counts", {}))
+    for p in new_posts:
+        if p.title:
+            keyword_counts.update(title_keywords(p.title))
+
+    dated = [p.published_at for p in new_posts if p.published_at]
+    first = insights.get("first_post_date")
+    last = insights.get("last_post_date")
+    if dated:
+        first_dt = min(datetime.fromisoformat(first), min(dated)) if first else min(dated)
+        last_dt = max(datetime.fromisoformat(last), max(dated)) if last else max(dated)
+        first, last = first_dt.isoformat(), last_dt.isoformat()
+    dated_posts = insights.get("dated_posts", 0) + len(dated)
+
+    if dated_posts > 1 and first and last:
+        estimated_frequency = format_frequency(dated_posts, datetime.fromisoformat(first), datetime.fromisoformat(last))
+    else:
+        estimated_frequency = "Unknown"
+
+    insights.update({
+        "total_posts": total,
+        "title_word_total": title_words,
+        "avg_title_length": int(title_words / total) if total else 0,
+        "dated_posts": dated_posts,
+        "first_post_date": first,
+        "last_post_date": last,
+        "estimated_frequency": estimated_frequency,
+        "keyword_counts": dict(keyword_counts.most_common(MAX_TRACKED_KEYWORDS)),
+        "top_keywords": [w for w, _ in keyword_counts.most_common(5)],
+    })
+    return insights
+
+
+async def _persist(db: AsyncSession, brand_id: uuid.UUID, url: str, posts: List[Dict], name: str = None) -> dict:
+    competitor = await get_or_create_competitor(db, brand_id, url, name)
+
+    candidates = {}
+    for post in posts:
+        candidates.setdefault(post_key(post, url), post)
+
+    # Only look up the keys on this page, not the competitor's whole history
+    existing = set()
+    if candidates:
+        result = await db.execute(
+            select(CompetitorPost.post_key).where(
+                CompetitorPost.competitor_id == competitor.id,
+                CompetitorPost.post_key.in_(list(candidates))
+            )
+        )
+        existing = set(result.scalars().all())
+
+    new_posts = [
+        CompetitorPost(
+            competitor_id=competitor.id,
+            post_key=key,
+            url=post.get("url"),
+            title=post.get("title") or None,
+            published_at=parse_post_date(post["date"]) if post.get("date") else None
+        )
+        for key, post in candidates.items() if key not in existing
+    ]
+    db.add_all(new_posts)
+
+    insights = update_insights(competitor.insights, new_posts)
+    insights["last_scraped_at"] = datetime.utcnow().isoformat()
+    insights["scrape_count"] = insights.get("scrape_count", 0) + 1
+    insights["last_new_posts"] = len(new_posts)
+    # Assign a new dict so SQLAlchemy sees the JSON column as changed
+    competitor.insights = insights
+    await db.commit()
+    index_new_posts(brand_id, new_posts)
+    return {"competitor_id": str(competitor.id), "new_posts": len(new_posts), "insights": public_insights(insights)}
+
+
+async def persist_scrape(db: AsyncSession, brand_id: uuid.UUID, url: str, posts: List[Dict], name: str = None) -> dict:
+    for attempt in range(PERSIST_ATTEMPTS):
+        try:
+            return await _persist(db, brand_id, url, posts, name)
+        except IntegrityError:
+            # A concurrent scrape inserted some of the same posts first; diff again against what it stored
+            await db.rollback()
+            if attempt == PERSIST_ATTEMPTS - 1:
+                raise
+
+
+def public_insights(insights: dict) -> dict:
+    return {k: v for k, v in (insights or {}).items() if k not in ("keyword_counts", "title_word_total")}
+
+
+async def list_competitors(db: AsyncSession, brand_id: uuid.UUID) -> List[dict]:
+    result = await db.execute(select(Competitor).where(Competitor.brand_id == brand_id))
+    return [
+        {"id": str(c.id), "name": c.name, "url": c.url, "insights": public_insights(c.insights)}
+        for c in result.scalars().all()
+    ]
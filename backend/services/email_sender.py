@@ -1,24 +1,265 @@
+import asyncio
 import os
 import smtplib
+import time
+import uuid
+from datetime import datetime, timedelta
 from email.message import EmailMessage
+from typing import List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.email_outbox import EmailOutbox
+from utils.governor import BACKGROUND, outbound, priority_var
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASS = os.getenv("EMAIL_PASS")
+# Set EMAIL_STARTTLS=false for a local debugging server (e.g. python -m aiosmtpd -n -l localhost:1025)
+EMAIL_STARTTLS = os.getenv("EMAIL_STARTTLS", "true").lower() not in ("0", "false", "no")
+EMAIL_FROM = os.getenv("EMAIL_FROM", EMAIL_USER or "no-reply@localhost")
+
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 20))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 10))
+# Close the SMTP connection after this long without sending; servers drop idle sessions anyway
+EMAIL_IDLE_TIMEOUT = float(os.getenv("EMAIL_IDLE_TIMEOUT", 60))
+# A session idle longer than this is checked with a NOOP before the next send; busier ones aren't
+EMAIL_NOOP_AFTER = float(os.getenv("EMAIL_NOOP_AFTER", EMAIL_IDLE_TIMEOUT / 2))
+# Rows left in "sending" this long (worker crashed mid-batch) are put back in the queue
+EMAIL_STALE_SENDING_SECONDS = float(os.getenv("EMAIL_STALE_SENDING_SECONDS", 300))
+
+
+def build_message(to_email, subject, body, html_body: str = None, attachments: List[dict] = None) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = EMAIL_FROM
+    msg["To"] = to_email
+    msg.set_content(body)
+    if html_body:
+        msg.add_alternative(html_body, subtype="html")
+    for attachment in attachments or []:
+        maintype, subtype = attachment["content_type"].split("/", 1)
+        content = attachment["content"]
+        if isinstance(content, str):
+            msg.add_attachment(content, subtype=subtype, filename=attachment["filename"])
+        else:
+            msg.add_attachment(content, maintype=maintype, subtype=subtype, filename=attachment["filename"])
+    return msg
+
+
+class SMTPConnection:
+    """One authenticated SMTP session, reopened on demand. Blocking; call from a worker thread."""
+
+    def __init__(self, host: str = EMAIL_HOST, port: int = EMAIL_PORT):
+        self.host = host
+        self.port = port
+        self.server: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+
+    def _open(self):
+        with outbound("smtp_connect", provider="smtp"):
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            if EMAIL_STARTTLS:
+                server.starttls()
+            if EMAIL_USER and EMAIL_PASS:
+                server.login(EMAIL_USER, EMAIL_PASS)
+        self.server = server
+        self.last_used = time.monotonic()
+
+    def ensure(self):
+        """Open a session if there is none, or if one that sat idle for a while no longer answers a NOOP."""
+        if self.server is not None and time.monotonic() - self.last_used <= EMAIL_NOOP_AFTER:
+            return
+        if self.server is not None:
+            try:
+                with outbound("smtp"):
+                    alive = self.server.noop()[0] == 250
+                if alive:
+                    return
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+        self._open()
+
+    def send(self, msg: EmailMessage, to_addrs: List[str] = None):
+        self.ensure()
+        try:
+            with outbound("smtp"):
+                self.server.send_message(msg, to_addrs=to_addrs)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Session dropped since its last use; one fresh connection before giving up
+            self.close()
+            self._open()
+            with outbound("smtp"):
+                self.server.send_message(msg, to_addrs=to_addrs)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def close_if_idle(self, idle_seconds: float):
+        if self.server is not None and time.monotonic() - self.last_used > idle_seconds:
+            self.close()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(EMAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), 3600))
+
+
+async def enqueue_email(db: AsyncSession, recipients: List[str], subject: str, body: str,
+                        html_body: str = None, attachments: List[dict] = None) -> EmailOutbox:
+    """Queue one message for any number of recipients; each gets their own copy over the shared SMTP session."""
+    item = EmailOutbox(recipients=list(dict.fromkeys(recipients)), subject=subject, body=body,
+                       html_body=html_body, attachments=attachments, delivered_to=[], status="queued")
+    db.add(item)
+    await db.commit()
+    outbox_sender.wake()
+    return item
+
+
+async def get_delivery(db: AsyncSession, delivery_id: uuid.UUID) -> Optional[EmailOutbox]:
+    return await db.get(EmailOutbox, delivery_id)
+
+
+class OutboxSender:
+    """
+    Background task that drains the email_outbox table in batches over one long-lived SMTP
+    connection, retrying failed recipients with exponential backoff.
+    """
+
+    def __init__(self):
+        self.connection = SMTPConnection()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.connection.close)
+
+    async def _run(self):
+        # Queued mail is never more urgent than a user waiting on a page; SMTP calls yield to interactive ones
+        priority_var.set(BACKGROUND)
+        try:
+            await self._requeue_stale()
+        except Exception:
+            log.exception("email.outbox.requeue_failed")
+        while True:
+            try:
+                sent_any = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("email.outbox.batch_failed")
+                sent_any = False
+            if sent_any:
+                continue  # more may be waiting
+            await asyncio.to_thread(self.connection.close_if_idle, EMAIL_IDLE_TIMEOUT)
+            try:
+                await asyncio.wait_for(self._wake.wait(), EMAIL_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _requeue_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=EMAIL_STALE_SENDING_SECONDS)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.status == "sending", EmailOutbox.next_attempt_at < cutoff)
+                .values(status="queued")
+            )
+            await db.commit()
+
+    async def _claim(self, db: AsyncSession) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        # SKIP LOCKED lets several app workers drain the same table without double-sending
+        result = await db.execute(
+            select(EmailOutbox)
+            .where(EmailOutbox.status == "queued", EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.created_at)
+            .limit(EMAIL_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        items = result.scalars().all()
+        for item in items:
+            item.status = "sending"
+            item.next_attempt_at = now
+        await db.commit()
+        return items
+
+    def _send_item(self, item: EmailOutbox) -> Tuple[List[str], Optional[str]]:
+        """Send to each recipient still pending; returns (newly delivered, last error)."""
+        pending = [r for r in item.recipients if r not in (item.delivered_to or [])]
+        delivered, error = [], None
+        if not pending:
+            return delivered, error
+        try:
+            # Built once per row: the body and attachment parts are shared, only the To header changes
+            msg = build_message(pending[0], item.subject, item.body, item.html_body, item.attachments)
+        except Exception as e:
+            return delivered, str(e) or e.__class__.__name__
+        for recipient in pending:
+            msg.replace_header("To", recipient)
+            try:
+                self.connection.send(msg, to_addrs=[recipient])
+                delivered.append(recipient)
+            except Exception as e:
+                error = f"{recipient}: {e or e.__class__.__name__}"
+        return delivered, error
+
+    def _send_batch(self, items: List[EmailOutbox]) -> List[Tuple[List[str], Optional[str]]]:
+        return [self._send_item(item) for item in items]
+
+    async def process_batch(self) -> bool:
+        async with AsyncSessionLocal() as db:
+            items = await self._claim(db)
+            if not items:
+                return False
+            # smtplib blocks, so the whole batch runs in one worker thread
+            outcomes = await asyncio.to_thread(self._send_batch, items)
+            now = datetime.utcnow()
+            for item, (delivered, error) in zip(items, outcomes):
+                item.attempts += 1
+                # New list so SQLAlchemy sees the JSON column as changed
+                item.delivered_to = (item.delivered_to or []) + delivered
+                if error is None:
+                    item.status = "sent"
+                    item.sent_at = now
+                    item.last_error = None
+                elif item.attempts >= EMAIL_MAX_ATTEMPTS:
+                    item.status = "failed"
+                    item.last_error = error
+                    log.error("email.gave_up", email_id=item.id, attempts=item.attempts, error=error)
+                else:
+                    item.status = "queued"
+                    item.last_error = error
+                    item.next_attempt_at = now + retry_delay(item.attempts)
+            await db.commit()
+            return True
+
 
-def send_email(to_email, subject, body):
-    try:
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_USER
-        msg["To"] = to_email
-        msg.set_content(body)
-
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASS)
-            server.send_message(msg)
-        print(f"Email sent to {to_email}")
-    except Exception as e:
-        print(f"Failed to send email to {to_email}: {e}")
\ No newline at end of file
+outbox_sender = OutboxSender()
@@ -0,0 +1,77 @@
+import os
+import time
+from typing import Optional
+
+from utils.cache import Cache
+
+# Entries are only reused after the origin confirms them with a 304, so this just bounds storage
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", 7 * 24 * 3600))
+# Together these bound the namespace to about 64 MB in the shared tier (entries are compressed)
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", 1000))
+SCRAPE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRY_BYTES", 64 * 1024))
+# Scrape results are large and only reused after a 304, so few are worth keeping in each worker
+SCRAPE_CACHE_MEMORY_SIZE = int(os.getenv("SCRAPE_CACHE_MEMORY_SIZE", 64))
+
+
+class HTTPCache:
+    """
+    Validators (ETag / Last-Modified) and the parsed scrape result per URL, in the shared cache so
+    every worker can revalidate a page any of them fetched. A 304 from the origin means the stored
+    result can be reused without downloading or parsing. The oldest entries are evicted past
+    max_entries, and results larger than max_entry_bytes are not cached.
+    """
+
+    def __init__(self, ttl: float = SCRAPE_CACHE_TTL, max_entries: int = SCRAPE_CACHE_MAX_ENTRIES,
+                 max_entry_bytes: int = SCRAPE_CACHE_MAX_ENTRY_BYTES):
+        self.cache = Cache("scrape", ttl=ttl, maxsize=SCRAPE_CACHE_MEMORY_SIZE, max_entries=max_entries,
+                           max_entry_bytes=max_entry_bytes)
+        self.revalidated = 0
+        self.misses = 0
+        self.stores = 0
+
+    def get(self, url: str) -> Optional[dict]:
+        entry = self.cache.get(url)
+        return entry if entry and entry.get("url") == url else None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> dict:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, url: str):
+        """Record a 304."""
+        self.revalidated += 1
+
+    def miss(self):
+        self.misses += 1
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], result: dict):
+        # Without a validator there is nothing to revalidate against, so don't spend space on it
+        if not etag and not last_modified:
+            return
+        self.cache.set(url, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+            "result": result
+        })
+        self.stores += 1
+
+    def stats(self) -> dict:
+        lookups = self.revalidated + self.misses
+        return {
+            "cache": self.cache.stats(),
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round(self.revalidated / lookups, 4) if lookups else 0.0,
+        }
+
+
+http_cache = HTTPCache()
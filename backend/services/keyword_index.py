@@ -0,0 +1,142 @@
+import asyncio
+import bisect
+import math
+import os
+import re
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Iterable
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.competitor import Competitor
+from models.competitor_post import CompetitorPost
+from services.competitor_scraper import STOPWORDS
+from utils.lru import LRUCache
+
+WORD_RE = re.compile(r"\w+")
+# Brands whose index is kept in memory; an evicted one is rebuilt from the DB on its next query
+KEYWORD_INDEX_MAX_BRANDS = int(os.getenv("KEYWORD_INDEX_MAX_BRANDS", 256))
+
+
+def title_terms(title: str, max_n: int = 3) -> Counter:
+    """Unigrams plus 2..max_n-word phrases; phrases may contain stopwords but not start or end with one."""
+    words = [w for w in WORD_RE.findall(title.lower()) if not w.isdigit()]
+    terms = Counter()
+    for i, word in enumerate(words):
+        if word not in STOPWORDS and len(word) > 2:
+            terms[word] += 1
+        for n in range(2, max_n + 1):
+            gram = words[i:i + n]
+            if len(gram) == n and gram[0] not in STOPWORDS and gram[-1] not in STOPWORDS:
+                terms[" ".join(gram)] += 1
+    return terms
+
+
+class KeywordIndex:
+    """
+    Inverted index over one brand's stored competitor post titles.
+    Postings give document frequency for IDF; a date-sorted forward index lets
+    time-window queries touch only the posts inside the window.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[uuid.UUID, int]] = {}
+        self.doc_terms: Dict[uuid.UUID, Counter] = {}
+        self.doc_competitor: Dict[uuid.UUID, uuid.UUID] = {}
+        self._by_date: List[tuple] = []  # sorted (date, post_id)
+        self.watermark: Optional[datetime] = None  # newest first_seen_at loaded from the DB
+        self.lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, post_id: uuid.UUID, competitor_id: uuid.UUID, title: Optional[str], date: datetime):
+        if post_id in self.doc_terms or not title:
+            return
+        terms = title_terms(title)
+        self.doc_terms[post_id] = terms
+        self.doc_competitor[post_id] = competitor_id
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[post_id] = tf
+        bisect.insort(self._by_date, (date, post_id))
+
+    def idf(self, term: str) -> float:
+        # Smoothed so a phrase present in every title still scores slightly above zero
+        return math.log((1 + len(self.doc_terms)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def top_phrases(self, since: Optional[datetime] = None, min_n: int = 1, max_n: int = 3, limit: int = 20) -> List[dict]:
+        start = bisect.bisect_left(self._by_date, (since,)) if since else 0
+        window = [post_id for _, post_id in self._by_date[start:]]
+        tf = Counter()
+        competitors: Dict[str, set] = {}
+        for post_id in window:
+            for term, count in self.doc_terms[post_id].items():
+                n = term.count(" ") + 1
+                if min_n <= n <= max_n:
+                    tf[term] += count
+                    competitors.setdefault(term, set()).add(self.doc_competitor[post_id])
+        scored = sorted(((count * self.idf(term), term) for term, count in tf.items()), reverse=True)[:limit]
+        return [
+            {
+                "phrase": term,
+                "score": round(score, 4),
+                "count": tf[term],
+                "competitors": len(competitors[term]),
+                "posts_total": len(self.postings[term]),
+            }
+            for score, term in scored
+        ]
+
+
+_indexes = LRUCache(KEYWORD_INDEX_MAX_BRANDS)
+
+
+def get_index(brand_id: uuid.UUID) -> KeywordIndex:
+    index = _indexes.get(brand_id)
+    if index is None:
+        # A new index has no watermark, so refresh_index loads the brand's posts from scratch
+        index = KeywordIndex()
+        _indexes.set(brand_id, index)
+    return index
+
+
+async def refresh_index(db: AsyncSession, brand_id: uuid.UUID) -> KeywordIndex:
+    """Load posts stored since the last refresh (everything on first use); other workers' inserts are picked up here too."""
+    index = get_index(brand_id)
+    async with index.lock:
+        query = (
+            select(CompetitorPost.id, CompetitorPost.competitor_id, CompetitorPost.title,
+                   CompetitorPost.published_at, CompetitorPost.first_seen_at)
+            .join(Competitor, Competitor.id == CompetitorPost.competitor_id)
+            .where(Competitor.brand_id == brand_id)
+        )
+        if index.watermark is not None:
+            # >= so rows sharing the watermark timestamp aren't missed; add() ignores ones already indexed
+            query = query.where(CompetitorPost.first_seen_at >= index.watermark)
+        result = await db.execute(query)
+        for post_id, competitor_id, title, published_at, first_seen_at in result.all():
+            index.add(post_id, competitor_id, title, published_at or first_seen_at)
+            if first_seen_at and (index.watermark is None or first_seen_at > index.watermark):
+                index.watermark = first_seen_at
+    return index
+
+
+def index_new_posts(brand_id: uuid.UUID, posts: Iterable[CompetitorPost]):
+    """Called right after new posts are committed so this worker's index stays current without a DB read."""
+    index = _indexes.get(brand_id)
+    if index is None:
+        return  # not loaded yet; the first query will read everything
+    for post in posts:
+        index.add(post.id, post.competitor_id, post.title, post.published_at or post.first_seen_at)
+
+
+async def top_competitor_phrases(db: AsyncSession, brand_id: uuid.UUID, days: Optional[int] = None,
+                                 min_n: int = 1, max_n: int = 3, limit: int = 20) -> dict:
+    index = await refresh_index(db, brand_id)
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    return {
+        "indexed_posts": len(index),
+        "since": since.isoformat() if since else None,
+        "phrases": index.top_phrases(since, min_n, max_n, limit),
+    }
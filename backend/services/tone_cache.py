@@ -0,0 +1,76 @@
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.tone_analysis import ToneAnalysis
+from utils.cache import Cache
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+TONE_CACHE_SIZE = int(os.getenv("TONE_CACHE_SIZE", 2048))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_caption(text: str) -> str:
+    # Whitespace and unicode-form differences should not produce a new LLM call
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def tone_cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_caption(text)}".encode("utf-8")).hexdigest()
+
+
+class ToneCache:
+    """LLM tone descriptions: the shared two-tier cache (utils.cache) in front of the tone_analyses table."""
+
+    def __init__(self, maxsize: int = TONE_CACHE_SIZE):
+        self.cache = Cache("tone", maxsize=maxsize)
+        self.db_hits = 0
+        self.db_errors = 0
+
+    async def get(self, db: AsyncSession, key: str) -> Optional[str]:
+        description = await self.cache.aget(key)
+        if description is not None:
+            return description
+        try:
+            row = await db.get(ToneAnalysis, key)
+        except Exception as e:
+            self.db_errors += 1
+            log.warning("tone_cache.db_lookup_failed", error=str(e))
+            return None
+        if row is None:
+            return None
+        self.db_hits += 1
+        await self.cache.aset(key, row.description)
+        return row.description
+
+    async def set(self, db: AsyncSession, key: str, model: str, description: str):
+        await self.cache.aset(key, description)
+        try:
+            await db.merge(ToneAnalysis(cache_key=key, model=model, description=description))
+            await db.commit()
+        except Exception as e:
+            self.db_errors += 1
+            await db.rollback()
+            log.warning("tone_cache.db_write_failed", error=str(e))
+
+    def stats(self) -> dict:
+        cache = self.cache.stats()
+        # A cache miss that the DB answered is still a hit overall
+        hits = self.cache.hits + self.db_hits
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "cache": cache,
+            "db_hits": self.db_hits,
+            "db_errors": self.db_errors,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+tone_cache = ToneCache()
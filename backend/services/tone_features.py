@@ -0,0 +1,151 @@
+import math
+import re
+from typing import Dict, Iterable, List
+
+# Local, dependency-free lexical features for brand voice. Everything here is
+# precompiled regex work so a caption costs microseconds, not an LLM round trip.
+
+EMOJI_RE = re.compile(
+    "["
+    "\U0001F1E6-\U0001F1FF"  # flags
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F680-\U0001F6FF"  # transport & map
+    "\U0001F900-\U0001F9FF"  # supplemental symbols
+    "\U0001FA70-\U0001FAFF"  # symbols & pictographs extended-A
+    "\U00002600-\U000027BF"  # misc symbols, dingbats
+    "]"
+)
+WORD_RE = re.compile(r"[A-Za-z']+")
+HASHTAG_RE = re.compile(r"#\w+")
+SENTENCE_END_RE = re.compile(r"[.!?]+")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+FIRST_PERSON_SINGULAR = frozenset(["i", "me", "my", "mine", "myself", "i'm", "i've", "i'll", "i'd"])
+FIRST_PERSON_PLURAL = frozenset(["we", "us", "our", "ours", "ourselves", "we're", "we've", "we'll", "we'd"])
+SECOND_PERSON = frozenset(["you", "your", "yours", "yourself", "yourselves", "you're", "you've", "you'll", "you'd"])
+
+# Order matters: fingerprints and similarity vectors are built in this order.
+FEATURE_NAMES = (
+    "emoji_density",
+    "avg_sentence_length",
+    "readability",
+    "exclamation_rate",
+    "question_rate",
+    "first_person_singular_rate",
+    "first_person_plural_rate",
+    "second_person_rate",
+    "hashtag_ratio",
+)
+
+# Rough upper bounds used to scale each feature into 0..1 before comparing brands
+FEATURE_SCALES = {
+    "emoji_density": 0.5,
+    "avg_sentence_length": 40.0,
+    "readability": 100.0,
+    "exclamation_rate": 1.0,
+    "question_rate": 1.0,
+    "first_person_singular_rate": 0.2,
+    "first_person_plural_rate": 0.2,
+    "second_person_rate": 0.2,
+    "hashtag_ratio": 0.5,
+}
+
+FINGERPRINT_PREFIX = "tf1:"
+
+
+def split_captions(text: str) -> List[str]:
+    """Split a pasted block of captions into individual captions (one per non-empty line)."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def count_syllables(word: str) -> int:
+    word = word.lower().strip("'")
+    if not word:
+        return 0
+    count = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(count, 1)
+
+
+def extract_tone_features(caption: str) -> Dict[str, float]:
+    words = WORD_RE.findall(caption)
+    lowered = [w.lower() for w in words]
+    word_count = len(words)
+    hashtags = HASHTAG_RE.findall(caption)
+    emojis = EMOJI_RE.findall(caption)
+    terminators = SENTENCE_END_RE.findall(caption)
+    sentence_count = max(len([s for s in SENTENCE_END_RE.split(caption) if WORD_RE.search(s)]), 1)
+    exclamations = sum(1 for t in terminators if "!" in t)
+    questions = sum(1 for t in terminators if "?" in t)
+    tokens = max(word_count + len(emojis), 1)
+    words_per_sentence = word_count / sentence_count
+
+    if word_count:
+        syllables = sum(count_syllables(w) for w in words)
+        readability = 206.835 - 1.015 * words_per_sentence - 84.6 * (syllables / word_count)
+        readability = max(0.0, min(100.0, readability))
+    else:
+        readability = 0.0
+
+    per_word = 1 / word_count if word_count else 0.0
+    return {
+        "emoji_density": len(emojis) / tokens,
+        "avg_sentence_length": words_per_sentence,
+        "readability": readability,
+        "exclamation_rate": exclamations / sentence_count,
+        "question_rate": questions / sentence_count,
+        "first_person_singular_rate": sum(1 for w in lowered if w in FIRST_PERSON_SINGULAR) * per_word,
+        "first_person_plural_rate": sum(1 for w in lowered if w in FIRST_PERSON_PLURAL) * per_word,
+        "second_person_rate": sum(1 for w in lowered if w in SECOND_PERSON) * per_word,
+        "hashtag_ratio": len(hashtags) / tokens,
+        "word_count": word_count,
+    }
+
+
+def extract_tone_features_batch(captions: Iterable[str]) -> List[Dict[str, float]]:
+    return [extract_tone_features(c) for c in captions]
+
+
+def aggregate_features(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    """Word-weighted mean of per-caption features, so one-word captions don't dominate."""
+    if not rows:
+        return {name: 0.0 for name in FEATURE_NAMES} | {"caption_count": 0, "word_count": 0}
+    weights = [max(r.get("word_count", 0), 1) for r in rows]
+    total = sum(weights)
+    aggregate = {
+        name: round(sum(r[name] * w for r, w in zip(rows, weights)) / total, 4)
+        for name in FEATURE_NAMES
+    }
+    aggregate["caption_count"] = len(rows)
+    aggregate["word_count"] = sum(r.get("word_count", 0) for r in rows)
+    return aggregate
+
+
+def tone_fingerprint(features: Dict[str, float]) -> str:
+    """Compact, storable form of the features (fits in Brand.tone)."""
+    return FINGERPRINT_PREFIX + ",".join(f"{features.get(name, 0.0):.4g}" for name in FEATURE_NAMES)
+
+
+def parse_fingerprint(fingerprint: str) -> Dict[str, float]:
+    if not fingerprint or not fingerprint.startswith(FINGERPRINT_PREFIX):
+        raise ValueError("Not a tone fingerprint.")
+    values = fingerprint[len(FINGERPRINT_PREFIX):].split(",")
+    if len(values) != len(FEATURE_NAMES):
+        raise ValueError("Tone fingerprint has the wrong number of features.")
+    features = {name: float(v) for name, v in zip(FEATURE_NAMES, values)}
+    # nan/inf would poison the cosine similarity, and no feature can be negative
+    if not all(math.isfinite(v) and v >= 0 for v in features.values()):
+        raise ValueError("Tone fingerprint features must be finite, non-negative numbers.")
+    return features
+
+
+def compare_fingerprints(a: str, b: str) -> float:
+    """Cosine similarity (0..1) between two fingerprints after scaling each feature to 0..1."""
+    fa, fb = parse_fingerprint(a), parse_fingerprint(b)
+    va = [min(fa[n] / FEATURE_SCALES[n], 1.0) for n in FEATURE_NAMES]
+    vb = [min(fb[n] / FEATURE_SCALES[n], 1.0) for n in FEATURE_NAMES]
+    dot = sum(x * y for x, y in zip(va, vb))
+    norm = math.sqrt(sum(x * x for x in va)) * math.sqrt(sum(y * y for y in vb))
+    return round(dot / norm, 4) if norm else 0.0
@@ -1,11 +1,19 @@
-from pytrends.request import TrendReq
+# pytrends (which pulls in pandas), praw and requests are imported inside the functions that use
+# them, so loading the app (and answering health checks) doesn't wait on them after a cold start
+import asyncio
 from datetime import datetime, timedelta
-import time
 import random
-import requests
-import praw
 import os
+import hashlib
+import threading
 from dotenv import load_dotenv
+from utils.cache import Cache
+from utils.deadline import deadline, deadline_at, ends_at, has_time, hedged, pause, remaining
+from utils.log import get_logger
+from utils.governor import outbound
+from utils.profiling import phase
+
+log = get_logger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -14,11 +22,34 @@ import os
 # OpenRouter config (optional)
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Other hosts for the Reddit and Google Trends APIs (e.g. the stand-ins in benchmarks.fakes); the real ones when unset
+REDDIT_OAUTH_URL = os.getenv("REDDIT_OAUTH_URL")
+REDDIT_URL = os.getenv("REDDIT_URL")
+GOOGLE_TRENDS_URL = os.getenv("GOOGLE_TRENDS_URL")
+_trends_url_lock = threading.Lock()
+
+# Reddit / Google Trends data per keyword, and model summaries per prompt, shared by all workers
+TRENDS_CACHE_TTL = float(os.getenv("TRENDS_CACHE_TTL", 3600))
+TRENDS_SUMMARY_CACHE_TTL = float(os.getenv("TRENDS_SUMMARY_CACHE_TTL", 24 * 3600))
+trends_cache = Cache("trends", ttl=TRENDS_CACHE_TTL)
+summary_cache = Cache("llm_summary", ttl=TRENDS_SUMMARY_CACHE_TTL)
+
+# Seconds for a whole trend analysis, and for each of Reddit and Google Trends within it; the summary gets what's left
+TRENDS_DEADLINE = float(os.getenv("TRENDS_DEADLINE", 60))
+# Google Trends calls are also paced by the governor (GOVERNOR_GOOGLE_TRENDS_RATE); see DEFAULT_LIMITS there
+TRENDS_SOURCE_DEADLINE = float(os.getenv("TRENDS_SOURCE_DEADLINE", 20))
 
 def call_model_summary(prompt: str, max_tokens: int = 300) -> str:
     """Call OpenRouter (chat completion) synchronously to get a summary."""
     if not OPENROUTER_API_KEY:
         raise ValueError("OPENROUTER_API_KEY not set")
+    cache_key = hashlib.sha256(f"{OPENROUTER_MODEL}\x00{max_tokens}\x00{prompt}".encode("utf-8")).hexdigest()
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    import requests
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json"
@@ -31,8 +62,14 @@ def call_model_summary(prompt: str, max_tokens: int = 300) -> str:
         "top_p": 0.95,
         "top_k": 40
     }
+
+    def post():
+        with outbound("openrouter"):
+            return requests.post(f"{OPENROUTER_BASE_URL}/chat/completions", json=payload, headers=headers,
+                                 timeout=remaining(15))
+
     try:
-        resp = requests.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers, timeout=15)
+        resp = hedged("trend_summary", post)
         resp.raise_for_status()
         data = resp.json()
         # Navigate response structure defensively
@@ -40,6 +77,7 @@ def call_model_summary(prompt: str, max_tokens: int = 300) -> str:
         if choices and isinstance(choices, list):
             msg = choices[0].get("message", {}).get("content") if isinstance(choices[0], dict) else None
             if msg:
+                summary_cache.set(cache_key, msg.strip())
                 return msg.strip()
         # fallback to text if present
         return data.get("text", "").strip()
@@ -88,17 +126,24 @@ def synthesize_summary_from_data(result: dict, keyword: str) -> str:
     except Exception as e:
         return f"No summary available: {e}"
 
+def reddit_search(subreddit, keyword: str, limit: int) -> list:
+    with outbound("reddit"):
+        return list(subreddit.search(keyword, sort='hot', limit=limit))
+
 def get_reddit_trends(keyword: str) -> dict:
     """Fetch trending Reddit posts and topics related to the keyword"""
     try:
+        import praw
         # Initialize Reddit client
         reddit = praw.Reddit(
             client_id=os.getenv('REDDIT_CLIENT_ID'),
             client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-            user_agent=os.getenv('REDDIT_USER_AGENT', 'content-strategy-planner/0.1')
+            user_agent=os.getenv('REDDIT_USER_AGENT', 'content-strategy-planner/0.1'),
+            timeout=max(1, int(remaining(16))),
+            **{key: value for key, value in (("oauth_url", REDDIT_OAUTH_URL), ("reddit_url", REDDIT_URL)) if value}
         )
         
-        print(f"Fetching Reddit trends for: {keyword}")
+        log.debug("trends.reddit.fetch", keyword=keyword)
         
         # Define relevant subreddits for tech/business trends
         subreddits = [
@@ -112,11 +157,14 @@ def get_reddit_trends(keyword: str) -> dict:
         
         # Search for posts containing the keyword
         for subreddit_name in subreddits[:5]:  # Limit to first 5 subreddits
+            if not has_time():
+                log.warning("trends.reddit.out_of_time", subreddit=subreddit_name)
+                break
             try:
                 subreddit = reddit.subreddit(subreddit_name)
                 
                 # Search for posts with the keyword
-                search_results = subreddit.search(keyword, sort='hot', limit=3)
+                search_results = hedged("reddit_search", reddit_search, subreddit, keyword, 3)
                 
                 for post in search_results:
                     # Extract topic from post title
@@ -130,14 +178,14 @@ def get_reddit_trends(keyword: str) -> dict:
                         break
                         
             except Exception as e:
-                print(f"Error fetching from r/{subreddit_name}: {e}")
+                log.warning("trends.reddit.subreddit_failed", subreddit=subreddit_name, error=str(e))
                 continue
         
         # If no results found, try broader search
-        if not reddit_topics:
+        if not reddit_topics and has_time():
             try:
                 # Search across all subreddits
-                search_results = reddit.subreddit('all').search(keyword, sort='hot', limit=5)
+                search_results = hedged("reddit_search", reddit_search, reddit.subreddit('all'), keyword, 5)
                 
                 for post in search_results:
                     topic = post.title[:100] + "..." if len(post.title) > 100 else post.title
@@ -145,9 +193,9 @@ def get_reddit_trends(keyword: str) -> dict:
                     reddit_trends.append(f"r/{post.subreddit}: {post.title[:80]}")
                     
             except Exception as e:
-                print(f"Error in broad Reddit search: {e}")
+                log.warning("trends.reddit.broad_search_failed", error=str(e))
         
-        print(f"Found {len(reddit_topics)} Reddit topics and {len(reddit_trends)} trends")
+        log.debug("trends.reddit.fetched", topics=len(reddit_topics), trends=len(reddit_trends))
         
         return {
             "reddit_topics": reddit_topics,
@@ -155,7 +203,7 @@ def get_reddit_trends(keyword: str) -> dict:
         }
         
     except Exception as e:
-        print(f"Reddit API error: {e}")
+        log.warning("trends.reddit.failed", error=str(e))
         return {
             "reddit_topics": [],
             "reddit_trends": []
@@ -200,21 +248,62 @@ def get_mock_trend_data(keyword: str) -> dict:
         "note": "Sample data - APIs unavailable"
     }
 
+@phase("parse")
+def interest_points(interest, keyword: str) -> list:
+    """[{"date", "score"}] from pytrends' interest_over_time() frame; rows without a usable score are skipped."""
+    points = []
+    if interest.empty or keyword not in interest.columns:
+        return points
+    for idx, row in interest.iterrows():
+        try:
+            score = int(row[keyword])
+            points.append({
+                "date": idx.strftime("%Y-%m-%d"),
+                "score": score
+            })
+        except (ValueError, KeyError, TypeError):
+            continue
+    return points
+
+def trend_req_class():
+    """pytrends' TrendReq, pointed at GOOGLE_TRENDS_URL when that is set."""
+    from pytrends import request
+    if GOOGLE_TRENDS_URL:
+        with _trends_url_lock:
+            # pytrends reads its endpoints off the TrendReq class and a module constant, so both are rewritten
+            base = request.BASE_TRENDS_URL
+            if base != GOOGLE_TRENDS_URL:
+                for name, value in list(vars(request.TrendReq).items()):
+                    if name.endswith("_URL"):
+                        setattr(request.TrendReq, name, value.replace(base, GOOGLE_TRENDS_URL))
+                request.BASE_TRENDS_URL = GOOGLE_TRENDS_URL
+    return request.TrendReq
+
+def google_timeout() -> tuple:
+    """pytrends' (connect, read) timeout, cut to what is left of the request's budget."""
+    read = remaining(25)
+    return (min(10, read), read)
+
 def try_google_trends_with_retry(keyword: str, max_retries: int = 3) -> dict:
-    """Try Google Trends with retry mechanism"""
+    """Try Google Trends with retry mechanism; no new attempt (or back-off) once the request's budget is spent"""
+    TrendReq = trend_req_class()
     for attempt in range(max_retries):
+        if not has_time():
+            log.warning("trends.google.out_of_time", attempt=attempt + 1)
+            return None
         try:
-            print(f"Google Trends attempt {attempt + 1}/{max_retries}")
+            log.debug("trends.google.attempt", attempt=attempt + 1, max_retries=max_retries)
             
             # Initialize with different parameters each attempt
-            pytrends = TrendReq(hl='en-US', tz=360, timeout=(10, 25))
+            pytrends = TrendReq(hl='en-US', tz=360, timeout=google_timeout())
             kw_list = [keyword]
             
             # Build payload
-            pytrends.build_payload(kw_list, cat=0, timeframe='today 12-m', geo='', gprop='')
+            with outbound("google_trends"):
+                pytrends.build_payload(kw_list, cat=0, timeframe='today 12-m', geo='', gprop='')
             
             # Longer delay between attempts
-            time.sleep(3 + attempt * 2)
+            pause(3 + attempt * 2)
             
             # Try to get data
             related_topics = []
@@ -223,7 +312,9 @@ def try_google_trends_with_retry(keyword: str, max_retries: int = 3) -> dict:
             
             # Related queries
             try:
-                related = pytrends.related_queries()
+                pytrends.timeout = google_timeout()
+                with outbound("google_trends"):
+                    related = pytrends.related_queries()
                 if isinstance(related, dict) and keyword in related and related[keyword] is not None:
                     keyword_data = related[keyword]
                     
@@ -237,27 +328,21 @@ def try_google_trends_with_retry(keyword: str, max_retries: int = 3) -> dict:
                         if hasattr(rising_df, 'head') and len(rising_df) > 0:
                             rising_trends = rising_df['query'].head(5).tolist()
             except Exception as e:
-                print(f"Related queries failed: {e}")
+                log.debug("trends.google.related_failed", attempt=attempt + 1, error=str(e))
             
             # Interest over time
             try:
-                interest = pytrends.interest_over_time()
-                if not interest.empty and keyword in interest.columns:
-                    for idx, row in interest.iterrows():
-                        try:
-                            score = int(row[keyword])
-                            interest_over_time.append({
-                                "date": idx.strftime("%Y-%m-%d"),
-                                "score": score
-                            })
-                        except (ValueError, KeyError, TypeError):
-                            continue
+                pytrends.timeout = google_timeout()
+                with outbound("google_trends"):
+                    interest = pytrends.interest_over_time()
+                interest_over_time = interest_points(interest, keyword)
             except Exception as e:
-                print(f"Interest over time failed: {e}")
+                log.debug("trends.google.interest_failed", attempt=attempt + 1, error=str(e))
             
             # If we got any real data, return it
             if related_topics or rising_trends or interest_over_time:
-                print(f"Success! Got {len(related_topics)} topics, {len(rising_trends)} trends, {len(interest_over_time)} interest points")
+                log.debug("trends.google.fetched", attempt=attempt + 1, topics=len(related_topics),
+                          trends=len(rising_trends), interest_points=len(interest_over_time))
                 return {
                     "keyword": keyword,
                     "related_topics": related_topics,
@@ -266,23 +351,30 @@ def try_google_trends_with_retry(keyword: str, max_retries: int = 3) -> dict:
                 }
             
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(5)  # Wait before retry
+            log.debug("trends.google.attempt_failed", attempt=attempt + 1, error=str(e))
+            if attempt < max_retries - 1 and has_time(5):
+                pause(5)  # Wait before retry
     
     # All attempts failed
-    print("All Google Trends attempts failed")
+    log.warning("trends.google.failed", attempts=max_retries)
     return None
 
-def analyze_trends(keyword: str) -> dict:
-    print(f"Analyzing trends for keyword: {keyword}")
-    
-    # Get Reddit trends
-    reddit_data = get_reddit_trends(keyword)
-    
-    # Try Google Trends
-    google_data = try_google_trends_with_retry(keyword)
-    
+def cached_trend_source(source: str, keyword: str):
+    """Reddit ("reddit") or Google Trends ("google") data for a keyword via the shared cache; failures aren't cached."""
+    key = f"{source}:{keyword.strip().lower()}"
+    data = trends_cache.get(key)
+    if data is None:
+        fetch = get_reddit_trends if source == "reddit" else try_google_trends_with_retry
+        with deadline(TRENDS_SOURCE_DEADLINE):
+            data = fetch(keyword)
+            # A fetch cut short by the deadline may be partial, so it isn't kept
+            complete = has_time()
+        if complete and data and any(value for name, value in data.items() if name != "keyword"):
+            trends_cache.set(key, data)
+    return data
+
+def merge_trend_data(keyword: str, reddit_data: dict, google_data: dict) -> dict:
+    """Combine Google Trends and Reddit results, filling gaps (or all of Google, if it failed) with sample data."""
     if google_data:
         # Combine Google Trends with Reddit data
         result = {
@@ -296,14 +388,23 @@ def analyze_trends(keyword: str) -> dict:
         
         # Supplement with mock data if needed
         if not result.get("related_topics") or not result.get("rising_trends"):
-            print("Supplementing with mock related data")
+            log.debug("trends.mock_supplement", keyword=keyword)
             mock_data = get_mock_trend_data(keyword)
             if not result.get("related_topics"):
                 result["related_topics"] = mock_data["related_topics"]
             if not result.get("rising_trends"):
                 result["rising_trends"] = mock_data["rising_trends"]
+        return result
+    else:
+        # Return mock data with Reddit data if available
+        mock_data = get_mock_trend_data(keyword)
+        mock_data["reddit_topics"] = reddit_data.get("reddit_topics", [])
+        mock_data["reddit_trends"] = reddit_data.get("reddit_trends", [])
+        return mock_data
 
-        # Append a concise AI-generated summary (highlights) when possible
+def add_trend_summary(result: dict, keyword: str) -> dict:
+    """Append a concise AI-generated summary (highlights) when possible, else one synthesized from the data."""
+    if "note" not in result:
         try:
             if OPENROUTER_API_KEY:
                 # Build a short context for the model
@@ -334,35 +435,74 @@ def analyze_trends(keyword: str) -> dict:
                     if summary:
                         result["summary"] = summary
                 except Exception as e:
-                    print(f"Model summary failed: {e}")
+                    log.warning("trends.summary_failed", error=str(e))
         except Exception as e:
-            print(f"Unexpected error when generating summary: {e}")
-
-        # Ensure summary exists even if model was not used or failed
-        if "summary" not in result:
-            result["summary"] = synthesize_summary_from_data(result, keyword)
-
-        return result
+            log.exception("trends.summary_error")
     else:
-        # Return mock data with Reddit data if available
-        mock_data = get_mock_trend_data(keyword)
-        mock_data["reddit_topics"] = reddit_data.get("reddit_topics", [])
-        mock_data["reddit_trends"] = reddit_data.get("reddit_trends", [])
         # Also attempt to summarize mock+reddit if model available
         try:
             if OPENROUTER_API_KEY:
-                prompt = f"Keyword: {keyword}\nTop related topics: {', '.join(mock_data.get('related_topics', [])[:6])}\nRising trends: {', '.join(mock_data.get('rising_trends', [])[:6])}\nReddit highlights: {', '.join(mock_data.get('reddit_trends', [])[:6])}\n\nProvide a concise summary (3-6 bullet highlights) and recommended actions for a marketer."
+                prompt = f"Keyword: {keyword}\nTop related topics: {', '.join(result.get('related_topics', [])[:6])}\nRising trends: {', '.join(result.get('rising_trends', [])[:6])}\nReddit highlights: {', '.join(result.get('reddit_trends', [])[:6])}\n\nProvide a concise summary (3-6 bullet highlights) and recommended actions for a marketer."
                 try:
                     summary = call_model_summary(prompt, max_tokens=200)
                     if summary:
-                        mock_data['summary'] = summary
+                        result['summary'] = summary
                 except Exception as e:
-                    print(f"Model summary on mock data failed: {e}")
+                    log.warning("trends.summary_failed", mock=True, error=str(e))
         except Exception:
-            print("Unexpected error when generating mock summary")
+            log.exception("trends.summary_error", mock=True)
+
+    # Ensure summary exists even if model was not used or failed
+    if "summary" not in result:
+        result["summary"] = synthesize_summary_from_data(result, keyword)
+    return result
+
+def analyze_trends(keyword: str) -> dict:
+    log.info("trends.analyze", keyword=keyword)
+    with deadline(TRENDS_DEADLINE):
+        # Get Reddit trends
+        reddit_data = cached_trend_source("reddit", keyword)
+
+        # Try Google Trends
+        google_data = cached_trend_source("google", keyword)
 
-        # Ensure summary exists even if model not available
-        if 'summary' not in mock_data:
-            mock_data['summary'] = synthesize_summary_from_data(mock_data, keyword)
+        result = merge_trend_data(keyword, reddit_data, google_data)
+        return add_trend_summary(result, keyword)
 
-        return mock_data
\ No newline at end of file
+GOOGLE_FIELDS = ("related_topics", "rising_trends", "interest_over_time", "note")
+
+async def analyze_trends_stream(keyword: str):
+    """
+    Same result as analyze_trends, as progress events: Reddit and Google Trends run side by side and each
+    section is yielded as soon as it arrives, then the summary, then "done" with the full result.
+    The whole stream shares one TRENDS_DEADLINE budget.
+    """
+    log.info("trends.analyze_stream", keyword=keyword)
+    # The budget is entered around each step rather than held across the yields
+    at = ends_at(TRENDS_DEADLINE)
+    with deadline_at(at):
+        # Tasks and threads copy the context, so the fetches carry the budget
+        reddit_task = asyncio.create_task(asyncio.to_thread(cached_trend_source, "reddit", keyword))
+        google_task = asyncio.create_task(asyncio.to_thread(cached_trend_source, "google", keyword))
+    yield {"event": "status", "message": f"Fetching Reddit and Google Trends for '{keyword}'..."}
+    try:
+        pending = {reddit_task, google_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if reddit_task in done:
+                reddit_data = reddit_task.result()
+                yield {"event": "reddit", "reddit_topics": reddit_data.get("reddit_topics", []),
+                       "reddit_trends": reddit_data.get("reddit_trends", [])}
+            if google_task in done:
+                google_part = merge_trend_data(keyword, {}, google_task.result())
+                yield {"event": "google", **{k: google_part[k] for k in GOOGLE_FIELDS if k in google_part}}
+        result = merge_trend_data(keyword, reddit_task.result(), google_task.result())
+        yield {"event": "status", "message": "Summarizing highlights..."}
+        with deadline_at(at):
+            result = await asyncio.to_thread(add_trend_summary, result, keyword)
+        yield {"event": "summary", "summary": result["summary"]}
+        yield {"event": "done", "result": result}
+    finally:
+        # Client went away: don't leave the tasks unobserved (the threads themselves finish on their own)
+        for task in (reddit_task, google_task):
+            task.cancel()
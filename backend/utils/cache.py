@@ -0,0 +1,438 @@
+"""
+Two-tier cache shared by every worker process: a small in-process LRU in front of a shared store,
+so a value computed by one uvicorn worker is a hit for all of them.
+
+The shared tier is Redis (or anything speaking its protocol) when CACHE_REDIS_URL is set, otherwise
+a local SQLite file that every worker on the host opens (CACHE_BACKEND=memory turns it off).
+Values must be JSON-compatible; they are stored as compact JSON, zlib-compressed above
+CACHE_COMPRESS_MIN_BYTES, and the memory tier keeps the same bytes so callers always get a copy.
+
+Invalidation is visible to every worker, checked at most every CACHE_SYNC_INTERVAL seconds.
+delete() leaves a tombstone for the key in the shared tier, and each worker drops just that key from
+its memory tier. clear() bumps a per-namespace version, and each worker drops its whole memory tier
+for that namespace.
+
+    trends_cache = Cache("trends", ttl=3600)
+    data = trends_cache.get(keyword)              # sync code and worker threads
+    data = await trends_cache.aget(keyword)       # async code; only a memory miss leaves the loop
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.fastjson import dumps, orjson
+from utils.log import get_logger
+from utils.lru import LRUCache
+
+log = get_logger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite").lower()  # sqlite | memory (redis when CACHE_REDIS_URL is set)
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "influcrafters:")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", str(Path(__file__).resolve().parents[1] / ".cache" / "shared.sqlite3"))
+CACHE_SQLITE_MAX_BYTES = int(os.getenv("CACHE_SQLITE_MAX_BYTES", 200 * 1024 * 1024))
+CACHE_MEMORY_SIZE = int(os.getenv("CACHE_MEMORY_SIZE", 1024))  # entries per namespace
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", 1.0))
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+# Recent deletes kept per namespace; a worker that falls further behind drops its whole memory tier
+CACHE_TOMBSTONE_KEEP = int(os.getenv("CACHE_TOMBSTONE_KEEP", 1000))
+
+_RAW = b"j"
+_ZLIB = b"z"
+
+
+def encode(value: Any) -> bytes:
+    body = dumps(value)
+    if len(body) >= CACHE_COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(body, 6)
+    return _RAW + body
+
+
+def decode(data: bytes) -> Any:
+    body = zlib.decompress(data[1:]) if data[:1] == _ZLIB else data[1:]
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+class SQLiteBackend:
+    """Shared tier for workers on one host: one SQLite file in WAL mode, one connection per thread."""
+
+    TRIM_EVERY = 256  # writes between size checks
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, max_bytes: int = CACHE_SQLITE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "expires_at REAL, stored_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tombstones (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "namespace TEXT NOT NULL, key TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tombstones_namespace ON tombstones (namespace, seq)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, data: bytes, ttl: Optional[float]):
+        now = time.time()
+        self._conn().execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                             (key, data, now + ttl if ttl else None, now))
+        self._writes += 1
+        if self._writes % self.TRIM_EVERY == 0:
+            self.trim()
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def counters(self, names: List[str]) -> Dict[str, int]:
+        marks = ",".join("?" * len(names))
+        return dict(self._conn().execute(f"SELECT name, value FROM counters WHERE name IN ({marks})", names).fetchall())
+
+    def incr(self, name: str):
+        self._conn().execute("INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                             (name,))
+
+    def tombstone(self, namespace: str, key: str):
+        conn = self._conn()
+        conn.execute("INSERT INTO tombstones (namespace, key) VALUES (?, ?)", (namespace, key))
+        conn.execute("DELETE FROM tombstones WHERE namespace = ? AND seq <= (SELECT seq FROM tombstones "
+                     "WHERE namespace = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                     (namespace, namespace, CACHE_TOMBSTONE_KEEP))
+
+    def tombstones(self, namespace: str, after: int) -> List[Tuple[int, str]]:
+        return self._conn().execute("SELECT seq, key FROM tombstones WHERE namespace = ? AND seq > ? ORDER BY seq",
+                                    (namespace, after)).fetchall()
+
+    def cap(self, prefix: str, key: str, max_entries: int, ttl: Optional[float]):
+        """Keep at most max_entries keys starting with `prefix`, dropping the oldest (`key` was just written)."""
+        conn = self._conn()
+        # Keys sort by prefix, so this is a range scan of the primary key
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        count = conn.execute("SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ?", (prefix, end)).fetchone()[0]
+        if count <= max_entries:
+            return
+        excess = count - max_entries
+        conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries WHERE key >= ? AND key < ? "
+                     "ORDER BY stored_at LIMIT ?)", (prefix, end, excess))
+        self.evictions += excess
+
+    def trim(self):
+        """Drop expired entries, then the oldest ones until the file's data is back under 90% of max_bytes."""
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so we don't trim again on the next few writes
+        target = int(self.max_bytes * 0.9)
+        while total > target:
+            oldest = conn.execute("SELECT key, LENGTH(value) FROM entries ORDER BY stored_at LIMIT 100").fetchall()
+            if not oldest:
+                break
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in oldest])
+            total -= sum(size for _, size in oldest)
+            self.evictions += len(oldest)
+
+    def describe(self) -> str:
+        return f"sqlite:{self.path}"
+
+
+class RedisBackend:
+    """Shared tier across hosts. Needs the optional `redis` package."""
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        import redis  # optional dependency, only needed when CACHE_REDIS_URL is set
+        self.url = url
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.evictions = 0  # Redis evicts on its own (maxmemory-policy)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, data: bytes, ttl: Optional[float]):
+        self.client.set(key, data, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def counters(self, names: List[str]) -> Dict[str, int]:
+        return {name: int(value) for name, value in zip(names, self.client.mget(names)) if value is not None}
+
+    def incr(self, name: str):
+        self.client.incr(name)
+
+    def tombstone(self, namespace: str, key: str):
+        # Sorted by a per-namespace sequence number; deleting a key again just moves it to the end
+        seq = self.client.incr(f"{namespace}:__tombstone_seq")
+        pipe = self.client.pipeline()
+        pipe.zadd(f"{namespace}:__tombstones", {key: seq})
+        pipe.zremrangebyrank(f"{namespace}:__tombstones", 0, -CACHE_TOMBSTONE_KEEP - 1)
+        pipe.execute()
+
+    def tombstones(self, namespace: str, after: int) -> List[Tuple[int, str]]:
+        entries = self.client.zrangebyscore(f"{namespace}:__tombstones", f"({after}", "+inf", withscores=True)
+        return [(int(seq), key.decode() if isinstance(key, bytes) else key) for key, seq in entries]
+
+    def cap(self, prefix: str, key: str, max_entries: int, ttl: Optional[float]):
+        """
+        Keep at most max_entries keys starting with `prefix`. Keys are tracked by write time in a
+        sorted set, since counting them with SCAN would touch the whole keyspace.
+        """
+        index = prefix + "__keys"
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zadd(index, {key: now})
+        if ttl:
+            pipe.zremrangebyscore(index, 0, now - ttl)  # expired on their own
+        pipe.zcard(index)
+        count = pipe.execute()[-1]
+        if count <= max_entries:
+            return
+        oldest = [member for member, _ in self.client.zpopmin(index, count - max_entries)]
+        if oldest:
+            self.client.delete(*oldest)
+            self.evictions += len(oldest)
+
+    def describe(self) -> str:
+        return "redis:" + self.url.split("@")[-1]  # without credentials
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def shared_backend():
+    """The process-wide shared tier (None when CACHE_BACKEND=memory), created on first use."""
+    global _backend
+    if _backend is None and CACHE_BACKEND != "memory":
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend(CACHE_REDIS_URL) if CACHE_REDIS_URL else SQLiteBackend()
+    return _backend
+
+
+_caches: List["Cache"] = []
+
+
+def all_caches() -> List["Cache"]:
+    return list(_caches)
+
+
+class Cache:
+    """
+    One namespace of the two-tier cache. `ttl` (seconds) applies to both tiers; None keeps values
+    until they are evicted or invalidated. `max_entries` caps the namespace in the shared tier (the
+    oldest writes go first) and `max_entry_bytes` skips storing values that encode larger, so
+    together they bound the namespace's size no matter how big the shared tier is. Errors from the
+    shared tier are counted and logged, and the lookup falls back to a miss, so a broken cache never
+    fails a request.
+    """
+
+    def __init__(self, namespace: str, ttl: Optional[float] = None, maxsize: int = CACHE_MEMORY_SIZE, backend=None,
+                 max_entries: Optional[int] = None, max_entry_bytes: Optional[int] = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.memory = LRUCache(maxsize)
+        self._backend = backend
+        self._tombstone_seq = 0
+        self._version = 0
+        self._synced_at = 0.0
+        self._sync_lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.oversized = 0
+        self.errors = 0
+        _caches.append(self)
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else shared_backend()
+
+    def _counter(self, kind: str) -> str:
+        return f"{CACHE_KEY_PREFIX}{self.namespace}:__{kind}"
+
+    @property
+    def _shared_namespace(self) -> str:
+        return f"{CACHE_KEY_PREFIX}{self.namespace}"
+
+    def _shared_key(self, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}{self.namespace}:{self._version}:{key}"
+
+    def _sync_due(self) -> bool:
+        return self.backend is not None and time.monotonic() - self._synced_at >= CACHE_SYNC_INTERVAL
+
+    def _sync(self):
+        """Pick up deletes/clears made by other workers."""
+        if not self._sync_due():
+            return
+        with self._sync_lock:
+            if not self._sync_due():
+                return
+            version_name = self._counter("version")
+            try:
+                version = self.backend.counters([version_name]).get(version_name, 0)
+                deleted = self.backend.tombstones(self._shared_namespace, self._tombstone_seq)
+            except Exception as e:
+                self._failed("sync", e)
+                return
+            finally:
+                self._synced_at = time.monotonic()
+            if deleted:
+                self._tombstone_seq = deleted[-1][0]
+            # A full window may have lost older deletes to trimming, so forget everything then
+            if version != self._version or len(deleted) >= CACHE_TOMBSTONE_KEEP:
+                self.memory.clear()
+                self._version = version
+            else:
+                for _, key in deleted:
+                    self.memory.pop(key)
+
+    def _failed(self, operation: str, error: Exception):
+        self.errors += 1
+        log.warning("cache.shared_failed", namespace=self.namespace, operation=operation, error=str(error))
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        entry = self.memory.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at is not None and expires_at < time.time():
+            self.memory.pop(key)
+            return None
+        return data
+
+    def _remember(self, key: str, data: bytes, ttl: Optional[float]):
+        self.memory.set(key, (time.time() + ttl if ttl else None, data))
+
+    def get(self, key: str, default=None):
+        self._sync()
+        data = self._memory_get(key)
+        if data is not None:
+            self.memory_hits += 1
+            return decode(data)
+        backend = self.backend
+        if backend is not None:
+            try:
+                data = backend.get(self._shared_key(key))
+            except Exception as e:
+                self._failed("get", e)
+                data = None
+            if data is not None:
+                self.shared_hits += 1
+                # The remaining shared TTL isn't known here; the memory copy lives for at most one full ttl
+                self._remember(key, data, self.ttl)
+                return decode(data)
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = ttl if ttl is not None else self.ttl
+        data = encode(value)
+        if self.max_entry_bytes and len(data) > self.max_entry_bytes:
+            # Not stored, and an older value must not be served in its place
+            self.oversized += 1
+            self.memory.pop(key)
+            if self.backend is not None:
+                try:
+                    self.backend.delete(self._shared_key(key))
+                except Exception as e:
+                    self._failed("set", e)
+            return
+        self._sync()
+        self._remember(key, data, ttl)
+        self.sets += 1
+        if self.backend is not None:
+            shared_key = self._shared_key(key)
+            try:
+                self.backend.set(shared_key, data, ttl)
+                if self.max_entries:
+                    self.backend.cap(f"{CACHE_KEY_PREFIX}{self.namespace}:", shared_key, self.max_entries, ttl)
+            except Exception as e:
+                self._failed("set", e)
+
+    def delete(self, key: str):
+        """Remove one key everywhere; other workers drop it from their memory tier on their next sync."""
+        self.memory.pop(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self._shared_key(key))
+                self.backend.tombstone(self._shared_namespace, key)
+            except Exception as e:
+                self._failed("delete", e)
+
+    def clear(self):
+        """Invalidate the whole namespace (stale shared entries expire or are trimmed on their own)."""
+        self.memory.clear()
+        if self.backend is not None:
+            try:
+                self.backend.incr(self._counter("version"))
+            except Exception as e:
+                self._failed("clear", e)
+            self._synced_at = 0.0
+
+    async def aget(self, key: str, default=None):
+        if not self._sync_due():
+            data = self._memory_get(key)
+            if data is not None:
+                self.memory_hits += 1
+                return decode(data)
+        if self.backend is None:
+            self.misses += 1
+            return default
+        return await asyncio.to_thread(self.get, key, default)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.backend is None:
+            self.set(key, value, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def adelete(self, key: str):
+        if self.backend is None:
+            self.delete(key)
+        else:
+            await asyncio.to_thread(self.delete, key)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.shared_hits
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        backend = self.backend
+        return {
+            "namespace": self.namespace,
+            "shared": backend.describe() if backend is not None else None,
+            "memory": self.memory.stats(),
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "oversized": self.oversized,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
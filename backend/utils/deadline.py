@@ -0,0 +1,249 @@
+"""
+Request-scoped time budgets, and hedged calls for idempotent reads.
+
+An endpoint opens a budget. Every downstream call caps its timeout to what is left, and retry loops
+stop once it is spent:
+
+    with deadline(TRENDS_DEADLINE):
+        ...
+        requests.get(url, timeout=remaining(15))    # min(15, time left); DeadlineExceeded once it is spent
+        if not has_time(5):                          # don't start an attempt that can't finish
+            break
+
+The budget is a context variable, so it follows work into asyncio tasks and asyncio.to_thread, and
+a nested deadline() can only shorten it. Without a budget remaining(default) is just the default,
+so work outside requests (the email outbox, scripts) behaves as before.
+
+Generators must not hold a budget across a yield (the consumer may close them from another
+context). They fix the end once and enter it around each awaited step instead:
+
+    at = ends_at(TRENDS_DEADLINE)
+    with deadline_at(at):
+        data = await fetch()
+    yield data
+
+    results = hedged("reddit_search", search, subreddit, keyword)
+
+runs the call, and if it hasn't answered after that call's recent p95 latency, starts a duplicate and
+returns whichever answers first. Only for idempotent reads, and only for the names in HEDGE_CALLS.
+The copy that loses is abandoned: from then on it is out of time, so it stops at its next
+remaining()/has_time()/pause() check and gives up its place in the governor's queue. A call
+already on the wire runs to the end, since a thread can't be interrupted.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Deque, Dict, List, Optional, TypeVar
+
+from utils.metrics import counter
+
+# Calls that may be hedged, e.g. "reddit_search,trend_summary"; none by default
+HEDGE_CALLS = {name.strip() for name in os.getenv("HEDGE_CALLS", "").split(",") if name.strip()}
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", 0.95))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))  # latencies seen before a call is hedged at all
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", 200))  # recent latencies kept per call
+HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", 16))
+
+HEDGED_CALLS = counter("hedged_calls_total", "Duplicate calls started by hedging, by call and which copy answered.",
+                       ("call", "winner"))
+
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+race_var: ContextVar[Optional["_Race"]] = ContextVar("hedge_race", default=None)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before or during a downstream call."""
+
+
+class _Race:
+    """One copy of a hedged call; lose() abandons it (and any hedged calls it makes in turn)."""
+
+    def __init__(self, parent: Optional["_Race"] = None):
+        self.parent = parent
+        self._lost = False
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def lost(self) -> bool:
+        return self._lost or (self.parent is not None and self.parent.lost)
+
+    def lose(self):
+        with self._lock:
+            self._lost = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_lose(self, callback: Callable[[], None]):
+        race = self
+        while race is not None:
+            with race._lock:
+                if not race._lost:
+                    race._callbacks.append(callback)
+                    race = race.parent
+                    continue
+            callback()
+            return
+
+
+def ends_at(seconds: float) -> Optional[float]:
+    """When a budget of `seconds` starting now ends, for deadline_at(); None (no budget) for 0."""
+    return time.monotonic() + seconds if seconds > 0 else None
+
+
+@contextmanager
+def deadline_at(at: Optional[float]):
+    """Run the block with the budget ending at `at` (time.monotonic()), or sooner if an outer budget does."""
+    if at is None:
+        yield
+        return
+    outer = deadline_var.get()
+    token = deadline_var.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        deadline_var.reset(token)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Run the block with at most `seconds` left (less if an outer budget ends sooner). 0 adds no budget."""
+    with deadline_at(ends_at(seconds)):
+        yield
+
+
+def on_abandon(callback: Callable[[], None]):
+    """Call `callback` (from another thread) if the current hedged copy loses its race; no-op outside hedged()."""
+    race = race_var.get()
+    if race is not None:
+        race.on_lose(callback)
+
+
+def time_left() -> Optional[float]:
+    """Seconds left in the current budget (negative once spent), or None if there is none."""
+    race = race_var.get()
+    if race is not None and race.lost:
+        return 0.0
+    at = deadline_var.get()
+    return None if at is None else at - time.monotonic()
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """A timeout for the next call: `default` cut to the time left. Raises DeadlineExceeded once it is spent."""
+    left = time_left()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if default is None else min(default, left)
+
+
+def has_time(seconds: float = 0) -> bool:
+    left = time_left()
+    return left is None or left > seconds
+
+
+def pause(seconds: float):
+    """time.sleep for back-off; raises DeadlineExceeded instead of sleeping past the budget."""
+    left = time_left()
+    if left is not None and left <= seconds:
+        raise DeadlineExceeded("Request deadline exceeded")
+    time.sleep(seconds)
+
+
+class _Latencies:
+    """Recent latencies per hedged call."""
+
+    def __init__(self):
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=HEDGE_WINDOW)
+            samples.append(seconds)
+
+    def quantile(self, name: str, q: float = HEDGE_QUANTILE) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_latencies = _Latencies()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+    return _pool
+
+
+def hedged(name: str, fn: Callable[..., T], *args) -> T:
+    """
+    fn(*args) for a blocking, idempotent read. If `name` is in HEDGE_CALLS and fn hasn't returned after its
+    p95 latency, a second copy starts; the first to succeed wins and the other is abandoned. Each copy
+    still goes through the governor, so hedges never exceed a provider's limits.
+    """
+    def timed():
+        start = time.perf_counter()
+        result = fn(*args)
+        _latencies.add(name, time.perf_counter() - start)
+        return result
+
+    if name not in HEDGE_CALLS:
+        return fn(*args)
+    delay = _latencies.quantile(name)
+    if delay is None or not has_time(delay):
+        return timed()
+    pool = _executor()
+    races = {}
+
+    def start():
+        race = _Race(race_var.get())
+        context = copy_context()
+        context.run(race_var.set, race)
+        future = pool.submit(context.run, timed)
+        races[future] = race
+        return future
+
+    def abandon(losers):
+        for future in losers:
+            future.cancel()
+            races[future].lose()
+
+    primary = start()
+    if not wait([primary], timeout=delay).done:
+        backup = start()
+        pending = {primary, backup}
+        while pending:
+            try:
+                done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            except DeadlineExceeded:
+                abandon(pending)
+                raise
+            if not done:
+                abandon(pending)
+                raise DeadlineExceeded(f"Request deadline exceeded waiting for {name}")
+            for future in done:
+                if future.exception() is None:
+                    abandon(pending)
+                    HEDGED_CALLS.inc(call=name, winner="primary" if future is primary else "hedge")
+                    return future.result()
+        HEDGED_CALLS.inc(call=name, winner="none")
+    return primary.result()
@@ -0,0 +1,44 @@
+"""
+Fast JSON encoding for endpoints with large payloads (calendars, trend series, crawl results).
+
+Returning FastJSONResponse(data) from an endpoint skips FastAPI's jsonable_encoder pass and encodes
+with orjson when it is installed (stdlib json otherwise). Only use it for data that is already plain
+dicts/lists/strings/numbers (plus UUIDs and datetimes).
+"""
+import json
+import uuid
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_line(content: Any) -> bytes:
+    """One NDJSON record."""
+    return dumps(content) + b"\n"
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,308 @@
+"""
+Process-wide governor for calls to external services (OpenRouter, Reddit, Google Trends, competitor
+sites, SMTP): per-provider concurrency and request-rate limits, with priority lanes so interactive
+requests are served before background and batch work.
+
+Every outbound call goes through `outbound(service)`, which waits for a slot, then times the call:
+
+    async with outbound("openrouter"):           # from async code
+        await client.post(...)
+    with outbound("smtp"):                       # from worker threads (smtplib, requests, praw)
+        server.send_message(msg)
+
+The lane comes from the caller's context (interactive unless set otherwise), so it follows work into
+asyncio tasks and asyncio.to_thread:
+
+    with priority(BATCH):
+        ...
+
+Inside a request's deadline() budget, waiting for a slot (or a rate-limit token) that would only come
+after the budget ends raises DeadlineExceeded instead.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from utils.deadline import DeadlineExceeded, has_time, on_abandon, remaining
+from utils.metrics import OUTBOUND_DURATION, OUTBOUND_IN_FLIGHT, gauge, histogram
+from utils.profiling import record
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BACKGROUND, BATCH)
+_RANK = {name: rank for rank, name in enumerate(PRIORITIES)}
+
+# provider -> (max concurrent calls, max calls per second; 0 = no rate limit)
+DEFAULT_LIMITS = {
+    "openrouter": (8, 0),
+    "reddit": (4, 1.0),            # Reddit's API allows 60 requests a minute per client
+    # Trends answers 429 to sustained bursts. One fetch attempt is three calls (plus the retry loop's own
+    # pauses), so at 0.5/s an attempt takes about 5 s, and a retry still fits TRENDS_SOURCE_DEADLINE (20 s).
+    # A lower GOVERNOR_GOOGLE_TRENDS_RATE needs a longer TRENDS_SOURCE_DEADLINE, or attempts run out of time.
+    "google_trends": (2, 0.5),
+    "competitor_site": (int(os.getenv("SCRAPE_MAX_CONCURRENCY", 10)), 0),
+    "smtp": (2, 0),
+}
+GOVERNOR_DEFAULT_CONCURRENCY = int(os.getenv("GOVERNOR_DEFAULT_CONCURRENCY", 8))
+# Slots per provider that only interactive work may use, so a batch job can never take all of them
+GOVERNOR_INTERACTIVE_RESERVE = int(os.getenv("GOVERNOR_INTERACTIVE_RESERVE", 1))
+# Calls a provider may make back to back before its rate limit applies
+GOVERNOR_RATE_BURST = int(os.getenv("GOVERNOR_RATE_BURST", 1))
+
+GOVERNOR_QUEUE_DEPTH = gauge(
+    "governor_queue_depth", "Outbound calls waiting for a slot, by provider and priority lane.", ("provider", "priority"))
+GOVERNOR_IN_USE = gauge("governor_slots_in_use", "Outbound slots currently held, by provider.", ("provider",))
+GOVERNOR_WAIT = histogram(
+    "governor_wait_seconds", "Time spent waiting for an outbound slot and rate-limit token.", ("provider", "priority"))
+
+priority_var: ContextVar[str] = ContextVar("outbound_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(lane: str):
+    """Run the block (and tasks/threads it starts) in the given lane."""
+    if lane not in _RANK:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    token = priority_var.set(lane)
+    try:
+        yield
+    finally:
+        priority_var.reset(token)
+
+
+def _limits(provider: str):
+    concurrency, rate = DEFAULT_LIMITS.get(provider, (GOVERNOR_DEFAULT_CONCURRENCY, 0))
+    key = provider.upper()
+    concurrency = int(os.getenv(f"GOVERNOR_{key}_CONCURRENCY", concurrency))
+    rate = float(os.getenv(f"GOVERNOR_{key}_RATE", rate))
+    return max(1, concurrency), max(0.0, rate)
+
+
+class _Waiter:
+    __slots__ = ("lane", "event", "loop", "future", "granted")
+
+    def __init__(self, lane: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.lane = lane
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ProviderLimiter:
+    """
+    Concurrency slots handed out in priority order (FIFO within a lane), plus a GCRA rate limit.
+    Thread-safe: async callers and worker threads share the same slots.
+    """
+
+    def __init__(self, name: str, concurrency: int, rate: float = 0, burst: int = GOVERNOR_RATE_BURST,
+                 interactive_reserve: int = GOVERNOR_INTERACTIVE_RESERVE):
+        self.name = name
+        self.concurrency = concurrency
+        # Background and batch work never take the last `interactive_reserve` slots (but always get at least one)
+        self.shared_slots = max(1, concurrency - interactive_reserve)
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._queue: List = []
+        self._seq = itertools.count()
+        self._next_at = 0.0
+
+    def _capacity(self, lane: str) -> int:
+        return self.concurrency if lane == INTERACTIVE else self.shared_slots
+
+    def _take_now(self, lane: str) -> bool:
+        # Don't overtake anyone already queued in the same or a more important lane
+        if self._queue and self._queue[0][0] <= _RANK[lane]:
+            return False
+        if self.in_use >= self._capacity(lane):
+            return False
+        self._grant()
+        return True
+
+    def _grant(self):
+        self.in_use += 1
+        GOVERNOR_IN_USE.set(self.in_use, provider=self.name)
+
+    def _enqueue(self, waiter: _Waiter):
+        heapq.heappush(self._queue, (_RANK[waiter.lane], next(self._seq), waiter))
+        GOVERNOR_QUEUE_DEPTH.inc(provider=self.name, priority=waiter.lane)
+
+    def _dispatch(self):
+        while self._queue:
+            rank, _, waiter = self._queue[0]
+            if self.in_use >= self._capacity(waiter.lane):
+                return
+            heapq.heappop(self._queue)
+            GOVERNOR_QUEUE_DEPTH.dec(provider=self.name, priority=waiter.lane)
+            self._grant()
+            waiter.granted = True
+            waiter.wake()
+
+    def _discard(self, waiter: _Waiter):
+        """Drop a waiter that gave up; hand its slot on if it had already been granted one."""
+        with self._lock:
+            if waiter.granted:
+                self.in_use -= 1
+                GOVERNOR_IN_USE.set(self.in_use, provider=self.name)
+            else:
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+                GOVERNOR_QUEUE_DEPTH.dec(provider=self.name, priority=waiter.lane)
+            self._dispatch()
+
+    def _rate_delay(self) -> float:
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next_at, now - (self.burst - 1) * self.interval)
+            self._next_at = start + self.interval
+            return max(0.0, start - now)
+
+    def acquire(self, lane: str):
+        """Blocking acquire for worker threads. Never call from the event loop thread."""
+        with self._lock:
+            if self._take_now(lane):
+                waiter = None
+            else:
+                waiter = _Waiter(lane)
+                self._enqueue(waiter)
+        try:
+            if waiter is not None:
+                # A hedged copy that loses its race leaves the queue right away
+                on_abandon(waiter.wake)
+                if not waiter.event.wait(remaining()) or not waiter.granted:
+                    raise DeadlineExceeded(f"No {self.name} slot before the request deadline")
+            delay = self._rate_delay()
+            if delay:
+                if not has_time(delay):
+                    raise DeadlineExceeded(f"{self.name} rate limit would outlast the request deadline")
+                time.sleep(delay)
+            remaining()  # a hedged copy abandoned while it waited doesn't make the call
+        except DeadlineExceeded:
+            if waiter is not None:
+                self._discard(waiter)
+            else:
+                self.release()
+            raise
+
+    async def acquire_async(self, lane: str):
+        with self._lock:
+            if self._take_now(lane):
+                waiter = None
+            else:
+                waiter = _Waiter(lane, asyncio.get_running_loop())
+                self._enqueue(waiter)
+        try:
+            if waiter is not None:
+                try:
+                    await asyncio.wait_for(waiter.future, remaining())
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"No {self.name} slot before the request deadline") from None
+            delay = self._rate_delay()
+            if delay:
+                if not has_time(delay):
+                    raise DeadlineExceeded(f"{self.name} rate limit would outlast the request deadline")
+                await asyncio.sleep(delay)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            if waiter is not None:
+                self._discard(waiter)
+            else:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+            GOVERNOR_IN_USE.set(self.in_use, provider=self.name)
+            self._dispatch()
+
+
+class Governor:
+    def __init__(self):
+        self._providers: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def provider(self, name: str) -> ProviderLimiter:
+        limiter = self._providers.get(name)
+        if limiter is None:
+            with self._lock:
+                limiter = self._providers.get(name)
+                if limiter is None:
+                    concurrency, rate = _limits(name)
+                    limiter = self._providers[name] = ProviderLimiter(name, concurrency, rate)
+        return limiter
+
+
+governor = Governor()
+
+
+class outbound:
+    """
+    Hold a governor slot for `provider` (defaults to `service`) around a call to an external service
+    and record its latency under `service`. Works as a sync or async context manager, or a decorator.
+    """
+
+    def __init__(self, service: str, provider: str = None):
+        self.service = service
+        self.provider = provider or service
+
+    def _start(self, waited_from: float, lane: str):
+        self._begin = time.perf_counter()
+        GOVERNOR_WAIT.observe(self._begin - waited_from, provider=self.provider, priority=lane)
+        record("outbound_wait", self._begin - waited_from)
+        OUTBOUND_IN_FLIGHT.inc(service=self.service)
+
+    def _finish(self, exc_type):
+        OUTBOUND_IN_FLIGHT.dec(service=self.service)
+        elapsed = time.perf_counter() - self._begin
+        OUTBOUND_DURATION.observe(elapsed, service=self.service, outcome="error" if exc_type else "ok")
+        record("llm" if self.provider == "openrouter" else "external", elapsed)
+        governor.provider(self.provider).release()
+
+    def __enter__(self):
+        lane = priority_var.get()
+        waited_from = time.perf_counter()
+        governor.provider(self.provider).acquire(lane)
+        self._start(waited_from, lane)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._finish(exc_type)
+
+    async def __aenter__(self):
+        lane = priority_var.get()
+        waited_from = time.perf_counter()
+        await governor.provider(self.provider).acquire_async(lane)
+        self._start(waited_from, lane)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._finish(exc_type)
+
+    def __call__(self, fn):
+        def wrapper(*args, **kwargs):
+            with outbound(self.service, self.provider):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
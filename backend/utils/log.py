@@ -0,0 +1,162 @@
+"""
+Structured logging: one JSON object per line, written by a background thread.
+
+    log = get_logger(__name__)
+    log.info("calendar.stored", calendar_id=calendar_id, weeks=4)
+    log.debug("calendar.parsed", weeks=len(struct))   # sampled, see LOG_DEBUG_SAMPLE_RATE
+
+Callers only put a record on an in-memory queue; formatting and the stdout write happen on the
+listener thread. Fields are meant to be ids, counts and sizes: long strings are truncated and
+lists/dicts are logged as their length, so a record costs the same whatever the payload size.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of debug records kept; warnings and above are never sampled
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 0.1))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", 200))
+
+ROOT_LOGGER = "influcrafters"
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+def _field(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= LOG_MAX_FIELD_CHARS else value[:LOG_MAX_FIELD_CHARS] + "..."
+    if isinstance(value, (list, tuple, set, dict)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return _field(str(value))
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in getattr(record, "fields", {}).items():
+            entry[key] = _field(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueue the record untouched; the stock handler formats it on the calling thread."""
+
+    def prepare(self, record):
+        return record
+
+
+class StructLogger:
+    """Thin wrapper over a stdlib logger taking an event name plus keyword fields."""
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def _log(self, level: int, event: str, exc_info=None, **fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        self._logger.log(level, event, exc_info=exc_info,
+                         extra={"fields": fields, "request_id": request_id_var.get()})
+
+    def debug(self, event: str, sample: float = None, **fields):
+        rate = LOG_DEBUG_SAMPLE_RATE if sample is None else sample
+        if rate < 1 and random.random() >= rate:
+            return
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
+
+
+def setup_logging():
+    """Route the app's loggers through a queue to a JSON stdout writer thread. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger(ROOT_LOGGER)
+    handler = next((h for h in root.handlers if isinstance(h, _DeferredQueueHandler)), None)
+    if handler is None:
+        handler = _DeferredQueueHandler(queue.SimpleQueue())
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(handler)
+        root.propagate = False
+        atexit.register(shutdown_logging)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JSONFormatter())
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread; setup_logging() starts it again."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every request a correlation id, taken from a well-formed X-Request-ID
+    header or generated, exposed to loggers via request_id_var and echoed on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,263 @@
+"""
+Minimal Prometheus metrics (counters, gauges, histograms) rendered in the text exposition format.
+Values are per process; with several workers, scrape each one or aggregate in Prometheus.
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+
+from utils.log import get_logger
+from utils.profiling import record
+
+log = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers fast DB queries up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirror a running total kept elsewhere (e.g. a cache's hit count); it never goes down."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, 0), value)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def on_collect(self, fn: Callable[[], None]):
+        """fn runs before every scrape, to refresh metrics that mirror stats kept elsewhere (e.g. cache counters)."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception:
+                log.exception("metrics.collector_failed", collector=getattr(fn, "__name__", repr(fn)))
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+HTTP_REQUEST_DURATION = histogram(
+    "http_request_duration_seconds", "HTTP request latency by router and route, until the response body is sent.",
+    ("router", "method", "route", "status"))
+HTTP_REQUESTS_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being served.")
+
+OUTBOUND_DURATION = histogram(
+    "outbound_request_duration_seconds", "Latency of calls to external services.", ("service", "outcome"))
+OUTBOUND_IN_FLIGHT = gauge("outbound_requests_in_flight", "Calls to external services currently in progress.", ("service",))
+
+DB_QUERY_DURATION = histogram(
+    "db_query_duration_seconds", "Database statement execution time.", ("operation",))
+DB_QUERIES_IN_FLIGHT = gauge("db_queries_in_flight", "Database statements currently executing.")
+DB_QUERY_ERRORS = counter("db_query_errors_total", "Database statements that raised.", ("operation",))
+
+CACHE_HITS = counter("cache_hits_total", "Cache hits since process start.", ("cache",))
+CACHE_MISSES = counter("cache_misses_total", "Cache misses since process start.", ("cache",))
+CACHE_HIT_RATIO = gauge("cache_hit_ratio", "Cache hits / lookups since process start.", ("cache",))
+
+
+def set_cache_stats(cache: str, hits: int, misses: int):
+    lookups = hits + misses
+    CACHE_HITS.set_total(hits, cache=cache)
+    CACHE_MISSES.set_total(misses, cache=cache)
+    CACHE_HIT_RATIO.set(round(hits / lookups, 4) if lookups else 0.0, cache=cache)
+
+
+def instrument_engine(engine):
+    """Time every statement run through an (async) SQLAlchemy engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def operation(statement: str) -> str:
+        return statement.lstrip().split(None, 1)[0].upper() if statement and statement.strip() else "OTHER"
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+        DB_QUERIES_IN_FLIGHT.inc()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        DB_QUERY_DURATION.observe(elapsed, operation=operation(statement))
+        record("db", elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+            DB_QUERIES_IN_FLIGHT.dec()
+        DB_QUERY_ERRORS.inc(operation=operation(context.statement))
+
+
+def route_owner(route) -> str:
+    """'brands' for an endpoint defined in routers/brands.py; 'app' for routes on the app itself."""
+    module = getattr(getattr(route, "endpoint", None), "__module__", "") or ""
+    return module.split(".", 1)[1] if module.startswith("routers.") else "app"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per router and route. Streaming responses are timed to the last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router records the matched route in the (shared) scope while dispatching
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, router=route_owner(route) if route else "unmatched",
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=status["code"])
@@ -0,0 +1,270 @@
+"""
+On-demand profiling of single requests. With PROFILE_TOKEN set, a request carrying the token in an
+X-Profile header (or ?_profile=<token>) is profiled while it runs:
+
+    curl -H "X-Profile: $PROFILE_TOKEN" -X POST localhost:8000/generate-calendar ...
+
+The response gets a Server-Timing header with the time spent per phase (llm, external,
+outbound_wait, db, parse) and an X-Profile-Id. GET /debug/profiles/<id> with the same header
+returns the phase timings as JSON. With ?format=folded it returns the sampled stacks in folded
+format, ready for flamegraph.pl or speedscope.
+
+Phases are recorded by `outbound()` (llm for OpenRouter, external for every other service), the DB
+engine events and `phase("parse")` blocks. Concurrent calls are summed, so phases can add up to more
+than the wall time. The sampler sees the whole event loop: on a busy worker the stacks include other
+requests, so profile on a quiet one when you want a clean flamegraph.
+
+Without PROFILE_TOKEN the middleware is not installed, and phase() only reads a context variable.
+"""
+import asyncio
+import functools
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from utils.log import get_logger, request_id_var
+
+log = get_logger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "_profile"
+PROFILES_PATH = "/debug/profiles"
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # seconds between stack samples
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))  # the sampler stops after this, the timings don't
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(__file__).resolve().parent.parent / ".cache" / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))  # newest profiles kept on disk
+
+_APP_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+_VALID_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+profile_var: ContextVar[Optional["Profile"]] = ContextVar("profile", default=None)
+
+
+def token_matches(value: str) -> bool:
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+
+class Profile:
+    """Per-phase timings of one request. Thread-safe, since phases are recorded from worker threads too."""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.request_id = request_id_var.get()
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        # phase -> [seconds, calls]
+        self.phases: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def phase_ms(self) -> Dict[str, dict]:
+        with self._lock:
+            items = sorted(self.phases.items())
+        return {name: {"ms": round(seconds * 1000, 1), "calls": calls} for name, (seconds, calls) in items}
+
+    def server_timing(self) -> str:
+        parts = [f'{name};dur={p["ms"]};desc="{p["calls"]} calls"' for name, p in self.phase_ms().items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def record(name: str, seconds: float):
+    """Add `seconds` to a phase of the current request's profile, if it is being profiled."""
+    profile = profile_var.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+
+class phase:
+    """
+    Time a block under `name` in the current request's profile, if there is one. Works as a context
+    manager (sync code or around awaits) or a decorator.
+    """
+
+    __slots__ = ("name", "_profile", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._profile = profile_var.get()
+        if self._profile is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profile.add(self.name, time.perf_counter() - self._start)
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if profile_var.get() is None:
+                return fn(*args, **kwargs)
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the event loop thread's stack, and the stacks of worker threads running app code, every
+    `interval` seconds. Stacks are kept root-first and counted, as in the folded flamegraph format.
+    """
+
+    def __init__(self, loop_thread: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+        self._labels: Dict = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(_APP_ROOT):
+                filename = filename[len(_APP_ROOT):]
+            else:
+                filename = "/".join(Path(filename).parts[-2:])
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self, own: int, names: Dict[int, str]):
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            in_app = ident == self.loop_thread
+            while frame is not None:
+                codes.append(frame.f_code)
+                in_app = in_app or frame.f_code.co_filename.startswith(_APP_ROOT)
+                frame = frame.f_back
+            # Idle pool workers and the log writer only add noise
+            if not in_app:
+                continue
+            root = "loop" if ident == self.loop_thread else names.get(ident, f"thread-{ident}")
+            self.stacks[";".join([root] + [self._label(code) for code in reversed(codes)])] += 1
+        self.samples += 1
+
+    def run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        while not self._done.wait(self.interval) and time.monotonic() < deadline:
+            self._sample(own, {t.ident: t.name for t in threading.enumerate()})
+
+    def finish(self):
+        self._done.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_file(profile_id: str, kind: str) -> Optional[Path]:
+    """Path of a stored profile ('json' or 'folded'), or None if the id is malformed or unknown."""
+    if not _VALID_PROFILE_ID.match(profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.{kind}"
+    return path if path.exists() else None
+
+
+def save_profile(profile: Profile, sampler: StackSampler, status: int):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    summary = {
+        "id": profile.id,
+        "request_id": profile.request_id,
+        "method": profile.method,
+        "path": profile.path,
+        "status": status,
+        "duration_ms": round(profile.elapsed() * 1000, 1),
+        "phases": profile.phase_ms(),
+        "samples": sampler.samples,
+        "sample_interval_ms": sampler.interval * 1000,
+    }
+    (PROFILE_DIR / f"{profile.id}.folded").write_text(sampler.folded(), encoding="utf-8")
+    (PROFILE_DIR / f"{profile.id}.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    # Drop the oldest profiles beyond PROFILE_KEEP
+    stored = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in stored[PROFILE_KEEP:]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+    log.info("profile.stored", profile_id=profile.id, path=profile.path, status=status,
+             duration_ms=summary["duration_ms"], samples=sampler.samples)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that carry the PROFILE_TOKEN. Every other request only pays
+    for a header lookup. Only install it when PROFILE_TOKEN is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        # Fetching a profile sends the token too
+        if scope["path"].startswith(PROFILES_PATH):
+            return False
+        value = dict(scope["headers"]).get(PROFILE_HEADER.encode())
+        if value is not None:
+            return token_matches(value.decode("latin-1"))
+        if PROFILE_QUERY_PARAM.encode() in scope.get("query_string", b""):
+            values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM)
+            return bool(values) and token_matches(values[0])
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        profile = Profile(scope["method"], scope["path"])
+        sampler = StackSampler(threading.get_ident())
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                # Streaming responses send headers early, so these timings only cover the time until then
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", profile.server_timing().encode()),
+                    (b"x-profile-id", profile.id.encode()),
+                ]
+            await send(message)
+
+        token = profile_var.set(profile)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile_var.reset(token)
+            sampler.finish()
+            try:
+                await asyncio.to_thread(save_profile, profile, sampler, status["code"])
+            except OSError as e:
+                log.warning("profile.store_failed", profile_id=profile.id, error=str(e))
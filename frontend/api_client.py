@@ -0,0 +1,117 @@
+# Shared HTTP client for talking to the backend from the Gradio handlers.
+# One pooled keep-alive connection set per process instead of a new TCP connection per click,
+# with timeouts so a stalled backend can't hang a worker forever.
+import asyncio
+import json
+import os
+import httpx
+
+# Get backend URL from environment variable or use default for local development
+raw_backend_url = os.environ.get("BACKEND_URL", "http://localhost:8000")
+if not raw_backend_url.startswith("http"):
+    BACKEND_URL = f"http://{raw_backend_url}"
+else:
+    BACKEND_URL = raw_backend_url
+
+CONNECT_TIMEOUT = float(os.environ.get("FRONTEND_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("FRONTEND_READ_TIMEOUT", 30))
+# Calendar generation and voice analysis wait on the LLM, so they get a longer read timeout
+SLOW_READ_TIMEOUT = float(os.environ.get("FRONTEND_SLOW_READ_TIMEOUT", 120))
+MAX_CONNECTIONS = int(os.environ.get("FRONTEND_MAX_CONNECTIONS", 50))
+MAX_KEEPALIVE = int(os.environ.get("FRONTEND_MAX_KEEPALIVE", 20))
+RETRIES = int(os.environ.get("FRONTEND_RETRIES", 2))
+RETRY_BACKOFF = float(os.environ.get("FRONTEND_RETRY_BACKOFF", 0.3))
+
+RETRY_STATUSES = (502, 503, 504)
+
+_client = None
+_client_loop = None
+
+
+def default_timeout(read: float = READ_TIMEOUT) -> httpx.Timeout:
+    return httpx.Timeout(read, connect=CONNECT_TIMEOUT)
+
+
+def get_client() -> httpx.AsyncClient:
+    # httpx clients are tied to the event loop they were first used on
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=default_timeout(),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def request(method: str, path: str, idempotent: bool = None, read_timeout: float = None, **kwargs) -> httpx.Response:
+    """
+    Send a request to the backend. Idempotent calls (GET by default) are retried on connection errors,
+    timeouts and 502/503/504; other calls are only retried when the connection was never established.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+    if read_timeout is not None:
+        kwargs["timeout"] = default_timeout(read_timeout)
+    client = get_client()
+    for attempt in range(RETRIES + 1):
+        last = attempt == RETRIES
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.ConnectError:
+            if last:
+                raise
+        except httpx.TransportError:
+            if last or not idempotent:
+                raise
+        else:
+            if not (idempotent and response.status_code in RETRY_STATUSES) or last:
+                return response
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+
+async def get(path: str, **kwargs) -> httpx.Response:
+    return await request("GET", path, **kwargs)
+
+
+async def post(path: str, **kwargs) -> httpx.Response:
+    return await request("POST", path, **kwargs)
+
+
+async def download(path: str, dest: str, read_timeout: float = None, **kwargs) -> bool:
+    """Stream a backend file export straight to `dest` without holding it in memory. GETs only."""
+    if read_timeout is not None:
+        kwargs["timeout"] = default_timeout(read_timeout)
+    async with get_client().stream("GET", path, **kwargs) as response:
+        if response.status_code != 200:
+            return False
+        with open(dest, "wb") as f:
+            async for chunk in response.aiter_bytes():
+                f.write(chunk)
+    return True
+
+
+async def stream_events(path: str, read_timeout: float = None, **kwargs):
+    """
+    POST to an NDJSON streaming endpoint and yield each event as a dict while the backend produces them.
+    A non-200 response yields a single {"event": "error"} event.
+    """
+    if read_timeout is not None:
+        kwargs["timeout"] = default_timeout(read_timeout)
+    async with get_client().stream("POST", path, **kwargs) as response:
+        if response.status_code != 200:
+            body = (await response.aread()).decode("utf-8", errors="replace")
+            yield {"event": "error", "message": f"{response.status_code} - {body}"}
+            return
+        async for line in response.aiter_lines():
+            if line.strip():
+                yield json.loads(line)
@@ -1,20 +1,38 @@
 # --- Gradio implementation replacing Streamlit frontend ---
+import logging
+import os
+import shutil
+import tempfile
 import gradio as gr
-import requests
 import pandas as pd
-import os
+import api_client
+from api_client import BACKEND_URL
+
+logger = logging.getLogger(__name__)
+
+# Per-session exports live under EXPORT_ROOT/<session hash>/ and are removed when the session ends
+EXPORT_ROOT = os.environ.get("FRONTEND_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "content-strategy-exports")
+# How many events each handler may run at once across all sessions (handlers are async, so this can be high)
+CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", 64))
+QUEUE_MAX_SIZE = int(os.environ.get("GRADIO_QUEUE_MAX_SIZE", 512))
+# Long-running streamed generations get their own smaller pools so they can't use up every slot
+CALENDAR_CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_CALENDAR_CONCURRENCY_LIMIT", 8))
+TRENDS_CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_TRENDS_CONCURRENCY_LIMIT", 8))
+
 
-# Get backend URL from environment variable or use default for local development
-raw_backend_url = os.environ.get("BACKEND_URL", "http://localhost:8000")
-if not raw_backend_url.startswith("http"):
-    BACKEND_URL = f"http://{raw_backend_url}"
-else:
-    BACKEND_URL = raw_backend_url
+def session_export_dir(request: gr.Request) -> str:
+    # session_hash is random per browser tab, so it can't escape EXPORT_ROOT
+    path = os.path.join(EXPORT_ROOT, request.session_hash if request else "anonymous")
+    os.makedirs(path, exist_ok=True)
+    return path
 
-brand_profile_state = {}
-calendar_state = {}
 
-def save_brand_profile(brand_name, niche, platform, tone, frequency):
+def cleanup_session_exports(request: gr.Request):
+    if request and request.session_hash:
+        shutil.rmtree(os.path.join(EXPORT_ROOT, request.session_hash), ignore_errors=True)
+
+async def save_brand_profile(brand_name, niche, platform, tone, frequency):
+    """Returns (status message, brand profile for this session's state)."""
     payload = {
         "brand_name": brand_name,
         "niche": niche,
@@ -24,7 +42,7 @@ def save_brand_profile(brand_name, niche, platform, tone, frequency):
     }
     # Try to persist to backend first
     try:
-        res = requests.post(f"{BACKEND_URL}/brands", json={
+        res = await api_client.post("/brands", json={
             "name": brand_name,
             "niche": niche,
             "tone": tone,
@@ -33,78 +51,81 @@ def save_brand_profile(brand_name, niche, platform, tone, frequency):
         })
         if res.status_code in (200, 201):
             data = res.json()
-            # Keep an in-memory copy too
-            brand_profile_state.clear()
-            # normalize keys to match previous in-memory shape
-            brand_profile_state.update({
+            # normalize keys to match the session state shape
+            profile = {
                 "brand_name": data.get("name", brand_name),
                 "niche": data.get("niche", niche),
                 "platform": data.get("platform", platform),
                 "tone": data.get("tone", tone),
                 "posting_frequency": data.get("posting_frequency", frequency),
                 "id": data.get("id")
-            })
-            return f"✅ Brand persisted: {brand_profile_state['brand_name']}"
+            }
+            return f"✅ Brand persisted: {profile['brand_name']}", profile
         else:
-            # fallback to in-memory only
-            brand_profile_state.clear()
-            brand_profile_state.update({
-                "brand_name": brand_name,
-                "niche": niche,
-                "platform": platform,
-                "tone": tone,
-                "posting_frequency": frequency
-            })
-            return f"Saved locally but failed to persist: {res.status_code} - {res.text}"
+            # fallback to session state only
+            return f"Saved locally but failed to persist: {res.status_code} - {res.text}", payload
     except Exception as e:
         # On connection error, save locally and inform user
-        brand_profile_state.clear()
-        brand_profile_state.update({
-            "brand_name": brand_name,
-            "niche": niche,
-            "platform": platform,
-            "tone": tone,
-            "posting_frequency": frequency
-        })
-        return f"Saved locally, backend unavailable: {e}"
+        return f"Saved locally, backend unavailable: {e}", payload
+
+def bullet_list(items, empty):
+    return "\n".join([f"• {t}" for t in items]) or empty
+
+def interest_chart(points):
+    if points and len(points) > 0:
+        df = pd.DataFrame(points)
+        if not df.empty:
+            df['date'] = pd.to_datetime(df['date'])
+            return df.set_index('date')
+    return None
 
-def analyze_trends(keyword):
+def format_week(week):
+    week_str = f"### 📆 Week {week['week']}\nDisplaying {len(week['posts'])} posts for Week {week['week']}\n"
+    for post in week["posts"]:
+        hashtags = ' '.join([f'#{tag}' for tag in post.get('hashtags', [])])
+        week_str += f"#### {post['day']} - {post['post_type']}\n**Theme:** {post['theme']}\n**Caption:** {post['caption']}\n**Hashtags:** {hashtags}\n---\n"
+    return week_str
+
+async def analyze_trends(keyword):
+    """Streams (google topics, google trends, reddit topics, reddit trends, chart, status, info, summary) as sections arrive."""
+    google_topics = google_trends = reddit_topics = reddit_trends = "⏳ Loading..."
+    chart, info_text, summary = None, "", ""
+    status = f"⏳ Analyzing '{keyword}'..."
+    yield google_topics, google_trends, reddit_topics, reddit_trends, chart, status, info_text, summary
     try:
-        res = requests.post(f"{BACKEND_URL}/analyze-trends", json={"keyword": keyword})
-        if res.status_code == 200:
-            data = res.json()
-            info_msgs = []
-            if data.get("note"):
-                info_msgs.append(f"⚠️ {data['note']}")
-                info_msgs.append("Showing sample data for demonstration purposes.")
-            
-            google_topics = "\n".join([f"• {t}" for t in data.get("related_topics", [])]) or "No related topics found."
-            google_trends = "\n".join([f"• {t}" for t in data.get("rising_trends", [])]) or "No rising trends found."
-            reddit_topics = "\n".join([f"• {t}" for t in data.get("reddit_topics", [])]) or "No Reddit topics found."
-            reddit_trends = "\n".join([f"• {t}" for t in data.get("reddit_trends", [])]) or "No Reddit trends found."
-            
-            chart = None
-            if data.get("interest_over_time") and len(data["interest_over_time"]) > 0:
-                df = pd.DataFrame(data["interest_over_time"])
-                if not df.empty:
-                    df['date'] = pd.to_datetime(df['date'])
-                    df = df.set_index('date')
-                    chart = df
-            # Use backend-provided summary when available, otherwise fall back to a simple counts summary
-            counts_summary = f"📊 Found: {len(data.get('related_topics', []))} Google topics, {len(data.get('rising_trends', []))} Google trends, {len(data.get('interest_over_time', []))} interest points, {len(data.get('reddit_topics', []))} Reddit topics, {len(data.get('reddit_trends', []))} Reddit trends"
-            backend_summary = data.get('summary') if data.get('summary') else counts_summary
-            status = f"✅ Analysis completed for '{keyword}'" + (" (using sample data)" if data.get("note") else "")
-
-            # info contains any notes or warnings; summary is the highlights returned separately
-            info_text = "\n".join(info_msgs) if info_msgs else ""
-
-            return google_topics, google_trends, reddit_topics, reddit_trends, chart, status, info_text, backend_summary
-        else:
-            return "", "", "", "", None, f"Error: {res.status_code} - {res.text}", ""
+        async for event in api_client.stream_events("/analyze-trends/stream", json={"keyword": keyword}, read_timeout=api_client.SLOW_READ_TIMEOUT):
+            kind = event.get("event")
+            if kind == "status":
+                status = f"⏳ {event['message']}"
+            elif kind == "reddit":
+                reddit_topics = bullet_list(event.get("reddit_topics", []), "No Reddit topics found.")
+                reddit_trends = bullet_list(event.get("reddit_trends", []), "No Reddit trends found.")
+            elif kind == "google":
+                google_topics = bullet_list(event.get("related_topics", []), "No related topics found.")
+                google_trends = bullet_list(event.get("rising_trends", []), "No rising trends found.")
+                chart = interest_chart(event.get("interest_over_time"))
+                if event.get("note"):
+                    # info contains any notes or warnings; summary is the highlights returned separately
+                    info_text = f"⚠️ {event['note']}\nShowing sample data for demonstration purposes."
+            elif kind == "summary":
+                summary = event.get("summary", "")
+            elif kind == "done":
+                data = event["result"]
+                # Use backend-provided summary when available, otherwise fall back to a simple counts summary
+                counts_summary = f"📊 Found: {len(data.get('related_topics', []))} Google topics, {len(data.get('rising_trends', []))} Google trends, {len(data.get('interest_over_time', []))} interest points, {len(data.get('reddit_topics', []))} Reddit topics, {len(data.get('reddit_trends', []))} Reddit trends"
+                summary = data.get('summary') if data.get('summary') else counts_summary
+                status = f"✅ Analysis completed for '{keyword}'" + (" (using sample data)" if data.get("note") else "")
+            elif kind == "error":
+                status = f"Error: {event.get('message')}"
+            yield google_topics, google_trends, reddit_topics, reddit_trends, chart, status, info_text, summary
     except Exception as e:
-        return "", "", "", "", None, f"Connection failed: {e}", f"Make sure the backend server is running on {BACKEND_URL}", ""
+        yield "", "", "", "", None, f"Connection failed: {e}", f"Make sure the backend server is running on {BACKEND_URL}", ""
 
-def generate_calendar(brand_name, niche, platform, tone, frequency):
+async def generate_calendar(brand_name, niche, platform, tone, frequency):
+    """
+    Streams (week markdown list, stored calendar id, status, calendar) as the backend writes the calendar.
+    Weeks arrive one at a time; the id and final calendar come with the last update.
+    """
     payload = {
         "brand_name": brand_name,
         "niche": niche,
@@ -112,59 +133,60 @@ def generate_calendar(brand_name, niche, platform, tone, frequency):
         "tone": tone,
         "posting_frequency": frequency
     }
+    weeks = {}
     try:
-        res = requests.post(f"{BACKEND_URL}/generate-calendar", json=payload)
-        if res.status_code == 200:
-            calendar = res.json()
-            calendar_state.clear()
-            calendar_state.update({"calendar": calendar})
-            
-            weeks = []
-            for week in calendar:
-                week_str = f"### 📆 Week {week['week']}\nDisplaying {len(week['posts'])} posts for Week {week['week']}\n"
-                for post in week["posts"]:
-                    hashtags = ' '.join([f'#{tag}' for tag in post.get('hashtags', [])])
-                    week_str += f"#### {post['day']} - {post['post_type']}\n**Theme:** {post['theme']}\n**Caption:** {post['caption']}\n**Hashtags:** {hashtags}\n---\n"
-                weeks.append(week_str)
-            
-            posts = []
-            for week in calendar:
-                for post in week["posts"]:
-                    posts.append({
-                        "Week": week["week"],
-                        "Day": post["day"],
-                        "Post Type": post["post_type"],
-                        "Theme": post["theme"],
-                        "Caption": post["caption"],
-                        "Hashtags": " ".join(post.get("hashtags", []))
-                    })
-            df = pd.DataFrame(posts)
-            csv_data = df.to_csv(index=False)
-            return weeks, csv_data, ""
-        else:
-            return [], "", f"Error: {res.status_code} - {res.text}"
+        async for event in api_client.stream_events("/generate-calendar/stream", json=payload, read_timeout=api_client.SLOW_READ_TIMEOUT):
+            kind = event.get("event")
+            if kind == "status":
+                yield [weeks[k] for k in sorted(weeks)], None, f"⏳ {event['message']}", None
+            elif kind == "week":
+                week = event["week"]
+                weeks[week["week"]] = format_week(week)
+                yield [weeks[k] for k in sorted(weeks)], None, f"⏳ Week {week['week']} ready...", None
+            elif kind == "done":
+                calendar = event["calendar"]
+                # The backend stores the calendar; its CSV is downloaded from /calendars/{id}/export
+                yield [format_week(week) for week in calendar], event.get("calendar_id"), "", calendar
+                return
+            elif kind == "error":
+                yield [], None, f"Error: {event.get('message')}", None
+                return
+        yield [], None, "Error: generation ended without a calendar", None
     except Exception as e:
-        return [], "", f"Connection failed: {e}"
+        yield [], None, f"Connection failed: {e}", None
+
+
+async def download_calendar_csv(calendar_id, dest):
+    try:
+        if await api_client.download(f"/calendars/{calendar_id}/export", dest, params={"format": "csv"}):
+            return dest
+    except Exception:
+        logger.exception("CSV export of calendar %s failed", calendar_id)
+    gr.Warning("The calendar was generated, but its CSV export failed.")
+    return None
 
-def send_email(email):
-    calendar = calendar_state.get("calendar")
+async def send_email(email, calendar):
     if not calendar:
         return "No calendar to send. Generate calendar first."
-    response = requests.post(f"{BACKEND_URL}/email-calendar", json={
-        "email": email,
-        "calendar": calendar
-    })
-    if response.status_code == 200:
-        return "✅ Calendar emailed successfully!"
+    try:
+        response = await api_client.post("/email-calendar", json={
+            "email": email,
+            "calendar": calendar
+        })
+    except Exception as e:
+        return f"❌ Failed to send email: {e}"
+    if response.status_code == 200 and not response.json().get("error"):
+        # The backend queues the email and sends it in the background
+        return "✅ Calendar email queued for delivery!"
     else:
         return "❌ Failed to send email."
 
-def analyze_voice(captions):
+async def analyze_voice(captions):
     if not captions.strip():
         return "Please provide sample captions to analyze.", ""
     payload = {"text": captions.strip()}
     try:
-        res = requests.post(f"{BACKEND_URL}/analyze-tone", json=payload)
+        res = await api_client.post("/analyze-tone", json=payload, read_timeout=api_client.SLOW_READ_TIMEOUT)
         if res.status_code == 200:
             result = res.json()
             description = result.get("brand_voice_description")
@@ -177,7 +199,10 @@ def analyze_voice(captions):
     except Exception as e:
         return f"Connection failed: {e}", ""
 
-with gr.Blocks(title="Content Strategy Agent") as demo:
+with gr.Blocks(title="Content Strategy Agent", delete_cache=(3600, 3600)) as demo:
+    # Per-session state: each browser tab gets its own copy
+    brand_profile_state = gr.State({})
+    calendar_state = gr.State(None)
     gr.Markdown("# 🧠 Content Strategy Agent\nAI for Brands. Built by Influcrafters.")
     gr.Markdown("## 📊 Content Strategy Dashboard")
 
@@ -210,7 +235,8 @@ with gr.Blocks(title="Content Strategy Agent") as demo:
         # New: summary area to display model or synthesized highlights
         summary = gr.Markdown()
         # analyzer now returns an extra `summary` field (uses backend summary when available)
-        analyze_btn.click(analyze_trends, [keyword], [google_topics, google_trends, reddit_topics, reddit_trends, chart, status, info, summary])
+        analyze_btn.click(analyze_trends, [keyword], [google_topics, google_trends, reddit_topics, reddit_trends, chart, status, info, summary],
+                          concurrency_limit=TRENDS_CONCURRENCY_LIMIT, concurrency_id="trends")
 
     with gr.Tab("📅 Content Calendar"):
         gr.Markdown("### 📅 Content Calendar Generator")
@@ -224,46 +250,52 @@ with gr.Blocks(title="Content Strategy Agent") as demo:
 
         with gr.Row():
             with gr.Column():
-                new_cal_brand_name = gr.Textbox(label="Brand Name", placeholder="e.g. Influcrafters", value=brand_profile_state.get("brand_name", ""))
-                new_cal_niche = gr.Textbox(label="Brand Niche", placeholder="e.g. AI for marketing", value=brand_profile_state.get("niche", ""))
-                new_cal_platform = gr.Dropdown(label="Platform", choices=["Instagram", "LinkedIn"], value=brand_profile_state.get("platform", "Instagram"))
-                new_cal_tone = gr.Textbox(label="Content Tone", placeholder="e.g. witty, educational", value=brand_profile_state.get("tone", ""))
-                new_cal_frequency = gr.Slider(label="Posts per Week", minimum=1, maximum=7, value=brand_profile_state.get("posting_frequency", 3), step=1)
+                new_cal_brand_name = gr.Textbox(label="Brand Name", placeholder="e.g. Influcrafters", value="")
+                new_cal_niche = gr.Textbox(label="Brand Niche", placeholder="e.g. AI for marketing", value="")
+                new_cal_platform = gr.Dropdown(label="Platform", choices=["Instagram", "LinkedIn"], value="Instagram")
+                new_cal_tone = gr.Textbox(label="Content Tone", placeholder="e.g. witty, educational", value="")
+                new_cal_frequency = gr.Slider(label="Posts per Week", minimum=1, maximum=7, value=3, step=1)
                 gen_btn = gr.Button("🚀 Generate Calendar")
                 cal_status = gr.Textbox(label="Status", interactive=False)
                 
         weeks = gr.Markdown()
         csv_download = gr.File(label="⬇️ Download as CSV")
         
-        def gen_and_update(brand_name, niche, platform, tone, frequency):
+        async def gen_and_update(brand_name, niche, platform, tone, frequency, profile, calendar, request: gr.Request):
             if not any([brand_name, niche, platform, tone, frequency]):
-                if not brand_profile_state:
-                    return "", "", "Please fill in brand information or save a brand profile first."
-                brand_name = brand_profile_state.get("brand_name")
-                niche = brand_profile_state.get("niche")
-                platform = brand_profile_state.get("platform", "Instagram")
-                tone = brand_profile_state.get("tone")
-                frequency = brand_profile_state.get("posting_frequency", 3)
+                if not profile:
+                    yield "", None, "Please fill in brand information or save a brand profile first.", calendar
+                    return
+                brand_name = profile.get("brand_name")
+                niche = profile.get("niche")
+                platform = profile.get("platform", "Instagram")
+                tone = profile.get("tone")
+                frequency = profile.get("posting_frequency", 3)
             
-            weeks_list, csv_data, status = generate_calendar(brand_name, niche, platform, tone, frequency)
-            weeks_md = "\n".join(weeks_list)
-            
-            if csv_data:
-                with open("calendar.csv", "w", encoding="utf-8") as f:
-                    f.write(csv_data)
-            
-            return weeks_md, "calendar.csv" if csv_data else None, status
+            async for weeks_list, calendar_id, status, new_calendar in generate_calendar(brand_name, niche, platform, tone, frequency):
+                weeks_md = "\n".join(weeks_list)
+                if new_calendar is None:
+                    # Progress update: show the weeks written so far
+                    yield weeks_md, None, status, calendar
+                    continue
+                csv_path = None
+                if calendar_id:
+                    # One file per session, so concurrent users never overwrite each other's export
+                    csv_path = await download_calendar_csv(calendar_id, os.path.join(session_export_dir(request), "calendar.csv"))
+                yield weeks_md, csv_path, status, new_calendar
             
         gen_btn.click(
             gen_and_update,
-            [new_cal_brand_name, new_cal_niche, new_cal_platform, new_cal_tone, new_cal_frequency],
-            [weeks, csv_download, cal_status]
+            [new_cal_brand_name, new_cal_niche, new_cal_platform, new_cal_tone, new_cal_frequency, brand_profile_state, calendar_state],
+            [weeks, csv_download, cal_status, calendar_state],
+            concurrency_limit=CALENDAR_CONCURRENCY_LIMIT,
+            concurrency_id="calendar"
         )
 
         # Backend integration: load saved brands into dropdown
-        def load_saved_brands():
+        async def load_saved_brands():
             try:
-                res = requests.get(f"{BACKEND_URL}/brands")
+                res = await api_client.get("/brands")
                 if res.status_code == 200:
                     items = res.json()
                     # choices format: "id|name" to carry id through the dropdown
@@ -273,12 +305,12 @@ with gr.Blocks(title="Content Strategy Agent") as demo:
             except Exception as e:
                 return gr.update(choices=[]), f"Connection error: {e}"
 
-        def apply_selected_brand(selection):
+        async def apply_selected_brand(selection):
             if not selection:
                 return gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), "No brand selected"
             try:
                 brand_id, _ = selection.split("|", 1)
-                res = requests.get(f"{BACKEND_URL}/brands")
+                res = await api_client.get("/brands")
                 if res.status_code == 200:
                     for b in res.json():
                         if b['id'] == brand_id:
@@ -296,7 +328,7 @@ with gr.Blocks(title="Content Strategy Agent") as demo:
         email = gr.Textbox(label="📧 Enter email to send this calendar")
         email_btn = gr.Button("📤 Send Email")
         email_status = gr.Textbox(label="Email Status", interactive=False)
-        email_btn.click(send_email, [email], email_status)
+        email_btn.click(send_email, [email, calendar_state], email_status)
 
     with gr.Tab("🗣️ Voice Analyzer"):
         gr.Markdown("### 🗣️ Brand Voice Analyzer")
@@ -308,12 +340,12 @@ with gr.Blocks(title="Content Strategy Agent") as demo:
         analyze_voice_btn.click(analyze_voice, [captions], [voice_status, voice_desc])
 
     # Define save handler after all components are created so they are in scope
-    def save_and_update_dropdown(brand_name, niche, platform, tone, frequency):
+    async def save_and_update_dropdown(brand_name, niche, platform, tone, frequency):
         # Persist via backend and then refresh dropdown + populate calendar form
-        status_msg = save_brand_profile(brand_name, niche, platform, tone, frequency)
+        status_msg, profile = await save_brand_profile(brand_name, niche, platform, tone, frequency)
         print(f"[frontend] save_brand_profile returned: {status_msg}")
         try:
-            res = requests.get(f"{BACKEND_URL}/brands")
+            res = await api_client.get("/brands")
             print(f"[frontend] GET /brands status: {res.status_code}")
             if res.status_code == 200:
                 items = res.json()
@@ -327,18 +359,23 @@ with gr.Blocks(title="Content Strategy Agent") as demo:
                     brand_id, _ = selected.split("|", 1)
                     for b in items:
                         if b['id'] == brand_id:
-                            return status_msg, dropdown_update, b.get('name',''), b.get('niche',''), b.get('platform','Instagram'), b.get('tone',''), b.get('posting_frequency',3)
-                return status_msg, dropdown_update, '', '', 'Instagram', '', 3
-            return f"{status_msg} (failed to refresh brands: {res.status_code})", gr.update(choices=[]), '', '', 'Instagram', '', 3
+                            return status_msg, profile, dropdown_update, b.get('name',''), b.get('niche',''), b.get('platform','Instagram'), b.get('tone',''), b.get('posting_frequency',3)
+                return status_msg, profile, dropdown_update, '', '', 'Instagram', '', 3
+            return f"{status_msg} (failed to refresh brands: {res.status_code})", profile, gr.update(choices=[]), '', '', 'Instagram', '', 3
         except Exception as e:
-            return f"{status_msg} (refresh error: {e})", gr.update(choices=[]), '', '', 'Instagram', '', 3
+            return f"{status_msg} (refresh error: {e})", profile, gr.update(choices=[]), '', '', 'Instagram', '', 3
 
     # Wire save button to handler (components are in scope)
     save_btn.click(
         save_and_update_dropdown,
         [brand_name, niche, platform, tone, frequency],
-        [save_status, saved_brand_dropdown, new_cal_brand_name, new_cal_niche, new_cal_platform, new_cal_tone, new_cal_frequency]
+        [save_status, brand_profile_state, saved_brand_dropdown, new_cal_brand_name, new_cal_niche, new_cal_platform, new_cal_tone, new_cal_frequency]
     )
 
+    demo.unload(cleanup_session_exports)
+
+# Handlers are async and keep no module-level state, so many sessions can be served at once
+demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
+
 if __name__ == "__main__":
     demo.launch(share=True)